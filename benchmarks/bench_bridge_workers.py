@@ -0,0 +1,212 @@
+"""
+Load test: bridge throughput as the uvicorn worker count grows.
+
+For each `--workers` value the bridge is started as a real `uvicorn` process
+(`MCP_WORKERS=N`) in front of a mock wrapper that answers every CLI call
+after `--upstream-latency` seconds. Virtual users spread over
+`--load-processes` client processes run `/start_debate` followed by `/step`
+in a loop for `--duration` seconds. Consecutive requests of one user land on
+arbitrary workers, so any 4xx/5xx in `errors` means state was not shared;
+`--state-backend memory` reproduces that failure mode.
+
+    python benchmarks/bench_bridge_workers.py --workers 1 2 4
+    python benchmarks/bench_bridge_workers.py --workers 4 --state-backend memory
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+MOCK_LATENCY = float(os.getenv("BENCH_MOCK_LATENCY", "0"))
+_MOCK_BODY = b'{"output": "ok"}'
+
+
+async def mock_app(scope, receive, send) -> None:
+    """Bare ASGI wrapper stand-in, cheap enough not to be the bottleneck."""
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get("more_body", False)
+    if MOCK_LATENCY:
+        await asyncio.sleep(MOCK_LATENCY)
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": _MOCK_BODY})
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _uvicorn(app: str, port: int, workers: int, env: dict, app_dir: Path) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "uvicorn", app,
+        "--app-dir", str(app_dir),
+        "--host", "127.0.0.1",
+        "--port", str(port),
+        "--workers", str(workers),
+        "--lifespan", "off" if app.endswith(":mock_app") else "on",
+        "--log-level", "warning",
+        "--no-access-log",
+    ]
+    return subprocess.Popen(cmd, cwd=str(ROOT), env=env)
+
+
+def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+def _stop(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+async def _drive(base_url: str, first_user: int, users: int, duration: float) -> Tuple[List[float], int, List[int]]:
+    import httpx
+
+    latencies: List[float] = []
+    errors = 0
+    # No keep-alive: each request is accepted by whichever worker is free, as with many independent clients
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def user(idx: int) -> None:
+            nonlocal errors
+            headers = {"X-User-ID": f"load-{idx}"}
+            active = False
+            while time.perf_counter() < deadline:
+                if active:
+                    path, payload = "/step", {"decision": {"type": "adopt_codex"}}
+                else:
+                    path, payload = "/start_debate", {"initial_prompt": f"load test topic {idx}"}
+                started = time.perf_counter()
+                resp = await client.post(path, json=payload, headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if resp.status_code == 200:
+                    active = True
+                else:
+                    errors += 1
+                    active = False
+                    await client.post("/stop", headers=headers)
+
+        await asyncio.gather(*(user(first_user + idx) for idx in range(users)))
+        pids = set()
+        for _ in range(50):
+            pids.add((await client.get("/stats")).json()["worker"])
+    return latencies, errors, sorted(pids)
+
+
+def _load_process(args: Tuple[str, int, int, float]) -> Tuple[List[float], int, List[int]]:
+    return asyncio.run(_drive(*args))
+
+
+def run_one(workers: int, users: int, processes: int, duration: float, latency: float, backend: str) -> dict:
+    env = dict(os.environ, BENCH_MOCK_LATENCY=str(latency), LOG_LEVEL="WARNING")
+    mock_port = _free_port()
+    mock = _uvicorn("bench_bridge_workers:mock_app", mock_port, max(1, workers), env, Path(__file__).parent)
+    try:
+        _wait_ready(f"http://127.0.0.1:{mock_port}/")
+        with tempfile.TemporaryDirectory() as tmp:
+            bridge_port = _free_port()
+            bridge_env = dict(
+                env,
+                MCP_WORKERS=str(workers),
+                MCP_SESSION_BACKEND=backend,
+                MCP_RATE_BACKEND=backend,
+                MCP_SESSION_DB_PATH=os.path.join(tmp, "sessions.db"),
+                MCP_RATE_DB_PATH=os.path.join(tmp, "ratelimit.db"),
+                MCP_RATE_MAX_REQUESTS="100000000",
+                CODEX_WRAPPER_URL=f"http://127.0.0.1:{mock_port}/codex",
+                CLAUDE_WRAPPER_URL=f"http://127.0.0.1:{mock_port}/claude",
+            )
+            bridge = _uvicorn("mcp.bridge:app", bridge_port, workers, bridge_env, ROOT)
+            try:
+                base_url = f"http://127.0.0.1:{bridge_port}"
+                _wait_ready(f"{base_url}/health")
+                per_process = max(1, users // processes)
+                jobs = [(base_url, idx * per_process, per_process, duration) for idx in range(processes)]
+                with multiprocessing.Pool(processes) as pool:
+                    results = pool.map(_load_process, jobs)
+            finally:
+                _stop(bridge)
+    finally:
+        _stop(mock)
+
+    latencies = [sample for samples, _, _ in results for sample in samples]
+    errors = sum(count for _, count, _ in results)
+    pids = {pid for _, _, seen in results for pid in seen}
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "requests_per_s": round(len(latencies) / duration, 1),
+        "p50_ms": round(statistics.median(latencies), 2) if latencies else 0.0,
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "errors": errors,
+        "workers_seen": len(pids),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--users", type=int, default=64, help="Concurrent virtual users")
+    parser.add_argument("--load-processes", type=int, default=2, help="Client processes generating load")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per worker count")
+    parser.add_argument("--upstream-latency", type=float, default=0.0, help="Seconds per mocked CLI call")
+    parser.add_argument("--state-backend", choices=["sqlite", "memory"], default="sqlite",
+                        help="Session and rate-limit backend for the bridge")
+    args = parser.parse_args()
+
+    runs = [
+        run_one(workers, args.users, args.load_processes, args.duration, args.upstream_latency, args.state_backend)
+        for workers in args.workers
+    ]
+    baseline = runs[0]["requests_per_s"] or 1.0
+    for result in runs:
+        result["speedup"] = round(result["requests_per_s"] / baseline, 2)
+    print(json.dumps({
+        "cpu_count": os.cpu_count(),
+        "state_backend": args.state_backend,
+        "users": args.users,
+        "upstream_latency_s": args.upstream_latency,
+        "runs": runs,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
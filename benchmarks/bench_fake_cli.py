@@ -0,0 +1,243 @@
+"""
+End-to-end benchmark of the bridge and both wrappers over a fake CLI.
+
+Both wrappers are started as real `uvicorn` processes whose CLI is
+`benchmarks/fake_cli.py` (via `CODEX_CLI_COMMAND` / `CLAUDE_CLI_COMMAND`),
+with the latency distribution, output size and failure rate given here, and
+the bridge is started in front of them. `--users` virtual users then each run
+`--debates` debates of `/start_debate` followed by `--steps` `/step` calls, so
+every run sends the same requests at the same concurrency. The fake CLI
+draws its latency and failures from `--seed` and the prompt, so repeated runs
+of one configuration see the same upstream behaviour.
+
+Reports throughput, p50/p95/p99 per endpoint, responses by status and the
+RSS of each server process, and saves them as JSON (`--output`, by default
+`benchmarks/results/<UTC time>.json`) together with the configuration and git
+commit. `--compare` prints the change against an earlier result file.
+
+    python benchmarks/bench_fake_cli.py --users 8 --debates 2 --steps 5
+    python benchmarks/bench_fake_cli.py --latency lognormal:0.5,0.4 --failure-rate 0.02 \\
+        --compare benchmarks/results/20260101T000000Z.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shlex
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from bench_bridge_workers import ROOT, _free_port, _percentile, _stop, _uvicorn, _wait_ready
+from fake_cli import latency_sampler
+
+FAKE_CLI = Path(__file__).resolve().parent / "fake_cli.py"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+UNLIMITED = "100000000"
+
+
+def _rss_mb(pid: int) -> Optional[Dict[str, float]]:
+    """Current and peak resident set size of a process (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as fh:
+            fields = dict(line.split(":", 1) for line in fh if ":" in line)
+        return {
+            "current": round(int(fields["VmRSS"].split()[0]) / 1024, 1),
+            "peak": round(int(fields["VmHWM"].split()[0]) / 1024, 1),
+        }
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _fake_cli_command(args: argparse.Namespace, model: str) -> str:
+    return shlex.join([
+        sys.executable, str(FAKE_CLI),
+        "--latency", args.latency,
+        "--output-bytes", str(args.output_bytes),
+        "--chunks", str(args.chunks),
+        "--failure-rate", str(args.failure_rate),
+        "--seed", str(args.seed + (0 if model == "codex" else 1)),
+    ])
+
+
+def _summary(samples: List[float]) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": round(_percentile(samples, 50), 2),
+        "p95_ms": round(_percentile(samples, 95), 2),
+        "p99_ms": round(_percentile(samples, 99), 2),
+        "max_ms": round(max(samples), 2) if samples else 0.0,
+    }
+
+
+async def _drive(base_url: str, args: argparse.Namespace) -> dict:
+    import httpx
+
+    latencies: Dict[str, List[float]] = {"/start_debate": [], "/step": []}
+    statuses: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+
+        async def send(path: str, payload: dict, headers: dict) -> bool:
+            started = time.perf_counter()
+            try:
+                status = (await client.post(path, json=payload, headers=headers)).status_code
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            latencies[path].append((time.perf_counter() - started) * 1000)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            return status == 200
+
+        async def user(idx: int) -> None:
+            headers = {"X-User-ID": f"bench-{idx}"}
+            for debate in range(args.debates):
+                topic = f"benchmark topic {args.seed}-{idx}-{debate}"
+                if await send("/start_debate", {"initial_prompt": topic}, headers):
+                    for _ in range(args.steps):
+                        await send("/step", {"decision": {"type": "adopt_codex"}}, headers)
+                await client.post("/stop", headers=headers)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(idx) for idx in range(args.users)))
+        elapsed = time.perf_counter() - started
+
+    requests = sum(len(samples) for samples in latencies.values())
+    return {
+        "duration_s": round(elapsed, 3),
+        "requests": requests,
+        "requests_per_s": round(requests / elapsed, 2) if elapsed else 0.0,
+        "errors": requests - statuses.get("200", 0),
+        "status": dict(sorted(statuses.items())),
+        "endpoints": {path: _summary(samples) for path, samples in latencies.items()},
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    env = dict(
+        os.environ,
+        LOG_LEVEL="WARNING",
+        WRAPPER_RATE_MAX_REQUESTS=UNLIMITED,
+        WRAPPER_MAX_QUEUE=str(max(16, args.users * 2)),
+        WRAPPER_WARM_POOL_MIN=str(args.warm_pool),
+        CLI_TIMEOUT_SECONDS=str(int(args.timeout)),
+    )
+    if args.wrapper_concurrency is not None:
+        env["WRAPPER_MAX_CONCURRENCY"] = str(args.wrapper_concurrency)
+    servers: Dict[str, subprocess.Popen] = {}
+    try:
+        urls = {}
+        for model in ("codex", "claude"):
+            port = _free_port()
+            wrapper_env = dict(env, **{f"{model.upper()}_CLI_COMMAND": _fake_cli_command(args, model)})
+            servers[f"{model}_wrapper"] = _uvicorn(f"{model}_wrapper:app", port, 1, wrapper_env, ROOT / "host_wrappers")
+            urls[model] = f"http://127.0.0.1:{port}/{model}"
+            _wait_ready(f"http://127.0.0.1:{port}/health")
+
+        bridge_port = _free_port()
+        bridge_env = dict(
+            env,
+            MCP_SESSION_BACKEND="memory",
+            MCP_RATE_MAX_REQUESTS=UNLIMITED,
+            HTTP_TIMEOUT_SECONDS=str(int(args.timeout)),
+            CODEX_WRAPPER_URL=urls["codex"],
+            CLAUDE_WRAPPER_URL=urls["claude"],
+        )
+        servers["bridge"] = _uvicorn("mcp.bridge:app", bridge_port, 1, bridge_env, ROOT)
+        base_url = f"http://127.0.0.1:{bridge_port}"
+        _wait_ready(f"{base_url}/health")
+
+        results = asyncio.run(_drive(base_url, args))
+        results["rss_mb"] = {name: _rss_mb(proc.pid) for name, proc in servers.items()}
+        client_peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        results["rss_mb"]["load_client"] = {"peak": round(client_peak_kb / 1024, 1)}
+    finally:
+        for proc in servers.values():
+            _stop(proc)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    return {
+        "benchmark": "fake_cli",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "results": results,
+    }
+
+
+def _change(old: Optional[float], new: Optional[float]) -> dict:
+    change = {"old": old, "new": new}
+    if old and new is not None:
+        change["change_pct"] = round((new - old) / old * 100, 1)
+    return change
+
+
+def compare(previous: dict, current: dict) -> dict:
+    """The change in throughput, latency percentiles and peak RSS between two result files."""
+    old, new = previous["results"], current["results"]
+    report = {
+        "against": previous.get("timestamp"),
+        "same_config": previous.get("config") == current["config"],
+        "requests_per_s": _change(old.get("requests_per_s"), new["requests_per_s"]),
+        "errors": _change(old.get("errors"), new["errors"]),
+    }
+    for path, summary in new["endpoints"].items():
+        before = old.get("endpoints", {}).get(path, {})
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            report[f"{path} {key}"] = _change(before.get(key), summary[key])
+    for name, rss in new["rss_mb"].items():
+        before = (old.get("rss_mb") or {}).get(name) or {}
+        report[f"rss {name} peak_mb"] = _change(before.get("peak"), (rss or {}).get("peak"))
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=8, help="Concurrent virtual users")
+    parser.add_argument("--debates", type=int, default=2, help="Debates per user")
+    parser.add_argument("--steps", type=int, default=5, help="/step calls per debate")
+    parser.add_argument("--latency", default="lognormal:0.2,0.5",
+                        help="Fake CLI latency distribution (see benchmarks/fake_cli.py)")
+    # /step prompts quote recent turns; much larger outputs exceed the wrappers' 8192-character prompt limit
+    parser.add_argument("--output-bytes", type=int, default=1024, help="Fake CLI output size")
+    parser.add_argument("--chunks", type=int, default=4, help="Pieces the fake CLI writes its output in")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of fake CLI runs that fail")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the fake CLI's latency and failures")
+    parser.add_argument("--wrapper-concurrency", type=int, default=None,
+                        help="WRAPPER_MAX_CONCURRENCY (default: the wrappers' own default)")
+    parser.add_argument("--warm-pool", type=int, default=0, help="WRAPPER_WARM_POOL_MIN")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds per request and per CLI run")
+    parser.add_argument("--output", type=Path, default=None, help="Result file (default: benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, default=None, help="Earlier result file to compare against")
+    args = parser.parse_args()
+    latency_sampler(args.latency)  # fail here rather than inside the wrappers
+
+    result = run(args)
+    if args.compare is not None:
+        result["comparison"] = compare(json.loads(args.compare.read_text(encoding="utf-8")), result)
+    output = args.output or RESULTS_DIR / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+    print(json.dumps(result, indent=2))
+    print(f"saved to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Measure /health latency on the bridge while debates are in flight.
+
+The wrappers are replaced by an in-process mock transport that sleeps for
+`--upstream-latency` seconds per call, so the numbers isolate the bridge's
+event loop. Pass `--blocking` to emulate the old synchronous `requests.post`
+path (the mock sleeps with `time.sleep`) and compare the two runs.
+
+    python benchmarks/bench_health_under_load.py --debates 20
+    python benchmarks/bench_health_under_load.py --debates 20 --blocking
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MCP_RATE_MAX_REQUESTS", "1000000")
+
+import httpx  # noqa: E402
+
+from mcp import bridge  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _install_mock_upstream(latency: float, blocking: bool) -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if blocking:
+            time.sleep(latency)
+        else:
+            await asyncio.sleep(latency)
+        return httpx.Response(200, json={"output": "ok"})
+
+    bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def _probe_health(client: httpx.AsyncClient, duration: float, interval: float) -> List[float]:
+    """Sample /health on a fixed schedule.
+
+    Latency is measured from the scheduled send time, so a stalled event loop
+    shows up in the samples instead of silently delaying the next probe.
+    """
+    samples: List[float] = []
+    next_send = time.perf_counter()
+    deadline = next_send + duration
+    while next_send < deadline:
+        await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+        resp = await client.get("/health")
+        resp.raise_for_status()
+        samples.append((time.perf_counter() - next_send) * 1000)
+        next_send += interval
+    return samples
+
+
+def _summary(samples: List[float]) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": round(statistics.median(samples), 3) if samples else 0.0,
+        "p99_ms": round(_percentile(samples, 99), 3),
+        "max_ms": round(max(samples), 3) if samples else 0.0,
+    }
+
+
+async def run(debates: int, upstream_latency: float, blocking: bool, probe_seconds: float) -> dict:
+    _install_mock_upstream(upstream_latency, blocking)
+    transport = httpx.ASGITransport(app=bridge.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bridge", timeout=None) as client:
+        idle = await _probe_health(client, probe_seconds, 0.01)
+
+        async def debate(idx: int) -> None:
+            resp = await client.post(
+                "/start_debate",
+                json={"initial_prompt": f"benchmark topic {idx}"},
+                headers={"X-User-ID": f"bench-{idx}"},
+            )
+            resp.raise_for_status()
+
+        started = time.perf_counter()
+        in_flight = [asyncio.create_task(debate(idx)) for idx in range(debates)]
+        await asyncio.sleep(0)
+        loaded = await _probe_health(client, probe_seconds, 0.01)
+        await asyncio.gather(*in_flight)
+        elapsed = time.perf_counter() - started
+
+    await bridge._http_client.aclose()
+    return {
+        "debates": debates,
+        "upstream_latency_s": upstream_latency,
+        "blocking_upstream": blocking,
+        "health_idle": _summary(idle),
+        "health_under_load": _summary(loaded),
+        "debates_wall_clock_s": round(elapsed, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--debates", type=int, default=20, help="Concurrent /start_debate calls")
+    parser.add_argument("--upstream-latency", type=float, default=1.0, help="Seconds per mocked CLI call")
+    parser.add_argument("--probe-seconds", type=float, default=1.5, help="How long to sample /health")
+    parser.add_argument("--blocking", action="store_true", help="Emulate the blocking requests.post path")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.debates, args.upstream_latency, args.blocking, args.probe_seconds))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Tail latency of wrapper calls with and without hedging.
+
+The wrappers are replaced by an in-process mock transport whose latency has
+a heavy tail: most calls take about `--latency` seconds, but `--tail-rate` of
+them take `--tail-factor` times longer. The same seeded call stream is run
+through the bridge's `_call_wrapper` over `--replicas` replicas, once without
+and once with a `Hedger`, reporting p50/p99 and the share of calls hedged.
+
+    python benchmarks/bench_hedging.py --calls 1000 --replicas 2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MCP_RATE_MAX_REQUESTS", "1000000")
+
+import httpx  # noqa: E402
+
+from mcp import bridge  # noqa: E402
+from mcp.hedging import Hedger  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("mcp.bridge").setLevel(logging.WARNING)
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _install_mock_upstream(args: argparse.Namespace) -> None:
+    # Seeded per run so both runs see the same latency stream in call order
+    rng = random.Random(args.seed)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        latency = args.latency * rng.lognormvariate(0, 0.2)
+        if rng.random() < args.tail_rate:
+            latency *= args.tail_factor
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json={"output": "ok"})
+
+    bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def run(args: argparse.Namespace, hedger: Optional[Hedger]) -> dict:
+    _install_mock_upstream(args)
+    urls = [f"http://codex-{idx}/codex" for idx in range(args.replicas)]
+    bridge._balancers = {"codex": bridge._build_balancer(urls), "claude": bridge._build_balancer(urls)}
+    bridge._breakers.clear()
+    bridge._hedger = hedger
+    semaphore = asyncio.Semaphore(args.concurrency)
+    samples: List[float] = []
+
+    async def one(idx: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await bridge._call_wrapper("codex", f"benchmark prompt {idx}")
+            samples.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(idx) for idx in range(args.calls)))
+    elapsed = time.perf_counter() - started
+    await bridge._http_client.aclose()
+    bridge._http_client = None
+    result = {
+        "p50_ms": round(_percentile(samples, 50), 3),
+        "p99_ms": round(_percentile(samples, 99), 3),
+        "max_ms": round(max(samples), 3),
+        "wall_clock_s": round(elapsed, 3),
+    }
+    if hedger is not None:
+        stats = hedger.stats()
+        result.update(hedge_rate=stats["hedge_rate"], hedge_wins=stats["hedge_wins"], over_budget=stats["over_budget"])
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000, help="Wrapper calls per run")
+    parser.add_argument("--concurrency", type=int, default=20, help="Calls in flight at once")
+    parser.add_argument("--replicas", type=int, default=2, help="Mocked wrapper replicas")
+    parser.add_argument("--latency", type=float, default=0.02, help="Typical seconds per mocked CLI call")
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="Share of calls in the slow tail")
+    parser.add_argument("--tail-factor", type=float, default=5.0, help="How much slower tail calls are")
+    parser.add_argument("--percentile", type=float, default=0.9, help="Hedge after this latency quantile")
+    parser.add_argument("--max-rate", type=float, default=0.15, help="Most calls that may be hedged")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    hedger = Hedger(percentile=args.percentile, min_delay_seconds=0, max_rate=args.max_rate)
+    results = {
+        "calls": args.calls,
+        "replicas": args.replicas,
+        "without_hedging": asyncio.run(run(args, None)),
+        "with_hedging": asyncio.run(run(args, hedger)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Per-step overhead of the MCP and WebSocket transports compared with the REST endpoints.
+
+The wrappers are replaced by an in-process mock transport that answers
+immediately, so what remains is the bridge's own cost per debate step. Each
+transport starts a debate and then runs `--steps` sequential steps through
+the ASGI app (REST `/step` and `/step/stream`, MCP `tools/call` over `/mcp` as
+JSON and as an SSE stream with progress notifications, and `step` messages on
+one `/ws` connection) or through the stdio server's `serve` loop, reporting
+p50/p99 per step. Speculative steps are off so every step does the same work.
+
+    python benchmarks/bench_mcp_transport.py --steps 500
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MCP_RATE_MAX_REQUESTS", "1000000")
+os.environ.setdefault("MCP_SESSION_BACKEND", "memory")
+
+import httpx  # noqa: E402
+
+from mcp import bridge, stdio  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("mcp.bridge").setLevel(logging.WARNING)
+
+STEP = {"decision": {"type": "adopt_codex"}}
+
+
+def _upstream(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("/stream"):
+        body = json.dumps({"type": "chunk", "data": "ok"}) + "\n" + json.dumps({"type": "done", "output": "ok"}) + "\n"
+        return httpx.Response(200, content=body.encode("utf-8"), headers={"content-type": "application/x-ndjson"})
+    return httpx.Response(200, json={"output": "ok"})
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _tool_call(request_id: int, name: str, arguments: dict, progress: bool = False) -> dict:
+    params = {"name": name, "arguments": arguments}
+    if progress:
+        params["_meta"] = {"progressToken": request_id}
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": params}
+
+
+async def _measure(steps: int, step: Callable[[int], Awaitable[None]]) -> dict:
+    samples: List[float] = []
+    for idx in range(steps):
+        started = time.perf_counter()
+        await step(idx)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"p50_ms": round(_percentile(samples, 50), 3), "p99_ms": round(_percentile(samples, 99), 3)}
+
+
+async def _rest(client: httpx.AsyncClient, steps: int) -> dict:
+    headers = {"X-User-ID": "bench-rest"}
+    (await client.post("/start_debate", json={"initial_prompt": "topic"}, headers=headers)).raise_for_status()
+
+    async def step(_: int) -> None:
+        (await client.post("/step", json=STEP, headers=headers)).raise_for_status()
+
+    return await _measure(steps, step)
+
+
+async def _rest_stream(client: httpx.AsyncClient, steps: int) -> dict:
+    headers = {"X-User-ID": "bench-rest-stream"}
+    (await client.post("/start_debate", json={"initial_prompt": "topic"}, headers=headers)).raise_for_status()
+
+    async def step(_: int) -> None:
+        resp = await client.post("/step/stream", json=STEP, headers=headers)
+        if json.loads(resp.text.splitlines()[-1])["type"] != "done":
+            raise RuntimeError(resp.text)
+
+    return await _measure(steps, step)
+
+
+async def _websocket(steps: int) -> dict:
+    incoming: "asyncio.Queue[dict]" = asyncio.Queue()
+    answers: "asyncio.Queue[dict]" = asyncio.Queue()
+
+    async def send(message: dict) -> None:
+        if message["type"] == "websocket.send":
+            event = json.loads(message["text"])
+            if event["type"] in ("done", "error"):
+                answers.put_nowait(event)
+
+    async def call(message: dict) -> None:
+        incoming.put_nowait({"type": "websocket.receive", "text": json.dumps(message)})
+        answer = await answers.get()
+        if answer["type"] == "error":
+            raise RuntimeError(answer)
+
+    scope = {
+        "type": "websocket",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "scheme": "ws",
+        "path": "/ws",
+        "raw_path": b"/ws",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"x-user-id", b"bench-ws")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bridge", 80),
+        "subprotocols": [],
+    }
+    incoming.put_nowait({"type": "websocket.connect"})
+    connection = asyncio.create_task(bridge.app(scope, incoming.get, send))
+    await call({"type": "start_debate", "initial_prompt": "topic"})
+    result = await _measure(steps, lambda idx: call({"type": "step", **STEP}))
+    incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+    await connection
+    return result
+
+
+async def _mcp_http(client: httpx.AsyncClient, steps: int, progress: bool) -> dict:
+    user = "bench-mcp-sse" if progress else "bench-mcp-json"
+    headers = {"X-User-ID": user, "Accept": "application/json, text/event-stream"}
+    await client.post("/mcp", json=_tool_call(0, "start_debate", {"initial_prompt": "topic"}), headers=headers)
+
+    async def step(idx: int) -> None:
+        resp = await client.post("/mcp", json=_tool_call(idx + 1, "step", STEP, progress), headers=headers)
+        resp.raise_for_status()
+        if progress:
+            data = [line for line in resp.text.splitlines() if line.startswith("data: ")]
+            response = json.loads(data[-1][len("data: "):])
+        else:
+            response = resp.json()
+        if "error" in response:
+            raise RuntimeError(response["error"])
+
+    return await _measure(steps, step)
+
+
+async def _mcp_stdio(steps: int) -> dict:
+    reader = asyncio.StreamReader()
+    responses: "asyncio.Queue[dict]" = asyncio.Queue()
+
+    def write(data: bytes) -> None:
+        message = json.loads(data)
+        if "id" in message:
+            responses.put_nowait(message)
+
+    async def call(message: dict) -> None:
+        reader.feed_data(json.dumps(message).encode("utf-8") + b"\n")
+        response = await responses.get()
+        if "error" in response:
+            raise RuntimeError(response["error"])
+
+    server = asyncio.create_task(stdio.serve(reader, write, user_id="bench-stdio"))
+    await call(_tool_call(0, "start_debate", {"initial_prompt": "topic"}))
+    result = await _measure(steps, lambda idx: call(_tool_call(idx + 1, "step", STEP)))
+    reader.feed_eof()
+    await server
+    return result
+
+
+async def run(args: argparse.Namespace) -> dict:
+    bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(_upstream))
+    bridge._speculator = None
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+    try:
+        return {
+            "steps": args.steps,
+            "rest": await _rest(client, args.steps),
+            "rest_stream": await _rest_stream(client, args.steps),
+            "websocket": await _websocket(args.steps),
+            "mcp_http_json": await _mcp_http(client, args.steps, progress=False),
+            "mcp_http_sse_progress": await _mcp_http(client, args.steps, progress=True),
+            "mcp_stdio": await _mcp_stdio(args.steps),
+        }
+    finally:
+        await client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=500, help="Debate steps per transport")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
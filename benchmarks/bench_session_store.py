@@ -0,0 +1,104 @@
+"""
+Measure the per-/step persistence overhead of the session stores.
+
+Each simulated /step does what the bridge does: `get`, `append_turn` and
+`save`. The `sqlite-rewrite` row serialises the whole history into one row
+per step, i.e. what a naive persistent store would do, to show why the
+SQLite store appends turns instead.
+
+    python benchmarks/bench_session_store.py --steps 2000 --output-bytes 4096
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mcp.sessions import InMemorySessionStore, SessionStore, SQLiteSessionStore, Turn  # noqa: E402
+
+LIMITS = dict(ttl_seconds=3600, max_entries=10_000, max_bytes=1 << 40, max_history_turns=50)
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _bench_store(store: SessionStore, users: int, steps: int, output: str) -> List[float]:
+    for idx in range(users):
+        store.create(f"user-{idx}")
+    samples = []
+    for step in range(steps):
+        started = time.perf_counter()
+        session = store.get(f"user-{step % users}")
+        store.append_turn(session, Turn(user_instruction="adopt", codex_output=output, responder="codex"))
+        session.next_responder = "claude" if session.next_responder == "codex" else "codex"
+        store.save(session)
+        samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+
+def _bench_rewrite(path: str, users: int, steps: int, output: str) -> List[float]:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE sessions (user_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+    for idx in range(users):
+        conn.execute("INSERT INTO sessions VALUES (?, ?)", (f"user-{idx}", json.dumps({"history": []})))
+    samples = []
+    for step in range(steps):
+        user_id = f"user-{step % users}"
+        started = time.perf_counter()
+        data = json.loads(conn.execute("SELECT data FROM sessions WHERE user_id = ?", (user_id,)).fetchone()[0])
+        turn = Turn(user_instruction="adopt", codex_output=output, responder="codex")
+        data["history"] = (data["history"] + [asdict(turn)])[-LIMITS["max_history_turns"]:]
+        conn.execute("UPDATE sessions SET data = ? WHERE user_id = ?", (json.dumps(data), user_id))
+        samples.append((time.perf_counter() - started) * 1e6)
+    conn.close()
+    return samples
+
+
+def _summary(samples: List[float]) -> dict:
+    return {
+        "mean_us": round(statistics.fmean(samples), 1),
+        "p50_us": round(statistics.median(samples), 1),
+        "p99_us": round(_percentile(samples, 99), 1),
+    }
+
+
+def run(users: int, steps: int, output_bytes: int) -> dict:
+    output = "x" * output_bytes
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [
+            ("memory", lambda: _bench_store(InMemorySessionStore(**LIMITS), users, steps, output)),
+            ("sqlite", lambda: _bench_store(SQLiteSessionStore(os.path.join(tmp, "append.db"), **LIMITS),
+                                            users, steps, output)),
+            ("sqlite-rewrite", lambda: _bench_rewrite(os.path.join(tmp, "rewrite.db"), users, steps, output)),
+        ]
+        for name, bench in backends:
+            results[name] = _summary(bench())
+    return {"users": users, "steps": steps, "output_bytes": output_bytes, "per_step": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="Sessions the steps are spread across")
+    parser.add_argument("--steps", type=int, default=2000, help="Simulated /step calls per backend")
+    parser.add_argument("--output-bytes", type=int, default=4096, help="Size of each stored model output")
+    args = parser.parse_args()
+    print(json.dumps(run(args.users, args.steps, args.output_bytes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Stand-in for the `codex` / `claude` CLIs with programmable latency, output size and failure rate.
+
+Reads the prompt from stdin like the real CLIs, waits, and writes
+`--output-bytes` of text to stdout in `--chunks` pieces spread over the
+latency, or fails with exit code 1 and a message on stderr. The latency and
+the failure are drawn from a generator seeded with `--seed` and the prompt,
+so the same prompt behaves the same way in every run. Stdlib only, to keep
+its own start-up cost close to a bare interpreter.
+
+Point a wrapper at it with `CODEX_CLI_COMMAND` / `CLAUDE_CLI_COMMAND`:
+
+    CODEX_CLI_COMMAND="python benchmarks/fake_cli.py --latency lognormal:2,0.5 --failure-rate 0.01" \\
+        python host_wrappers/codex_wrapper.py
+
+Latency distributions (seconds): `const:S`, `uniform:LOW,HIGH`,
+`normal:MEAN,STDEV`, `lognormal:MEDIAN,SIGMA`, `exp:MEAN`. Samples below
+zero are clamped to zero.
+"""
+
+import argparse
+import hashlib
+import math
+import random
+import sys
+import time
+from typing import Callable
+
+_DISTRIBUTIONS = {
+    "const": (1, lambda rng, s: s),
+    "uniform": (2, lambda rng, low, high: rng.uniform(low, high)),
+    "normal": (2, lambda rng, mean, stdev: rng.gauss(mean, stdev)),
+    "lognormal": (2, lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma)),
+    "exp": (1, lambda rng, mean: rng.expovariate(1 / mean) if mean > 0 else 0.0),
+}
+
+
+def latency_sampler(spec: str) -> Callable[[random.Random], float]:
+    """Parse `name:arg[,arg]` into a function drawing one latency from a generator."""
+    name, _, args = spec.partition(":")
+    if name not in _DISTRIBUTIONS:
+        raise argparse.ArgumentTypeError(f"unknown distribution {name!r}; use one of {', '.join(_DISTRIBUTIONS)}")
+    arity, draw = _DISTRIBUTIONS[name]
+    try:
+        params = [float(arg) for arg in args.split(",")] if args else []
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid latency parameters: {spec!r}")
+    if len(params) != arity:
+        raise argparse.ArgumentTypeError(f"{name} takes {arity} parameter(s): {spec!r}")
+    return lambda rng: max(0.0, draw(rng, *params))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=latency_sampler, default="const:0", help="Latency distribution")
+    parser.add_argument("--output-bytes", type=int, default=1024, help="Bytes written to stdout")
+    parser.add_argument("--chunks", type=int, default=1, help="Pieces the output is written in")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of runs that fail (0-1)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed combined with the prompt")
+    args = parser.parse_args()
+
+    prompt = sys.stdin.buffer.read()
+    digest = hashlib.sha256(args.seed.to_bytes(8, "big", signed=True) + prompt).digest()
+    rng = random.Random(int.from_bytes(digest[:8], "big"))
+    latency = args.latency(rng)
+    failed = rng.random() < args.failure_rate
+    chunks = max(1, args.chunks)
+
+    if failed:
+        time.sleep(latency)
+        sys.stderr.write("fake CLI failure\n")
+        return 1
+    line = digest.hex() + "\n"  # ASCII, so characters and bytes agree
+    output = (line * (args.output_bytes // len(line) + 1))[: args.output_bytes]
+    size = math.ceil(len(output) / chunks) if output else 0
+    for idx in range(chunks):
+        time.sleep(latency / chunks)
+        sys.stdout.write(output[idx * size:(idx + 1) * size])
+        sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
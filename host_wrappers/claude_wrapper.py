@@ -3,26 +3,64 @@ FastAPI wrapper for running the `claudecode` CLI via HTTP.
 """
 
 import os
+import shlex
 import subprocess
-from typing import Dict, List, Literal
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
 
-from fastapi import Depends, FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field, conlist
 
 from common import (
     AUTH_TOKEN,
+    CACHE_TTL_SECONDS,
+    CANCELLED_RUNS,
+    DEADLINES,
+    FIRST_BYTE_LATENCY,
     MAX_BODY_BYTES,
+    METRICS,
+    RATE_LIMIT_MAX_CLIENTS,
     RATE_LIMIT_MAX_REQUESTS,
     RATE_LIMIT_WINDOW,
+    REQUESTS,
+    RETRY_GRACE_SECONDS,
+    RUN_LATENCY,
+    TRACER,
+    WARM_POOL_MIN,
+    CachedCall,
+    CLIRun,
+    ConcurrencyLimiter,
+    ResponseCache,
+    TokenBucketLimiter,
+    WarmCLIPool,
     build_safe_env,
+    cached_call,
     make_rate_and_size_guard,
+    open_cli,
+    serve_buffered,
+    stream_cli_events,
     verify_token,
 )
+from metrics import CONTENT_TYPE, Registry, RequestMetrics
+from singleflight import SingleFlight
+from tracing import TraceRequests
 
-CLI_COMMAND = ["claude", "-p"]
+# e.g. a different binary path, or benchmarks/fake_cli.py for load tests
+CLI_COMMAND = shlex.split(os.getenv("CLAUDE_CLI_COMMAND", "")) or ["claude", "-p"]
 TIMEOUT_SECONDS = int(os.getenv("CLI_TIMEOUT_SECONDS", "60"))  # デフォルト60秒（CLI処理に時間がかかる場合があるため）
-_rate_log: Dict[str, List[float]] = {}
+_rate_limiter = TokenBucketLimiter(RATE_LIMIT_MAX_REQUESTS, RATE_LIMIT_WINDOW, max_clients=RATE_LIMIT_MAX_CLIENTS)
+_cli_limiter = ConcurrencyLimiter()
+_warm_pool = WarmCLIPool(CLI_COMMAND) if WARM_POOL_MIN > 0 else None
+_cache = ResponseCache() if CACHE_TTL_SECONDS > 0 else None
+_flights = SingleFlight(RETRY_GRACE_SECONDS)  # concurrent identical requests share one CLI run
+TRACER.service = "claude-wrapper"
+_gauges = Registry()
+_gauges.gauge("wrapper_cli_active", "CLI runs in progress", lambda: _cli_limiter.active)
+_gauges.gauge("wrapper_cli_waiting", "Requests queued for a CLI slot", lambda: _cli_limiter.waiting)
+_gauges.gauge(
+    "wrapper_warm_pool_idle", "Parked warm CLI processes", lambda: _warm_pool.stats()["idle"] if _warm_pool else 0
+)
 
 
 class HistoryItem(BaseModel):
@@ -39,45 +77,120 @@ class ChatResponse(BaseModel):
     output: str
 
 
-app = FastAPI(title="ClaudeCode CLI Wrapper", version="0.1.0")
+@asynccontextmanager
+async def _lifespan(_: FastAPI):
+    if _warm_pool is not None:
+        await _warm_pool.start()
+    yield
+    if _warm_pool is not None:
+        await _warm_pool.stop()
+    TRACER.flush()
+
+
+app = FastAPI(title="ClaudeCode CLI Wrapper", version="0.1.0", lifespan=_lifespan)
 app.middleware("http")(
-    make_rate_and_size_guard(
-        _rate_log,
-        max_body_bytes=MAX_BODY_BYTES,
-        window_seconds=RATE_LIMIT_WINDOW,
-        max_requests=RATE_LIMIT_MAX_REQUESTS,
-    )
+    make_rate_and_size_guard(_rate_limiter, max_body_bytes=MAX_BODY_BYTES)
 )
+app.add_middleware(RequestMetrics, counter=REQUESTS)
+app.add_middleware(TraceRequests, tracer=TRACER)
 
 
-@app.post("/claude", response_model=ChatResponse)
-async def call_claude(body: ChatRequest, _: None = Depends(verify_token)) -> JSONResponse:
-    """Execute the claudecode CLI and return its stdout."""
-    try:
-        result = subprocess.run(
-            CLI_COMMAND,
-            input=body.prompt,
-            text=True,
-            capture_output=True,
-            timeout=TIMEOUT_SECONDS,
-            check=False,
-            env=build_safe_env(),
-        )
-    except subprocess.TimeoutExpired as exc:
-        raise HTTPException(status_code=504, detail=f"claudecode CLI timed out after {TIMEOUT_SECONDS}s") from exc
-    except Exception as exc:  # pragma: no cover - defensive
-        raise HTTPException(status_code=500, detail="failed to execute claudecode CLI") from exc
+async def _open_run(prompt: str, timeout: float) -> CLIRun:
+    if _warm_pool is not None:
+        return await _warm_pool.open(prompt, timeout)
+    return await open_cli(CLI_COMMAND, prompt, timeout, env=build_safe_env())
+
+
+def _cached(body: ChatRequest, cache_control: Optional[str]) -> CachedCall:
+    history = [item.model_dump() for item in body.history]
+    return cached_call(_cache, CLI_COMMAND, body.prompt, history, cache_control)
+
+
+async def _run_cli(prompt: str, cached: CachedCall, deadline: Optional[float]) -> str:
+    async with _cli_limiter.slot():
+        timeout = DEADLINES.timeout(deadline, TIMEOUT_SECONDS)
+        try:
+            result = await (await _open_run(prompt, timeout)).collect()
+        except subprocess.TimeoutExpired as exc:
+            raise HTTPException(status_code=504, detail=f"claudecode CLI timed out after {timeout:.0f}s") from exc
+        except Exception as exc:  # pragma: no cover - defensive
+            raise HTTPException(status_code=500, detail="failed to execute claudecode CLI") from exc
 
     if result.returncode != 0:
         stderr = result.stderr.strip()
         raise HTTPException(status_code=500, detail=f"claudecode CLI failed: {stderr or 'unknown error'}")
 
-    return JSONResponse(status_code=200, content={"output": result.stdout})
+    await cached.store(result.stdout)
+    return result.stdout
+
+
+@app.post("/claude", response_model=ChatResponse)
+async def call_claude(
+    body: ChatRequest,
+    request: Request,
+    cache_control: Optional[str] = Header(default=None, alias="Cache-Control"),
+    request_deadline: Optional[str] = Header(default=None, alias="X-Request-Deadline"),
+    _: None = Depends(verify_token),
+) -> JSONResponse:
+    """Execute the claudecode CLI and return its stdout (or a cached copy).
+
+    Requests with the same cache key and `Cache-Control` policy that arrive
+    while a run is in flight attach to that run instead of starting another
+    one, unless its deadline is sooner than theirs. The CLI is killed
+    `WRAPPER_RETRY_GRACE_SECONDS` after every client waiting for it has
+    disconnected, unless a retry rejoins it. `X-Request-Deadline` (seconds
+    left for the caller) shortens the CLI timeout.
+    """
+    deadline = DEADLINES.deadline(request_deadline)
+    cached = _cached(body, cache_control)
+    return await serve_buffered(
+        request, cached, _flights, lambda: _run_cli(body.prompt, cached, deadline), deadline, TIMEOUT_SECONDS
+    )
+
+
+@app.post("/claude/stream")
+async def stream_claude(
+    body: ChatRequest,
+    cache_control: Optional[str] = Header(default=None, alias="Cache-Control"),
+    request_deadline: Optional[str] = Header(default=None, alias="X-Request-Deadline"),
+    _: None = Depends(verify_token),
+) -> StreamingResponse:
+    """Execute the claudecode CLI and stream its stdout as NDJSON events."""
+    deadline = DEADLINES.deadline(request_deadline)
+    _cli_limiter.ensure_capacity()
+    return StreamingResponse(
+        stream_cli_events(
+            lambda timeout: _open_run(body.prompt, timeout),
+            _cli_limiter,
+            "claudecode",
+            TIMEOUT_SECONDS,
+            cached=_cached(body, cache_control),
+            deadline=deadline,
+        ),
+        media_type="application/x-ndjson",
+    )
 
 
 @app.get("/health")
 async def health() -> dict:
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "cli": _cli_limiter.stats(),
+        "first_byte_ms": {path: tracker.snapshot() for path, tracker in FIRST_BYTE_LATENCY.items()},
+        "warm_pool": _warm_pool.stats() if _warm_pool is not None else None,
+        "cache": _cache.stats() if _cache is not None else None,
+        "coalescing": _flights.stats(),
+        "cancelled": CANCELLED_RUNS.snapshot(),
+        "deadline": DEADLINES.snapshot(),
+        "run_ms": RUN_LATENCY.snapshot(),
+        "tracing": TRACER.stats() if TRACER.enabled else None,
+    }
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Prometheus text-format metrics (no auth required, no per-user data)."""
+    return Response(METRICS.render() + _gauges.render(), media_type=CONTENT_TYPE)
 
 
 if __name__ == "__main__":
@@ -2,17 +2,76 @@
 Shared utilities for Codex/Claude HTTP wrappers.
 """
 
+import asyncio
+import codecs
+import hashlib
+import json
+import math
 import os
+import signal
+import subprocess
+import tempfile
 import time
-from typing import Dict, List, Optional
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple, TypeVar
 
 from fastapi import Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from latency import LatencyTracker
+from metrics import BYTES_BUCKETS, SECONDS_BUCKETS, Registry
+from ratelimit import TokenBucketLimiter
+from singleflight import SingleFlight
+from tracing import FileExporter, Tracer
 
 ALLOWED_ENV_VARS = {"PATH", "HOME", "SHELL", "LANG", "LC_ALL", "TERM"}
 AUTH_TOKEN = os.getenv("WRAPPER_AUTH_TOKEN")
 MAX_BODY_BYTES = int(os.getenv("WRAPPER_MAX_BODY_BYTES", str(16 * 1024)))  # default 16KB
 RATE_LIMIT_WINDOW = int(os.getenv("WRAPPER_RATE_WINDOW", "60"))
 RATE_LIMIT_MAX_REQUESTS = int(os.getenv("WRAPPER_RATE_MAX_REQUESTS", "30"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("WRAPPER_RATE_MAX_CLIENTS", "100000"))
+MAX_CONCURRENCY = int(os.getenv("WRAPPER_MAX_CONCURRENCY", "4"))
+MAX_QUEUE = int(os.getenv("WRAPPER_MAX_QUEUE", "16"))
+RETRY_AFTER_SECONDS = int(os.getenv("WRAPPER_RETRY_AFTER_SECONDS", "5"))
+WARM_POOL_MIN = int(os.getenv("WRAPPER_WARM_POOL_MIN", "0"))  # 0 disables the warm pool
+WARM_POOL_MAX = int(os.getenv("WRAPPER_WARM_POOL_MAX", "4"))
+WARM_POOL_IDLE_SECONDS = float(os.getenv("WRAPPER_WARM_POOL_IDLE_SECONDS", "300"))
+WARM_POOL_MAX_AGE_SECONDS = float(os.getenv("WRAPPER_WARM_POOL_MAX_AGE_SECONDS", "1800"))
+WARM_POOL_CHECK_SECONDS = float(os.getenv("WRAPPER_WARM_POOL_CHECK_SECONDS", "10"))
+CACHE_TTL_SECONDS = float(os.getenv("WRAPPER_CACHE_TTL_SECONDS", "0"))  # 0 disables the response cache
+CACHE_MEMORY_BYTES = int(os.getenv("WRAPPER_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))  # 32MB
+CACHE_DIR = os.getenv("WRAPPER_CACHE_DIR", "")  # empty: memory tier only
+CACHE_DISK_BYTES = int(os.getenv("WRAPPER_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))  # 512MB
+CACHE_NAMESPACE = os.getenv("WRAPPER_CACHE_NAMESPACE", "")  # change to invalidate after a model/config switch
+DEADLINE_MIN_SECONDS = float(os.getenv("WRAPPER_DEADLINE_MIN_SECONDS", "1"))
+# How long a run outlives its last disconnected client, so a retry can rejoin it
+RETRY_GRACE_SECONDS = float(os.getenv("WRAPPER_RETRY_GRACE_SECONDS", "5"))
+DEADLINE_PLAUSIBLE_PERCENTILE = float(os.getenv("WRAPPER_DEADLINE_PLAUSIBLE_PERCENTILE", "0.05"))
+TRACE_FILE = os.getenv("WRAPPER_TRACE_FILE", "")  # OTLP/JSON lines; empty disables tracing
+
+T = TypeVar("T")
+
+# Per-process metrics shared by both wrappers; each wrapper adds gauges for its own limiter and pool
+METRICS = Registry()
+REQUESTS = METRICS.counter(
+    "wrapper_requests_total", "HTTP requests by route and status", ("method", "endpoint", "status")
+)
+RATE_LIMITED = METRICS.counter("wrapper_rate_limited_total", "Requests rejected by the rate limiter")
+CLI_SPAWN_SECONDS = METRICS.histogram("wrapper_cli_spawn_seconds", "Time to start a CLI process", SECONDS_BUCKETS)
+CLI_FIRST_BYTE_SECONDS = METRICS.histogram(
+    "wrapper_cli_first_byte_seconds",
+    "Time from the start of a run to the CLI's first stdout byte (cold: spawned for the run, warm: from the pool)",
+    SECONDS_BUCKETS,
+    ("pool",),
+)
+CLI_RUN_SECONDS = METRICS.histogram(
+    "wrapper_cli_run_seconds", "Total time of a CLI run by outcome", SECONDS_BUCKETS, ("outcome",)
+)
+CLI_OUTPUT_BYTES = METRICS.histogram("wrapper_cli_output_bytes", "Stdout bytes of finished CLI runs", BYTES_BUCKETS)
+# Each wrapper renames the service; only one wrapper runs per process
+TRACER = Tracer("host-wrapper", FileExporter(TRACE_FILE) if TRACE_FILE else None)
 
 
 def build_safe_env() -> dict:
@@ -31,21 +90,20 @@ def verify_token(token: Optional[str] = Header(default=None, alias="X-Auth-Token
 
 
 def make_rate_and_size_guard(
-    rate_log: Dict[str, List[float]],
+    limiter: TokenBucketLimiter,
     max_body_bytes: int = MAX_BODY_BYTES,
-    window_seconds: int = RATE_LIMIT_WINDOW,
-    max_requests: int = RATE_LIMIT_MAX_REQUESTS,
 ):
     """Build a middleware that enforces rate limiting and body size caps."""
 
     async def _guard(request: Request, call_next):
         client_ip = request.client.host if request.client else "unknown"
-        now = time.time()
-        entries = rate_log.setdefault(client_ip, [])
-        entries[:] = [ts for ts in entries if now - ts < window_seconds]
-        if len(entries) >= max_requests:
-            raise HTTPException(status_code=429, detail="rate limit exceeded")
-        entries.append(now)
+        if not limiter.allow(client_ip):
+            RATE_LIMITED.inc()
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "rate limit exceeded"},
+                headers={"Retry-After": str(math.ceil(limiter.retry_after(client_ip)))},
+            )
 
         content_length = request.headers.get("content-length")
         if content_length:
@@ -63,3 +121,849 @@ def make_rate_and_size_guard(
         return await call_next(request)
 
     return _guard
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    # Once the body has been read, the next ASGI message is the disconnect
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """Await `work`, cancelling it if the client drops the connection first.
+
+    Raises HTTPException(499) after cancelling; the status is only logged,
+    since nobody is left to read the response.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.create_task(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait((task, watcher), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+    if task in done:
+        return task.result()
+    raise HTTPException(status_code=499, detail="client disconnected")
+
+
+@dataclass
+class CLIResult:
+    returncode: int
+    stdout: str
+    stderr: str
+    first_byte_ms: Optional[float] = None  # None if the CLI wrote nothing to stdout
+
+
+# Time from the start of a request's CLI run to the first stdout byte: spawn to
+# first byte for processes started per request ("cold"), checkout to first
+# byte for processes taken from the warm pool ("warm").
+FIRST_BYTE_LATENCY: Dict[str, LatencyTracker] = {"cold": LatencyTracker(), "warm": LatencyTracker()}
+# Start to exit of CLI runs that succeeded; what a new request's budget is judged against
+RUN_LATENCY = LatencyTracker()
+
+
+class DeadlinePolicy:
+    """Turn a caller's `X-Request-Deadline` into a CLI timeout, shedding hopeless work.
+
+    The header carries the seconds the caller has left (relative, so the
+    bridge container and the host need not agree on the clock); time spent
+    queueing for a slot counts against it, and it can only shorten the
+    wrapper's own timeout. A request is rejected with 504 when its remaining
+    budget is below `min_seconds` or below the `percentile` of recent
+    successful run durations: it would almost certainly time out after
+    holding a CLI slot. Requests without the header keep the plain timeout.
+    """
+
+    def __init__(
+        self,
+        min_seconds: float = DEADLINE_MIN_SECONDS,
+        percentile: float = DEADLINE_PLAUSIBLE_PERCENTILE,
+        runs: LatencyTracker = RUN_LATENCY,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.min_seconds = min_seconds
+        self.percentile = percentile
+        self._runs = runs
+        self._clock = clock
+        self.rejected = 0
+
+    def deadline(self, header: Optional[str]) -> Optional[float]:
+        """Absolute deadline (on `clock`) for a request carrying `header`, None without one."""
+        if header is None:
+            return None
+        try:
+            budget = float(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid X-Request-Deadline header")
+        if not math.isfinite(budget) or budget <= 0:
+            raise HTTPException(status_code=400, detail="invalid X-Request-Deadline header")
+        return self._clock() + budget
+
+    def min_plausible_seconds(self) -> float:
+        fastest_ms = self._runs.percentile(self.percentile)
+        return max(self.min_seconds, fastest_ms / 1000 if fastest_ms is not None else 0.0)
+
+    def timeout(self, deadline: Optional[float], default_timeout: float) -> float:
+        """CLI timeout for a request; 504 if a run could not plausibly finish before `deadline`."""
+        if deadline is None:
+            return default_timeout
+        remaining = min(deadline - self._clock(), default_timeout)
+        needed = self.min_plausible_seconds()
+        if remaining < needed:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=504,
+                detail=f"deadline too short: {max(0.0, remaining):.1f}s left, a CLI run needs about {needed:.1f}s",
+            )
+        return remaining
+
+    def snapshot(self) -> dict:
+        return {"rejected": self.rejected, "min_plausible_seconds": round(self.min_plausible_seconds(), 3)}
+
+
+DEADLINES = DeadlinePolicy()
+
+
+class CancellationTracker:
+    """CLI runs killed because every caller waiting for them went away.
+
+    `reclaimed_cli_seconds` sums the timeout budget each killed run had left:
+    the CLI time that would otherwise have been spent on an answer nobody
+    reads (an upper bound, since the CLI might have finished earlier).
+    """
+
+    def __init__(self) -> None:
+        self.killed = 0
+        self.ran_seconds = 0.0
+        self.reclaimed_seconds = 0.0
+
+    def record(self, elapsed: float, timeout: float) -> None:
+        self.killed += 1
+        self.ran_seconds += elapsed
+        self.reclaimed_seconds += max(0.0, timeout - elapsed)
+
+    def snapshot(self) -> dict:
+        return {
+            "killed": self.killed,
+            "ran_cli_seconds": round(self.ran_seconds, 3),
+            "reclaimed_cli_seconds": round(self.reclaimed_seconds, 3),
+        }
+
+
+CANCELLED_RUNS = CancellationTracker()
+
+
+class ConcurrencyLimiter:
+    """Cap concurrent CLI runs and bound the number of callers waiting for a slot.
+
+    Callers beyond `max_concurrency` wait in FIFO order; once `max_queue`
+    callers are already waiting, new ones are rejected immediately with 503
+    and a `Retry-After` header instead of piling up behind long CLI runs.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, max_queue: int = MAX_QUEUE,
+                 retry_after: int = RETRY_AFTER_SECONDS) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def ensure_capacity(self) -> None:
+        """Raise 503 if a new caller would have no room to wait."""
+        if self.active >= self.max_concurrency and self.waiting >= self.max_queue:
+            raise HTTPException(
+                status_code=503,
+                detail="CLI queue is full, retry later",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        self.ensure_capacity()
+        self.waiting += 1
+        try:
+            with TRACER.span("cli.queue", child_only=True, **{"cli.waiting": self.waiting - 1}):
+                await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+async def _spawn(command: Sequence[str], env: Optional[dict]) -> asyncio.subprocess.Process:
+    started = time.perf_counter()
+    with TRACER.span("cli.spawn", child_only=True, **{"cli.command": command[0]}):
+        proc = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env if env is not None else build_safe_env(),
+            start_new_session=True,  # own process group, so _kill also reaches the CLI's children
+        )
+    CLI_SPAWN_SECONDS.observe(time.perf_counter() - started)
+    return proc
+
+
+async def _kill(proc: asyncio.subprocess.Process) -> None:
+    if proc.returncode is None:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError, PermissionError):  # AttributeError: no killpg on Windows
+            proc.kill()
+        await proc.wait()
+
+
+class CLIRun:
+    """A CLI process that has been handed a prompt, read incrementally.
+
+    Iterate `chunks()` to receive decoded stdout as it arrives; `result` is set
+    once the stream is exhausted. Leaving the iteration early, timing out or
+    being cancelled kills the process group; runs killed by cancellation are
+    counted in `CANCELLED_RUNS`. `close()` does the same for a run that is
+    abandoned at any point, even before it is read, and releases its pool
+    slot; `collect()` always closes the run. `pool` labels the run's metrics: `cold` for
+    a process spawned for it, `warm` for one taken from the pool. Reading
+    stdout to the end is traced as a `cli.drain` span, the CLI's think time.
+    """
+
+    def __init__(
+        self,
+        proc: asyncio.subprocess.Process,
+        command: Sequence[str],
+        prompt: str,
+        timeout: float,
+        started: float,
+        tracker: Optional[LatencyTracker] = None,
+        on_done: Optional[Callable[[], None]] = None,
+        pool: str = "cold",
+    ) -> None:
+        self.proc = proc
+        self.command = list(command)
+        self.prompt = prompt
+        self.timeout = timeout
+        self.started = started
+        self.first_byte_ms: Optional[float] = None
+        self.result: Optional[CLIResult] = None
+        self._tracker = tracker
+        self._on_done = on_done
+        self._stream: Optional[AsyncIterator[str]] = None
+        self.pool = pool
+
+    async def _write_prompt(self) -> None:
+        try:
+            self.proc.stdin.write(self.prompt.encode("utf-8"))
+            await self.proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.proc.stdin.close()
+
+    def _remaining(self) -> float:
+        remaining = self.timeout - (time.perf_counter() - self.started)
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        return remaining
+
+    def chunks(self) -> AsyncIterator[str]:
+        self._stream = self._read()
+        return self._stream
+
+    async def close(self) -> None:
+        """Stop reading, kill the process group if it still runs and release the run's pool slot."""
+        try:
+            if self._stream is not None:
+                await self._stream.aclose()
+            await _kill(self.proc)
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        if self._on_done is not None:
+            self._on_done()
+            self._on_done = None
+
+    async def _read(self) -> AsyncIterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        writer = asyncio.create_task(self._write_prompt())
+        stderr_reader = asyncio.create_task(self.proc.stderr.read())
+        parts: List[str] = []
+        output_bytes = 0
+        outcome = "error"
+        # Not made current: the generator's caller would see it between chunks
+        span = TRACER.start("cli.drain", child_only=True, **{"cli.pool": self.pool})
+        try:
+            while True:
+                chunk = await asyncio.wait_for(self.proc.stdout.read(64 * 1024), self._remaining())
+                if not chunk:
+                    break
+                output_bytes += len(chunk)
+                if self.first_byte_ms is None:
+                    self.first_byte_ms = (time.perf_counter() - self.started) * 1000
+                    CLI_FIRST_BYTE_SECONDS.observe(self.first_byte_ms / 1000, self.pool)
+                    if self._tracker is not None:
+                        self._tracker.observe(self.first_byte_ms)
+                text = decoder.decode(chunk)
+                if text:
+                    parts.append(text)
+                    yield text
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                parts.append(tail)
+                yield tail
+            stderr = await asyncio.wait_for(stderr_reader, self._remaining())
+            await asyncio.wait_for(self.proc.wait(), self._remaining())
+            CLI_OUTPUT_BYTES.observe(output_bytes)
+            if self.proc.returncode == 0:
+                outcome = "ok"
+                RUN_LATENCY.observe((time.perf_counter() - self.started) * 1000)
+        except asyncio.TimeoutError as exc:
+            outcome = "timeout"
+            raise subprocess.TimeoutExpired(self.command, self.timeout) from exc
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            if self.proc.returncode is None:
+                CANCELLED_RUNS.record(time.perf_counter() - self.started, self.timeout)
+            raise
+        except GeneratorExit:
+            outcome = "cancelled"  # the reader stopped iterating
+            raise
+        finally:
+            CLI_RUN_SECONDS.observe(time.perf_counter() - self.started, outcome)
+            span.set("cli.outcome", outcome)
+            span.set("cli.first_byte_ms", self.first_byte_ms)
+            span.set("cli.output_bytes", output_bytes)
+            if outcome != "ok":
+                span.error(outcome)
+            span.end()
+            await _kill(self.proc)
+            writer.cancel()
+            stderr_reader.cancel()
+            self._release()
+        self.result = CLIResult(
+            returncode=self.proc.returncode,
+            stdout="".join(parts),
+            stderr=stderr.decode("utf-8", errors="replace"),
+            first_byte_ms=self.first_byte_ms,
+        )
+
+    async def collect(self) -> CLIResult:
+        """Drain the whole stream and return the buffered result."""
+        try:
+            async for _ in self.chunks():
+                pass
+        finally:
+            await self.close()
+        return self.result
+
+
+async def open_cli(command: Sequence[str], prompt: str, timeout: float, env: Optional[dict] = None) -> CLIRun:
+    """Spawn a CLI for `prompt` and return it for incremental reading."""
+    started = time.perf_counter()
+    proc = await _spawn(command, env)
+    return CLIRun(proc, command, prompt, timeout, started, tracker=FIRST_BYTE_LATENCY["cold"])
+
+
+async def run_cli(command: Sequence[str], prompt: str, timeout: float, env: Optional[dict] = None) -> CLIResult:
+    """Spawn a CLI with `prompt` on stdin without blocking the event loop.
+
+    Raises `subprocess.TimeoutExpired` (after killing the process) when the CLI
+    does not finish within `timeout` seconds.
+    """
+    return await (await open_cli(command, prompt, timeout, env)).collect()
+
+
+def cache_key(command: Sequence[str], prompt: str, history: Sequence[Any], namespace: str = CACHE_NAMESPACE) -> str:
+    """Content address of a CLI call: everything that determines its output."""
+    material = json.dumps(
+        {"command": list(command), "prompt": prompt, "history": list(history), "namespace": namespace},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def cache_policy(cache_control: Optional[str]) -> str:
+    """Map a request's `Cache-Control` header to `use`, `refresh` or `bypass`.
+
+    `no-store` skips the cache entirely; `no-cache` (or `max-age=0`) runs the
+    CLI but stores the fresh result.
+    """
+    directives = {d.strip().lower() for d in (cache_control or "").split(",") if d.strip()}
+    if "no-store" in directives:
+        return "bypass"
+    if "no-cache" in directives or "max-age=0" in directives:
+        return "refresh"
+    return "use"
+
+
+class ResponseCache:
+    """Two-tier cache of successful CLI outputs keyed by `cache_key`.
+
+    The memory tier is an LRU bounded by `memory_bytes`. When `directory` is
+    set, every stored output is also written there (one JSON file per key) and
+    survives restarts; the disk tier is bounded by `disk_bytes`, evicting the
+    least recently used files. Entries older than `ttl_seconds` are dropped
+    from both tiers on access. File I/O runs in a worker thread; the indexes
+    are only touched on the event loop.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        memory_bytes: int = CACHE_MEMORY_BYTES,
+        directory: str = CACHE_DIR,
+        disk_bytes: int = CACHE_DISK_BYTES,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.memory_bytes = memory_bytes
+        self.directory = directory or None
+        self.disk_bytes = disk_bytes
+        self._clock = clock
+        # key -> (output, created, size)
+        self._memory: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._memory_used = 0
+        # key -> size on disk, least recently used first
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_used = 0
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "bytes_served": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "expired": 0,
+        }
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_disk_index()
+
+    async def get(self, key: str) -> Optional[str]:
+        now = self._clock()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if now - entry[1] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                return self._served("memory_hits", entry[0])
+            self._drop_memory(key)
+            self.counters["expired"] += 1
+        if self.directory is not None and key in self._disk:
+            record = await asyncio.to_thread(self._read_file, key)
+            if record is not None and now - record["created"] < self.ttl_seconds:
+                self._disk.move_to_end(key)
+                self._remember(key, record["output"], record["created"])
+                return self._served("disk_hits", record["output"])
+            self.counters["expired"] += 1
+            self._drop_disk_index(key)
+            await asyncio.to_thread(self._remove_files, [key])
+        self.counters["misses"] += 1
+        return None
+
+    async def put(self, key: str, output: str) -> None:
+        created = self._clock()
+        self._remember(key, output, created)
+        self.counters["stores"] += 1
+        if self.directory is not None:
+            size = await asyncio.to_thread(self._write_file, key, output, created)
+            self._drop_disk_index(key)
+            self._disk[key] = size
+            self._disk_used += size
+            evicted = []
+            while self._disk_used > self.disk_bytes and len(self._disk) > 1:
+                oldest = next(iter(self._disk))
+                self._drop_disk_index(oldest)
+                evicted.append(oldest)
+            self.counters["disk_evictions"] += len(evicted)
+            if evicted:
+                await asyncio.to_thread(self._remove_files, evicted)
+
+    def stats(self) -> dict:
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "max_memory_bytes": self.memory_bytes,
+            "disk_entries": len(self._disk) if self.directory is not None else None,
+            "disk_bytes": self._disk_used if self.directory is not None else None,
+            "max_disk_bytes": self.disk_bytes if self.directory is not None else None,
+            **self.counters,
+        }
+
+    def _served(self, counter: str, output: str) -> str:
+        self.counters[counter] += 1
+        self.counters["bytes_served"] += len(output.encode("utf-8"))
+        return output
+
+    def _remember(self, key: str, output: str, created: float) -> None:
+        size = len(output.encode("utf-8"))
+        if size > self.memory_bytes:
+            return
+        self._drop_memory(key)
+        self._memory[key] = (output, created, size)
+        self._memory_used += size
+        while self._memory_used > self.memory_bytes:
+            self._drop_memory(next(iter(self._memory)))
+            self.counters["memory_evictions"] += 1
+
+    def _drop_memory(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_used -= entry[2]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load_disk_index(self) -> None:
+        found = []
+        stale_before = time.time() - _STALE_TMP_SECONDS
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    _remove_stale(os.path.join(root, name), stale_before)
+                elif name.endswith(".json"):
+                    stat = os.stat(os.path.join(root, name))
+                    found.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(found):
+            self._disk[key] = size
+            self._disk_used += size
+
+    def _read_file(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key), encoding="utf-8") as fh:
+                record = json.load(fh)
+            os.utime(self._path(key))  # keep LRU order across restarts
+            return record
+        except (OSError, ValueError):
+            return None
+
+    def _write_file(self, key: str, output: str, created: float) -> int:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump({"created": created, "output": output}, fh, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return os.path.getsize(path)
+
+    def _remove_files(self, keys: List[str]) -> None:
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _drop_disk_index(self, key: str) -> None:
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_used -= size
+
+
+# A temp file untouched for this long was left by a writer that died mid-write;
+# younger ones may belong to another worker sharing the directory.
+_STALE_TMP_SECONDS = 600.0
+
+
+def _remove_stale(path: str, stale_before: float) -> None:
+    try:
+        if os.stat(path).st_mtime < stale_before:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@dataclass
+class CachedCall:
+    """The cache decision for one wrapper request."""
+
+    cache: Optional[ResponseCache]
+    key: str
+    policy: str  # use | refresh | bypass
+
+    @property
+    def flight_key(self) -> str:
+        """Key for sharing a CLI run: requests only join runs made under the same cache policy."""
+        return f"{self.policy}:{self.key}"
+
+    @property
+    def status(self) -> str:
+        """`X-Cache` value for a response that ran the CLI."""
+        if self.cache is None:
+            return "off"
+        return "miss" if self.policy == "use" else self.policy
+
+    async def lookup(self) -> Optional[str]:
+        if self.cache is None or self.policy != "use":
+            return None
+        return await self.cache.get(self.key)
+
+    async def store(self, output: str) -> None:
+        if self.cache is not None and self.policy != "bypass":
+            await self.cache.put(self.key, output)
+
+
+def cached_call(
+    cache: Optional[ResponseCache],
+    command: Sequence[str],
+    prompt: str,
+    history: Sequence[Any],
+    cache_control: Optional[str],
+) -> CachedCall:
+    return CachedCall(cache, cache_key(command, prompt, history), cache_policy(cache_control))
+
+
+async def serve_buffered(
+    request: Request,
+    cached: CachedCall,
+    flights: SingleFlight,
+    run: Callable[[], Awaitable[str]],
+    deadline: Optional[float],
+    timeout: float,
+) -> JSONResponse:
+    """Answer a buffered wrapper request from the cache, or from a CLI run shared through `flights`.
+
+    `run` executes the CLI and stores its output through `cached`; requests
+    that cannot finish within `deadline` are rejected before they queue.
+    """
+    output = await cached.lookup()
+    if output is not None:
+        return JSONResponse(status_code=200, content={"output": output}, headers={"X-Cache": "hit"})
+
+    DEADLINES.timeout(deadline, timeout)  # shed hopeless work before it queues for a slot
+    output = await cancel_on_disconnect(request, flights.do(cached.flight_key, run, deadline))
+    with TRACER.span("serialize"):
+        return JSONResponse(status_code=200, content={"output": output}, headers={"X-Cache": cached.status})
+
+
+def ndjson_line(event: dict) -> bytes:
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def stream_cli_events(
+    open_run: Callable[[float], Awaitable[CLIRun]],
+    limiter: ConcurrencyLimiter,
+    label: str,
+    timeout: float,
+    cached: Optional[CachedCall] = None,
+    deadline: Optional[float] = None,
+) -> AsyncIterator[bytes]:
+    """Run a CLI and emit NDJSON events: `chunk`* followed by `done` or `error`.
+
+    `open_run` receives the CLI timeout once a slot is free: `timeout`, or
+    less when `deadline` is closer (see `DeadlinePolicy`). Errors after the
+    response has started cannot change the HTTP status, so they are reported
+    in-band with the status code the buffered endpoint would have used. A
+    cache hit is replayed as one chunk and a `done` event with `"cache": "hit"`.
+    """
+    started = time.perf_counter()
+    if cached is not None:
+        output = await cached.lookup()
+        if output is not None:
+            yield ndjson_line({"type": "chunk", "data": output})
+            yield ndjson_line({
+                "type": "done",
+                "output": output,
+                "first_byte_ms": None,
+                "total_ms": (time.perf_counter() - started) * 1000,
+                "cache": "hit",
+            })
+            return
+    try:
+        DEADLINES.timeout(deadline, timeout)  # shed hopeless work before it queues for a slot
+        async with limiter.slot():
+            timeout = DEADLINES.timeout(deadline, timeout)
+            run = await open_run(timeout)
+            try:
+                async for text in run.chunks():
+                    yield ndjson_line({"type": "chunk", "data": text})
+            finally:
+                await run.close()  # also when the client goes away mid-stream
+            result = run.result
+    except HTTPException as exc:
+        yield ndjson_line({"type": "error", "status": exc.status_code, "detail": exc.detail})
+        return
+    except subprocess.TimeoutExpired:
+        yield ndjson_line({"type": "error", "status": 504, "detail": f"{label} CLI timed out after {timeout:.0f}s"})
+        return
+    except Exception:  # pragma: no cover - defensive
+        yield ndjson_line({"type": "error", "status": 500, "detail": f"failed to execute {label} CLI"})
+        return
+
+    if result.returncode != 0:
+        stderr = result.stderr.strip()
+        yield ndjson_line({"type": "error", "status": 500, "detail": f"{label} CLI failed: {stderr or 'unknown error'}"})
+        return
+    if cached is not None:
+        await cached.store(result.stdout)
+    yield ndjson_line({
+        "type": "done",
+        "output": result.stdout,
+        "first_byte_ms": result.first_byte_ms,
+        "total_ms": (time.perf_counter() - started) * 1000,
+        "cache": cached.status if cached is not None else "off",
+    })
+
+
+@dataclass
+class _WarmWorker:
+    proc: asyncio.subprocess.Process
+    spawned_at: float = field(default_factory=time.monotonic)
+    idle_since: float = field(default_factory=time.monotonic)
+
+
+class WarmCLIPool:
+    """Pre-spawned CLI processes parked on stdin, ready to receive a prompt.
+
+    `codex exec` / `claude -p` are one-shot: each process answers one prompt
+    and exits. The pool overlaps their startup (interpreter, auth and config
+    loading) with idle time by spawning replacements in the background after
+    every checkout. The number of parked workers follows demand between
+    `min_size` and `max_size`; workers idle for longer than `idle_seconds`
+    above the minimum are evicted, and dead or older than `max_age_seconds`
+    ones are recycled by the periodic health check.
+    """
+
+    def __init__(
+        self,
+        command: Sequence[str],
+        min_size: int = WARM_POOL_MIN,
+        max_size: int = WARM_POOL_MAX,
+        idle_seconds: float = WARM_POOL_IDLE_SECONDS,
+        max_age_seconds: float = WARM_POOL_MAX_AGE_SECONDS,
+        check_interval: float = WARM_POOL_CHECK_SECONDS,
+        env_factory: Callable[[], dict] = build_safe_env,
+    ) -> None:
+        self.command = list(command)
+        self.min_size = max(0, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.idle_seconds = idle_seconds
+        self.max_age_seconds = max_age_seconds
+        self.check_interval = check_interval
+        self._env_factory = env_factory
+        self._idle: Deque[_WarmWorker] = deque()
+        self._busy = 0
+        self._spawning = 0
+        self._maintenance: Optional[asyncio.Task] = None
+        self._refill: Optional[asyncio.Task] = None
+        self.counters = {"spawned": 0, "warm_checkouts": 0, "cold_checkouts": 0, "evicted_idle": 0, "recycled": 0}
+
+    async def start(self) -> None:
+        await self._fill()
+        if self._maintenance is None:
+            self._maintenance = asyncio.create_task(self._maintenance_loop())
+
+    async def stop(self) -> None:
+        for task in (self._maintenance, self._refill):
+            if task is not None:
+                task.cancel()
+        self._maintenance = self._refill = None
+        while self._idle:
+            await _kill(self._idle.popleft().proc)
+
+    async def open(self, prompt: str, timeout: float) -> CLIRun:
+        """Hand `prompt` to a parked worker, spawning one if the pool is empty."""
+        started = time.perf_counter()
+        worker, warm = await self._checkout()
+        self._busy += 1
+
+        def release() -> None:
+            self._busy -= 1
+
+        pool = "warm" if warm else "cold"
+        tracker = FIRST_BYTE_LATENCY[pool]
+        return CLIRun(worker.proc, self.command, prompt, timeout, started, tracker=tracker, on_done=release, pool=pool)
+
+    async def run(self, prompt: str, timeout: float) -> CLIResult:
+        """Run `prompt` on a parked worker and return the buffered result."""
+        return await (await self.open(prompt, timeout)).collect()
+
+    async def maintain(self) -> None:
+        """One health-check pass: recycle dead/stale workers, evict idle surplus, refill."""
+        now = time.monotonic()
+        kept: Deque[_WarmWorker] = deque()
+        while self._idle:
+            worker = self._idle.popleft()
+            if worker.proc.returncode is not None or now - worker.spawned_at > self.max_age_seconds:
+                self.counters["recycled"] += 1
+                await _kill(worker.proc)
+            elif len(kept) >= self.min_size and now - worker.idle_since > self.idle_seconds:
+                self.counters["evicted_idle"] += 1
+                await _kill(worker.proc)
+            else:
+                kept.append(worker)
+        self._idle = kept
+        await self._fill()
+
+    def stats(self) -> dict:
+        return {
+            "idle": len(self._idle),
+            "busy": self._busy,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            **self.counters,
+        }
+
+    async def _checkout(self) -> Tuple[_WarmWorker, bool]:
+        worker: Optional[_WarmWorker] = None
+        while self._idle:
+            candidate = self._idle.popleft()
+            if candidate.proc.returncode is None:
+                worker = candidate
+                break
+            self.counters["recycled"] += 1
+        warm = worker is not None
+        if warm:
+            self.counters["warm_checkouts"] += 1
+        else:
+            self.counters["cold_checkouts"] += 1
+            worker = await self._spawn_worker()
+        if self._refill is None or self._refill.done():
+            self._refill = asyncio.create_task(self._fill())
+        return worker, warm
+
+    def _target_idle(self) -> int:
+        # Anticipate another wave as large as the current one, within max_size.
+        return max(0, min(self.max_size - self._busy, max(self.min_size, self._busy)))
+
+    async def _fill(self) -> None:
+        while len(self._idle) + self._spawning < self._target_idle():
+            self._spawning += 1
+            try:
+                self._idle.append(await self._spawn_worker())
+            finally:
+                self._spawning -= 1
+
+    async def _spawn_worker(self) -> _WarmWorker:
+        proc = await _spawn(self.command, self._env_factory())
+        self.counters["spawned"] += 1
+        return _WarmWorker(proc=proc)
+
+    async def _maintenance_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.maintain()
@@ -0,0 +1,45 @@
+"""
+Latency summaries shared by the MCP bridge and the host wrappers.
+
+Stdlib only, so the bridge can import it as `host_wrappers.latency` and the
+wrappers as `latency`.
+"""
+
+from collections import deque
+from typing import Deque, Optional
+
+
+class LatencyTracker:
+    """Running latency summary over a bounded window of recent samples."""
+
+    def __init__(self, window: int = 512) -> None:
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value_ms: float) -> None:
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+        self._recent.append(value_ms)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """The `p` quantile (0-1) of the recent window, or None without samples."""
+        recent = sorted(self._recent)
+        if not recent:
+            return None
+        return recent[min(len(recent) - 1, int(p * len(recent)))]
+
+    def snapshot(self) -> dict:
+        def pct(p: float) -> Optional[float]:
+            value = self.percentile(p)
+            return round(value, 3) if value is not None else None
+
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(self.max_ms, 3) if self.count else None,
+        }
@@ -0,0 +1,196 @@
+"""
+Prometheus text-format metrics shared by the MCP bridge and the host wrappers.
+
+Stdlib only, so the bridge can import it as `host_wrappers.metrics` and the
+wrappers as `metrics`. Metrics are updated from the event loop thread, so
+counters and histograms are plain dicts and lists without locks: recording
+costs a dict lookup (plus a bisect for histograms). Gauges are read from the
+components' own state when `/metrics` is scraped, so they cost nothing per
+request.
+"""
+
+import math
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+Labels = Tuple[str, ...]
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_label_text(self.labelnames, labels)} {_number(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Histogram:
+    """Observations counted into fixed buckets, per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: a count per bucket (the last one is +Inf), then the sum
+        self._values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._values.get(labels)
+        if counts is None:
+            counts = self._values[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def count(self, *labels: str) -> int:
+        counts = self._values.get(labels)
+        return int(sum(counts[:-1])) if counts is not None else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, counts in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = _label_text((*self.labelnames, "le"), (*labels, _number(bound)))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_text = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """A value read from `read()` at scrape time: a number, or a number per label combination."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        read: Callable[[], Union[float, Dict[Labels, float]]],
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.read = read
+
+    def samples(self) -> List[str]:
+        value = self.read()
+        values = value if isinstance(value, dict) else {(): value}
+        return [
+            f"{self.name}{_label_text(self.labelnames, labels)} {_number(number)}"
+            for labels, number in sorted(values.items())
+        ]
+
+
+Metric = Union[Counter, Histogram, Gauge]
+
+
+class Registry:
+    """The metrics one `/metrics` endpoint exposes."""
+
+    def __init__(self) -> None:
+        self.metrics: List[Metric] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()) -> Histogram:
+        return self._add(Histogram(name, help, buckets, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        read: Callable[[], Union[float, Dict[Labels, float]]],
+        labelnames: Sequence[str] = (),
+    ) -> Gauge:
+        return self._add(Gauge(name, help, read, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def _add(self, metric: Any) -> Any:
+        if any(existing.name == metric.name for existing in self.metrics):
+            raise ValueError(f"duplicate metric: {metric.name}")
+        self.metrics.append(metric)
+        return metric
+
+
+class RequestMetrics:
+    """ASGI middleware counting HTTP requests by method, route template and status.
+
+    The route template (`/jobs/{job_id}`, not the requested path) keeps the
+    label set bounded; requests that match no route are counted as
+    `unmatched`.
+    """
+
+    def __init__(self, app: Callable, counter: Counter) -> None:
+        self.app = app
+        self.counter = counter
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.counter.inc(scope["method"], route, str(status))
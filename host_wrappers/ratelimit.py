@@ -0,0 +1,184 @@
+"""
+Token-bucket rate limiting shared by the MCP bridge and the host wrappers.
+
+Stdlib only, so the bridge can import it as `host_wrappers.ratelimit` and the
+wrappers as `ratelimit`.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets with O(1) checks and a fixed footprint per client.
+
+    Each client may burst up to `capacity` requests and is refilled at
+    `capacity / window_seconds` tokens per second, i.e. the same sustained
+    rate as a sliding window of `capacity` requests per `window_seconds`.
+
+    A client's state is two floats. Buckets are kept in least-recently-seen
+    order; a bucket untouched for a full window has refilled completely and
+    carries no information, so it is dropped from the front of the table.
+    The table is also hard-capped at `max_clients` entries.
+    """
+
+    blocking = False  # True when checks wait on I/O; async callers then use a worker thread
+
+    def __init__(
+        self,
+        capacity: int,
+        window_seconds: float,
+        max_clients: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = float(max(1, capacity))
+        self.window_seconds = float(window_seconds)
+        self.rate = self.capacity / self.window_seconds
+        self.max_clients = max(1, max_clients)
+        self._clock = clock
+        # client -> [tokens, last_seen]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.evicted = 0
+        self.rejected = 0
+
+    def allow(self, client: str) -> bool:
+        """Consume one token for `client`; return False if none is available."""
+        now = self._clock()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = [self.capacity, now]
+            self._buckets[client] = bucket
+        else:
+            bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(client)
+        self._evict(now)
+
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return True
+        self.rejected += 1
+        return False
+
+    def retry_after(self, client: str) -> float:
+        """Seconds until `client` has a token again (0 if it has one now)."""
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            return 0.0
+        tokens = min(self.capacity, bucket[0] + (self._clock() - bucket[1]) * self.rate)
+        return max(0.0, (1.0 - tokens) / self.rate)
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if len(buckets) <= self.max_clients and now - oldest[1] < self.window_seconds:
+                return
+            buckets.popitem(last=False)
+            self.evicted += 1
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "clients": len(self._buckets), "evicted": self.evicted, "rejected": self.rejected}
+
+
+class SQLiteTokenBucketLimiter(TokenBucketLimiter):
+    """`TokenBucketLimiter` whose buckets live in a SQLite database in WAL mode.
+
+    Processes that open the same file share one bucket per client, so the
+    limit holds across all `uvicorn` workers instead of being multiplied by
+    the worker count. A check is one short `BEGIN IMMEDIATE` transaction.
+    Timestamps are wall-clock seconds because they are compared between
+    processes. Idle buckets are purged every `purge_every` checks rather than
+    on each one; `evicted` and `rejected` are per-process counters. A check
+    can wait up to 10 s for another process's lock, so it is `blocking`.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str,
+        capacity: int,
+        window_seconds: float,
+        max_clients: int = 100_000,
+        clock: Callable[[], float] = time.time,
+        purge_every: int = 256,
+    ) -> None:
+        super().__init__(capacity, window_seconds, max_clients=max_clients, clock=clock)
+        self.path = path
+        self.purge_every = max(1, purge_every)
+        self._checks = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (client TEXT PRIMARY KEY, tokens REAL NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_last_seen ON buckets (last_seen)")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def allow(self, client: str) -> bool:
+        now = self._clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                tokens = self._tokens_locked(client, now)
+                allowed = tokens >= 1.0
+                if allowed:
+                    tokens -= 1.0
+                self._conn.execute(
+                    "INSERT INTO buckets (client, tokens, last_seen) VALUES (?, ?, ?) "
+                    "ON CONFLICT (client) DO UPDATE SET tokens = excluded.tokens, last_seen = excluded.last_seen",
+                    (client, tokens, now),
+                )
+                self._checks += 1
+                if self._checks % self.purge_every == 0:
+                    self._purge_locked(now)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            if not allowed:
+                self.rejected += 1
+        return allowed
+
+    def retry_after(self, client: str) -> float:
+        with self._lock:
+            tokens = self._tokens_locked(client, self._clock())
+        return max(0.0, (1.0 - tokens) / self.rate)
+
+    def _tokens_locked(self, client: str, now: float) -> float:
+        row = self._conn.execute("SELECT tokens, last_seen FROM buckets WHERE client = ?", (client,)).fetchone()
+        if row is None:
+            return self.capacity
+        return min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+
+    def _purge_locked(self, now: float) -> None:
+        cursor = self._conn.execute("DELETE FROM buckets WHERE last_seen <= ?", (now - self.window_seconds,))
+        self.evicted += cursor.rowcount
+        excess = self._count_locked() - self.max_clients
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM buckets WHERE client IN (SELECT client FROM buckets ORDER BY last_seen LIMIT ?)",
+                (excess,),
+            )
+            self.evicted += excess
+
+    def _count_locked(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count_locked()
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "clients": len(self), "evicted": self.evicted, "rejected": self.rejected}
@@ -0,0 +1,90 @@
+"""
+In-flight request coalescing shared by the MCP bridge and the host wrappers.
+
+Stdlib only, so the bridge can import it as `host_wrappers.singleflight` and
+the wrappers as `singleflight`.
+"""
+
+import asyncio
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable hash of JSON-serialisable request parts."""
+    material = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Flight:
+    task: "asyncio.Task[Any]"
+    expires_at: Optional[float] = None  # when the work gives up; None for never
+    waiters: int = 0
+    abandoned: Optional[asyncio.TimerHandle] = None  # pending cancellation once every caller left
+
+    def outlasts(self, expires_at: Optional[float]) -> bool:
+        """Whether a caller due at `expires_at` can wait for this flight without losing time."""
+        if self.expires_at is None:
+            return True
+        return expires_at is not None and self.expires_at >= expires_at
+
+
+class SingleFlight:
+    """Run one call per key at a time and share its outcome with concurrent callers.
+
+    The first caller for a key starts the work in its own task; callers that
+    arrive while it is running await the same task and get the same result or
+    exception. A caller that is cancelled only detaches itself; the work is
+    cancelled `grace_seconds` after the last caller left, so a client that
+    retries after a disconnect rejoins the run instead of starting over.
+
+    `expires_at` (on `time.monotonic`) is when the caller's work gives up. A
+    caller only joins a flight that gives up no sooner than it would; otherwise
+    it starts a fresh flight, which later callers for the key join instead.
+    """
+
+    def __init__(self, grace_seconds: float = 0.0) -> None:
+        self.grace_seconds = grace_seconds
+        self._inflight: Dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, work: Callable[[], Awaitable[T]], expires_at: Optional[float] = None) -> T:
+        flight = self._inflight.get(key)
+        if flight is None or not flight.outlasts(expires_at):
+            flight = _Flight(task=asyncio.ensure_future(work()), expires_at=expires_at)
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _, f=flight: self._finished(key, f))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        if flight.abandoned is not None:
+            flight.abandoned.cancel()
+            flight.abandoned = None
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                if self.grace_seconds > 0:
+                    flight.abandoned = asyncio.get_running_loop().call_later(self.grace_seconds, flight.task.cancel)
+                else:
+                    flight.task.cancel()
+
+    def _finished(self, key: str, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if not flight.task.cancelled():
+            flight.task.exception()  # every waiter has already seen it
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> dict:
+        return {"inflight": len(self._inflight), "started": self.started, "coalesced": self.coalesced}
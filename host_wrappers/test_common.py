@@ -0,0 +1,289 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from fastapi import HTTPException
+
+from common import (
+    CANCELLED_RUNS,
+    FIRST_BYTE_LATENCY,
+    ConcurrencyLimiter,
+    DeadlinePolicy,
+    LatencyTracker,
+    ResponseCache,
+    WarmCLIPool,
+    cache_key,
+    cache_policy,
+    open_cli,
+    run_cli,
+    stream_cli_events,
+)
+
+
+def _is_gone(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().rsplit(")", 1)[1].split()[0] in ("Z", "X")
+    except FileNotFoundError:
+        return True
+
+
+class RunCliTests(unittest.IsolatedAsyncioTestCase):
+    async def test_prompt_is_sent_on_stdin(self):
+        command = [sys.executable, "-c", "import sys; print(sys.stdin.read().upper())"]
+        result = await run_cli(command, "hello", timeout=10, env={})
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout.strip(), "HELLO")
+
+    async def test_timeout_kills_process(self):
+        command = [sys.executable, "-c", "import time; time.sleep(30)"]
+        with self.assertRaises(subprocess.TimeoutExpired):
+            await run_cli(command, "", timeout=0.2, env={})
+
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "reads /proc")
+    async def test_cancellation_kills_the_process_group(self):
+        spawn_child = (
+            "import subprocess, sys, time;"
+            "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']);"
+            "print(child.pid, flush=True); time.sleep(30)"
+        )
+        run = await open_cli([sys.executable, "-c", spawn_child], "", timeout=30, env={})
+        first_line = asyncio.get_running_loop().create_future()
+
+        async def read() -> None:
+            async for text in run.chunks():
+                if not first_line.done():
+                    first_line.set_result(int(text.split()[0]))
+
+        reader = asyncio.create_task(read())
+        child_pid = await asyncio.wait_for(first_line, timeout=10)
+        killed_before = CANCELLED_RUNS.killed
+        reader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reader
+
+        self.assertIsNotNone(run.proc.returncode)
+        for _ in range(50):
+            if _is_gone(child_pid):
+                break
+            await asyncio.sleep(0.02)
+        self.assertTrue(_is_gone(child_pid))
+        self.assertEqual(CANCELLED_RUNS.killed, killed_before + 1)
+        self.assertGreater(CANCELLED_RUNS.snapshot()["reclaimed_cli_seconds"], 0)
+
+
+class ConcurrencyLimiterTests(unittest.IsolatedAsyncioTestCase):
+    async def test_full_queue_is_rejected_with_retry_after(self):
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=1, retry_after=7)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        running = asyncio.create_task(hold())
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        self.assertEqual(limiter.stats()["active"], 1)
+        self.assertEqual(limiter.stats()["waiting"], 1)
+
+        with self.assertRaises(HTTPException) as ctx:
+            async with limiter.slot():
+                pass
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertEqual(ctx.exception.headers["Retry-After"], "7")
+
+        release.set()
+        await asyncio.gather(running, queued)
+        self.assertEqual(limiter.stats()["active"], 0)
+
+
+ECHO_UPPER = [sys.executable, "-c", "import sys; print(sys.stdin.read().upper())"]
+SLOW_LINES = [sys.executable, "-c", "import sys, time; sys.stdin.read(); print('a', flush=True); time.sleep(30)"]
+
+
+class WarmCLIPoolTests(unittest.IsolatedAsyncioTestCase):
+    async def test_prompt_runs_on_prespawned_worker_and_pool_refills(self):
+        pool = WarmCLIPool(ECHO_UPPER, min_size=1, max_size=2, check_interval=60, env_factory=dict)
+        await pool.start()
+        try:
+            self.assertEqual(pool.stats()["idle"], 1)
+            warm_before = FIRST_BYTE_LATENCY["warm"].count
+
+            result = await pool.run("warm", timeout=10)
+
+            self.assertEqual(result.stdout.strip(), "WARM")
+            self.assertIsNotNone(result.first_byte_ms)
+            self.assertEqual(pool.stats()["warm_checkouts"], 1)
+            self.assertEqual(FIRST_BYTE_LATENCY["warm"].count, warm_before + 1)
+            await pool.maintain()
+            self.assertEqual(pool.stats()["idle"], 1)
+        finally:
+            await pool.stop()
+
+    async def test_abandoned_runs_release_their_slot(self):
+        pool = WarmCLIPool(SLOW_LINES, min_size=1, max_size=2, check_interval=60, env_factory=dict)
+        await pool.start()
+        try:
+            run = await pool.open("never read", timeout=10)
+            self.assertEqual(pool.stats()["busy"], 1)
+            await run.close()
+            self.assertEqual(pool.stats()["busy"], 0)
+            self.assertIsNotNone(run.proc.returncode)
+
+            # A streaming client that goes away after the first chunk
+            events = stream_cli_events(
+                lambda timeout: pool.open("left early", timeout), ConcurrencyLimiter(), "test", timeout=10
+            )
+            await events.__anext__()
+            self.assertEqual(pool.stats()["busy"], 1)
+            await events.aclose()
+            self.assertEqual(pool.stats()["busy"], 0)
+        finally:
+            await pool.stop()
+
+    async def test_health_check_recycles_dead_workers(self):
+        pool = WarmCLIPool([sys.executable, "-c", "pass"], min_size=1, max_size=1, check_interval=60,
+                           env_factory=dict)
+        await pool.start()
+        try:
+            await pool._idle[0].proc.wait()
+            await pool.maintain()
+            self.assertEqual(pool.stats()["recycled"], 1)
+            self.assertEqual(pool.stats()["idle"], 1)
+        finally:
+            await pool.stop()
+
+    async def test_idle_workers_above_minimum_are_evicted(self):
+        pool = WarmCLIPool(ECHO_UPPER, min_size=1, max_size=3, idle_seconds=0, check_interval=60,
+                           env_factory=dict)
+        try:
+            for _ in range(3):
+                pool._idle.append(await pool._spawn_worker())
+            await pool.maintain()
+            self.assertEqual(pool.stats()["idle"], 1)
+            self.assertEqual(pool.stats()["evicted_idle"], 2)
+        finally:
+            await pool.stop()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class DeadlinePolicyTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.runs = LatencyTracker()
+        self.policy = DeadlinePolicy(min_seconds=1, percentile=0.05, runs=self.runs, clock=self.clock)
+
+    def test_header_shortens_the_timeout_and_queueing_counts(self):
+        self.assertEqual(self.policy.timeout(self.policy.deadline(None), 60), 60)
+        deadline = self.policy.deadline("20")
+        self.assertEqual(self.policy.timeout(deadline, 60), 20)
+        self.clock.now += 5  # waited for a slot
+        self.assertEqual(self.policy.timeout(deadline, 60), 15)
+        self.assertEqual(self.policy.timeout(self.policy.deadline("600"), 60), 60)
+
+    def test_invalid_header_is_rejected(self):
+        for header in ("soon", "0", "-3", "nan", "inf"):
+            with self.assertRaises(HTTPException) as ctx:
+                self.policy.deadline(header)
+            self.assertEqual(ctx.exception.status_code, 400)
+
+    def test_budget_below_recent_run_durations_is_shed(self):
+        for ms in range(10_000, 20_000, 100):
+            self.runs.observe(ms)
+        self.assertAlmostEqual(self.policy.min_plausible_seconds(), 10.5)
+
+        self.assertEqual(self.policy.timeout(self.policy.deadline("12"), 60), 12)
+        with self.assertRaises(HTTPException) as ctx:
+            self.policy.timeout(self.policy.deadline("8"), 60)
+        self.assertEqual(ctx.exception.status_code, 504)
+        self.assertEqual(self.policy.snapshot()["rejected"], 1)
+
+
+class ResponseCacheTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+    def _cache(self, **overrides):
+        options = dict(ttl_seconds=60, memory_bytes=10**6, directory=self._tmp.name, disk_bytes=10**6,
+                       clock=self.clock)
+        options.update(overrides)
+        return ResponseCache(**options)
+
+    def test_key_covers_command_prompt_and_history(self):
+        base = cache_key(["codex", "exec"], "hi", [], namespace="")
+        self.assertEqual(base, cache_key(["codex", "exec"], "hi", [], namespace=""))
+        self.assertNotEqual(base, cache_key(["claude", "-p"], "hi", [], namespace=""))
+        self.assertNotEqual(base, cache_key(["codex", "exec"], "hi", [{"role": "user", "content": "x"}], namespace=""))
+        self.assertNotEqual(base, cache_key(["codex", "exec"], "hi", [], namespace="gpt-5"))
+
+    def test_cache_control_policies(self):
+        self.assertEqual(cache_policy(None), "use")
+        self.assertEqual(cache_policy("no-cache"), "refresh")
+        self.assertEqual(cache_policy("max-age=0"), "refresh")
+        self.assertEqual(cache_policy("no-cache, no-store"), "bypass")
+
+    async def test_memory_hit_then_ttl_expiry(self):
+        cache = self._cache(directory="")
+        await cache.put("k", "out")
+        self.assertEqual(await cache.get("k"), "out")
+        self.clock.now += 61
+        self.assertIsNone(await cache.get("k"))
+        stats = cache.stats()
+        self.assertEqual((stats["memory_hits"], stats["misses"], stats["expired"]), (1, 1, 1))
+        self.assertEqual(stats["bytes_served"], 3)
+
+    async def test_disk_tier_survives_restart(self):
+        await self._cache().put("k", "persisted")
+        cache = self._cache()
+        self.assertEqual(await cache.get("k"), "persisted")
+        self.assertEqual(cache.stats()["disk_hits"], 1)
+        self.assertEqual(await cache.get("k"), "persisted")
+        self.assertEqual(cache.stats()["memory_hits"], 1)
+
+    async def test_tiers_evict_least_recently_used(self):
+        cache = self._cache(memory_bytes=10, disk_bytes=90)
+        for key in ("a", "b", "c"):
+            await cache.put(key, key * 6)
+        stats = cache.stats()
+        self.assertEqual(stats["memory_entries"], 1)
+        self.assertLessEqual(stats["disk_bytes"], 90)
+        self.assertGreater(stats["disk_evictions"], 0)
+        self.assertFalse(os.path.exists(os.path.join(self._tmp.name, "a", "a.json")))
+        self.assertIsNone(await cache.get("a"))
+        self.assertEqual(await cache.get("c"), "cccccc")
+
+    def _tmp_files(self):
+        return sorted(name for _, _, files in os.walk(self._tmp.name) for name in files if name.endswith(".tmp"))
+
+    async def test_failed_write_leaves_no_temp_file(self):
+        cache = self._cache()
+        with self.assertRaises(UnicodeEncodeError):
+            await cache.put("k", "lone surrogate \ud800")
+        self.assertEqual(self._tmp_files(), [])
+
+    def test_startup_removes_temp_files_of_dead_writers(self):
+        for name, age in (("dead.tmp", 3600), ("writing.tmp", 0)):
+            path = os.path.join(self._tmp.name, name)
+            open(path, "w").close()
+            os.utime(path, (time.time() - age, time.time() - age))
+        self._cache()
+        self.assertEqual(self._tmp_files(), ["writing.tmp"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from metrics import Registry, RequestMetrics
+
+
+class RegistryTests(unittest.TestCase):
+    def test_counter_and_gauge_render_in_text_format(self):
+        registry = Registry()
+        requests = registry.counter("requests_total", "Requests", ("endpoint", "status"))
+        requests.inc("/step", "200")
+        requests.inc("/step", "200")
+        requests.inc('/odd"path', "500", amount=3)
+        registry.gauge("inflight", "In flight", lambda: {("codex",): 2, ("claude",): 0}, ("model",))
+
+        self.assertEqual(registry.render(), "\n".join([
+            "# HELP requests_total Requests",
+            "# TYPE requests_total counter",
+            'requests_total{endpoint="/odd\\"path",status="500"} 3',
+            'requests_total{endpoint="/step",status="200"} 2',
+            "# HELP inflight In flight",
+            "# TYPE inflight gauge",
+            'inflight{model="claude"} 0',
+            'inflight{model="codex"} 2',
+        ]) + "\n")
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        latency = registry.histogram("latency_seconds", "Latency", (0.1, 1), ("model",))
+        for value in (0.05, 0.1, 0.5, 3):
+            latency.observe(value, "codex")
+
+        self.assertEqual(latency.count("codex"), 4)
+        self.assertEqual(latency.count("claude"), 0)
+        self.assertEqual(registry.render().splitlines()[2:], [
+            'latency_seconds_bucket{model="codex",le="0.1"} 2',
+            'latency_seconds_bucket{model="codex",le="1"} 3',
+            'latency_seconds_bucket{model="codex",le="+Inf"} 4',
+            'latency_seconds_sum{model="codex"} 3.65',
+            'latency_seconds_count{model="codex"} 4',
+        ])
+
+    def test_duplicate_names_are_rejected(self):
+        registry = Registry()
+        registry.counter("x_total", "X")
+        with self.assertRaises(ValueError):
+            registry.gauge("x_total", "X", lambda: 0)
+
+
+class RequestMetricsTests(unittest.TestCase):
+    def test_requests_are_counted_by_route_template_and_status(self):
+        registry = Registry()
+        counter = registry.counter("requests_total", "Requests", ("method", "endpoint", "status"))
+        app = FastAPI()
+
+        @app.get("/jobs/{job_id}")
+        async def job(job_id: str) -> dict:
+            if job_id == "missing":
+                raise HTTPException(status_code=404, detail="unknown job")
+            return {"job_id": job_id}
+
+        app.add_middleware(RequestMetrics, counter=counter)
+        client = TestClient(app)
+        client.get("/jobs/a")
+        client.get("/jobs/b")
+        client.get("/jobs/missing")
+        client.get("/nowhere")
+
+        self.assertEqual(counter.value("GET", "/jobs/{job_id}", "200"), 2)
+        self.assertEqual(counter.value("GET", "/jobs/{job_id}", "404"), 1)
+        self.assertEqual(counter.value("GET", "unmatched", "404"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
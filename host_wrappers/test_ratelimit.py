@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from ratelimit import SQLiteTokenBucketLimiter, TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketLimiterTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_burst_up_to_capacity_then_reject(self):
+        limiter = TokenBucketLimiter(capacity=3, window_seconds=60, clock=self.clock)
+        self.assertEqual([limiter.allow("a") for _ in range(4)], [True, True, True, False])
+        self.assertTrue(limiter.allow("b"))
+        self.assertEqual(limiter.stats()["rejected"], 1)
+
+    def test_tokens_refill_at_window_rate(self):
+        limiter = TokenBucketLimiter(capacity=3, window_seconds=60, clock=self.clock)
+        for _ in range(3):
+            limiter.allow("a")
+        self.assertAlmostEqual(limiter.retry_after("a"), 20.0)
+        self.clock.now += 20
+        self.assertTrue(limiter.allow("a"))
+        self.assertFalse(limiter.allow("a"))
+
+    def test_idle_clients_are_evicted(self):
+        limiter = TokenBucketLimiter(capacity=3, window_seconds=60, clock=self.clock)
+        limiter.allow("old")
+        self.clock.now += 30
+        limiter.allow("recent")
+        self.clock.now += 31
+        limiter.allow("new")
+        self.assertEqual(len(limiter), 2)
+        self.assertEqual(limiter.stats()["evicted"], 1)
+
+    def test_client_table_is_capped(self):
+        limiter = TokenBucketLimiter(capacity=3, window_seconds=60, max_clients=100, clock=self.clock)
+        for idx in range(1000):
+            limiter.allow(f"10.0.{idx // 256}.{idx % 256}")
+        self.assertEqual(len(limiter), 100)
+
+
+class SQLiteTokenBucketLimiterTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "ratelimit.db")
+        self._limiters = []
+
+    def tearDown(self):
+        for limiter in self._limiters:
+            limiter.close()
+        self._tmp.cleanup()
+
+    def _limiter(self, **overrides):
+        options = dict(capacity=3, window_seconds=60, clock=self.clock)
+        options.update(overrides)
+        limiter = SQLiteTokenBucketLimiter(self.path, **options)
+        self._limiters.append(limiter)
+        return limiter
+
+    def test_buckets_are_shared_between_instances(self):
+        first, second = self._limiter(), self._limiter()
+        self.assertEqual([first.allow("a"), second.allow("a"), first.allow("a")], [True, True, True])
+        self.assertFalse(second.allow("a"))
+        self.assertAlmostEqual(first.retry_after("a"), 20.0)
+        self.clock.now += 20
+        self.assertTrue(first.allow("a"))
+
+    def test_idle_and_excess_clients_are_purged(self):
+        limiter = self._limiter(max_clients=2, purge_every=1)
+        limiter.allow("old")
+        self.clock.now += 61
+        for client in ("b", "c", "d"):
+            self.clock.now += 1
+            limiter.allow(client)
+        self.assertEqual(len(limiter), 2)
+        self.assertEqual(limiter.stats()["evicted"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
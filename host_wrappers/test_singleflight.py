@@ -0,0 +1,108 @@
+import asyncio
+import unittest
+
+from singleflight import SingleFlight, fingerprint
+
+
+class SingleFlightTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.flights = SingleFlight()
+        self.release = asyncio.Event()
+        self.runs = 0
+
+    async def _work(self):
+        self.runs += 1
+        await self.release.wait()
+        return f"result {self.runs}"
+
+    async def test_concurrent_callers_share_one_run(self):
+        callers = [asyncio.create_task(self.flights.do("k", self._work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await asyncio.gather(*callers), ["result 1"] * 3)
+        self.assertEqual(self.flights.stats(), {"inflight": 0, "started": 1, "coalesced": 2})
+
+        # Once finished, the same key runs again
+        self.assertEqual(await self.flights.do("k", self._work), "result 2")
+
+    async def test_failure_is_shared(self):
+        async def failing():
+            await self.release.wait()
+            raise RuntimeError("cli failed")
+
+        callers = [asyncio.create_task(self.flights.do("k", failing)) for _ in range(2)]
+        await asyncio.sleep(0)
+        self.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(len(self.flights), 0)
+
+    async def test_work_survives_until_the_last_caller_leaves(self):
+        first = asyncio.create_task(self.flights.do("k", self._work))
+        second = asyncio.create_task(self.flights.do("k", self._work))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        self.assertEqual(len(self.flights), 1)
+        self.release.set()
+        self.assertEqual(await second, "result 1")
+
+    async def test_work_is_cancelled_when_every_caller_leaves(self):
+        caller = asyncio.create_task(self.flights.do("k", self._work))
+        await asyncio.sleep(0)
+        caller.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(self.flights), 0)
+
+    async def test_retry_within_the_grace_period_rejoins_the_run(self):
+        flights = SingleFlight(grace_seconds=0.05)
+        caller = asyncio.create_task(flights.do("k", self._work))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0.01)
+        retry = asyncio.create_task(flights.do("k", self._work))
+        await asyncio.sleep(0.1)  # past the grace period of the first caller
+        self.release.set()
+        self.assertEqual(await retry, "result 1")
+        self.assertEqual(flights.stats(), {"inflight": 0, "started": 1, "coalesced": 1})
+
+    async def test_abandoned_work_is_cancelled_after_the_grace_period(self):
+        flights = SingleFlight(grace_seconds=0.05)
+        caller = asyncio.create_task(flights.do("k", self._work))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(flights), 1)
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(flights), 0)
+
+    async def test_callers_only_join_flights_that_last_as_long(self):
+        async def run(label):
+            await self.release.wait()
+            return label
+
+        def caller(label, expires_at=None):
+            return asyncio.create_task(self.flights.do("k", lambda: run(label), expires_at=expires_at))
+
+        callers = [caller("short", 10.0)]
+        await asyncio.sleep(0)
+        callers += [caller("longer", 20.0)]  # would lose time behind the 10s flight
+        await asyncio.sleep(0)
+        callers += [caller("unbounded")]
+        await asyncio.sleep(0)
+        callers += [caller("shorter", 15.0)]  # joins the unbounded flight
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await asyncio.gather(*callers), ["short", "longer", "unbounded", "unbounded"])
+        self.assertEqual(self.flights.stats(), {"inflight": 0, "started": 3, "coalesced": 1})
+
+    def test_fingerprint_is_order_sensitive_and_stable(self):
+        self.assertEqual(fingerprint("url", "prompt"), fingerprint("url", "prompt"))
+        self.assertNotEqual(fingerprint("url", "prompt"), fingerprint("prompt", "url"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from tracing import KIND_CLIENT, KIND_SERVER, STATUS_ERROR, FileExporter, Tracer, TraceRequests, parse_traceparent
+
+PARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+class _Collector:
+    def __init__(self):
+        self.batches = []
+
+    def export(self, service, spans):
+        self.batches.append((service, [span.to_otlp() for span in spans]))
+
+    def spans(self):
+        return {span["name"]: span for _, batch in self.batches for span in batch}
+
+
+class TraceparentTests(unittest.TestCase):
+    def test_valid_header_is_parsed(self):
+        self.assertEqual(parse_traceparent(PARENT), ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331"))
+
+    def test_malformed_headers_are_ignored(self):
+        for header in (None, "", "garbage", "00-abc-def-01", f"00-{'0' * 32}-b7ad6b7169203331-01", "ff" + PARENT[2:]):
+            self.assertIsNone(parse_traceparent(header), header)
+
+
+class TracerTests(unittest.TestCase):
+    def test_nested_spans_share_the_trace_and_are_exported_with_the_root(self):
+        collector = _Collector()
+        tracer = Tracer("bridge", collector)
+        with tracer.span("POST /step", KIND_SERVER) as root:
+            with tracer.span("wrapper.call", KIND_CLIENT, model="codex") as call:
+                headers = tracer.headers()
+            self.assertEqual(collector.batches, [])  # children wait for their root
+        self.assertIsNone(tracer.current())
+
+        service, spans = collector.batches[0]
+        self.assertEqual(service, "bridge")
+        self.assertEqual([span["name"] for span in spans], ["wrapper.call", "POST /step"])
+        self.assertEqual(spans[0]["traceId"], spans[1]["traceId"])
+        self.assertEqual(spans[0]["parentSpanId"], root.span_id)
+        self.assertNotIn("parentSpanId", spans[1])
+        self.assertEqual(spans[0]["attributes"], [{"key": "model", "value": {"stringValue": "codex"}}])
+        self.assertEqual(headers, {"traceparent": call.traceparent})
+
+    def test_remote_parent_and_errors(self):
+        collector = _Collector()
+        tracer = Tracer("wrapper", collector)
+        with self.assertRaises(RuntimeError):
+            with tracer.span("POST /codex", KIND_SERVER, parse_traceparent(PARENT)):
+                raise RuntimeError("boom")
+
+        span = collector.spans()["POST /codex"]
+        self.assertEqual((span["traceId"], span["parentSpanId"]), parse_traceparent(PARENT))
+        self.assertEqual(span["status"], {"code": STATUS_ERROR, "message": "RuntimeError: boom"})
+
+    def test_tasks_inherit_the_current_span(self):
+        collector = _Collector()
+        tracer = Tracer("bridge", collector)
+
+        async def call(model):
+            with tracer.span(model):
+                await asyncio.sleep(0)
+
+        async def main():
+            with tracer.span("turn") as turn:
+                await asyncio.gather(call("codex"), call("claude"))
+            return turn
+
+        turn = asyncio.run(main())
+        spans = collector.spans()
+        self.assertEqual(spans["codex"]["parentSpanId"], turn.span_id)
+        self.assertEqual(spans["claude"]["parentSpanId"], turn.span_id)
+
+    def test_disabled_tracer_records_nothing(self):
+        tracer = Tracer("bridge")
+        with tracer.span("POST /step") as span:
+            span.set("ignored", 1)
+            self.assertEqual(tracer.headers(), {})
+        self.assertEqual(tracer.start("orphan", child_only=True).traceparent, None)
+        self.assertEqual(tracer.stats(), {"started": 0, "exported": 0, "buffered": 0})
+
+    def test_file_exporter_writes_otlp_json_lines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces", "spans.jsonl")
+            exporter = FileExporter(path)
+            tracer = Tracer("bridge", exporter)
+            for name in ("first", "second"):
+                with tracer.span(name, attempts=2, ratio=0.5, cached=False):
+                    pass
+            exporter.close()
+            with open(path, encoding="utf-8") as fh:
+                lines = [json.loads(line) for line in fh]
+
+        self.assertEqual(len(lines), 2)
+        resource = lines[0]["resourceSpans"][0]
+        service = {"key": "service.name", "value": {"stringValue": "bridge"}}
+        self.assertEqual(resource["resource"]["attributes"], [service])
+        span = resource["scopeSpans"][0]["spans"][0]
+        self.assertEqual(span["name"], "first")
+        self.assertLessEqual(int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"]))
+        self.assertEqual(span["attributes"], [
+            {"key": "attempts", "value": {"intValue": "2"}},
+            {"key": "ratio", "value": {"doubleValue": 0.5}},
+            {"key": "cached", "value": {"boolValue": False}},
+        ])
+
+
+class TraceRequestsTests(unittest.TestCase):
+    def test_server_span_is_named_after_the_route_and_continues_the_trace(self):
+        collector = _Collector()
+        tracer = Tracer("wrapper", collector)
+        app = FastAPI()
+
+        @app.get("/jobs/{job_id}")
+        async def job(job_id: str) -> dict:
+            with tracer.span("lookup"):
+                return {"job_id": job_id}
+
+        app.add_middleware(TraceRequests, tracer=tracer)
+        TestClient(app).get("/jobs/a", headers={"traceparent": PARENT})
+
+        spans = collector.spans()
+        server = spans["GET /jobs/{job_id}"]
+        self.assertEqual(server["kind"], KIND_SERVER)
+        self.assertEqual(server["parentSpanId"], parse_traceparent(PARENT)[1])
+        self.assertIn({"key": "http.status_code", "value": {"intValue": "200"}}, server["attributes"])
+        self.assertEqual(spans["lookup"]["parentSpanId"], server["spanId"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import sys
+import unittest
+
+import httpx
+from fastapi.testclient import TestClient
+
+import codex_wrapper
+from common import CANCELLED_RUNS, CLI_RUN_SECONDS, DEADLINES, REQUESTS, TRACER, ResponseCache
+from tracing import parse_traceparent
+
+ECHO_UPPER = [sys.executable, "-c", "import sys; print(sys.stdin.read().upper())"]
+SLOW_ECHO = [sys.executable, "-c", "import sys, time; time.sleep(0.3); print(sys.stdin.read())"]
+SLEEPING = [sys.executable, "-c", "import time; time.sleep(30)"]
+FAILING = [sys.executable, "-c", "import sys; sys.stderr.write('bad auth'); sys.exit(3)"]
+
+
+class _SpanCollector:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, service, spans):
+        self.spans.extend(spans)
+
+
+class CodexWrapperTests(unittest.TestCase):
+    def setUp(self):
+        self._original_command = codex_wrapper.CLI_COMMAND
+        codex_wrapper.CLI_COMMAND = ECHO_UPPER
+        self.client = TestClient(codex_wrapper.app)
+
+    def tearDown(self):
+        codex_wrapper.CLI_COMMAND = self._original_command
+
+    def test_buffered_endpoint_returns_stdout(self):
+        resp = self.client.post("/codex", json={"prompt": "hi"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["output"].strip(), "HI")
+
+    def test_stream_endpoint_emits_chunks_then_done(self):
+        with self.client.stream("POST", "/codex/stream", json={"prompt": "hi"}) as resp:
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.headers["content-type"], "application/x-ndjson")
+            events = [json.loads(line) for line in resp.iter_lines() if line]
+
+        self.assertEqual(events[-1]["type"], "done")
+        self.assertEqual(events[-1]["output"].strip(), "HI")
+        self.assertIsNotNone(events[-1]["first_byte_ms"])
+        streamed = "".join(event["data"] for event in events if event["type"] == "chunk")
+        self.assertEqual(streamed, events[-1]["output"])
+
+    def test_deadline_header_bounds_the_cli_run(self):
+        codex_wrapper.CLI_COMMAND = SLEEPING
+        resp = self.client.post("/codex", json={"prompt": "hi"}, headers={"X-Request-Deadline": "1.5"})
+        self.assertEqual(resp.status_code, 504)
+        self.assertIn("timed out after 1s", resp.json()["detail"])
+
+    def test_hopeless_deadline_is_rejected_without_running_the_cli(self):
+        codex_wrapper.CLI_COMMAND = SLEEPING
+        rejected = DEADLINES.rejected
+        resp = self.client.post("/codex", json={"prompt": "hi"}, headers={"X-Request-Deadline": "0.2"})
+        self.assertEqual(resp.status_code, 504)
+        self.assertIn("deadline too short", resp.json()["detail"])
+        self.assertEqual(DEADLINES.rejected, rejected + 1)
+        self.assertEqual(self.client.get("/health").json()["deadline"]["rejected"], rejected + 1)
+
+    def test_metrics_count_requests_and_cli_runs(self):
+        ok_runs = CLI_RUN_SECONDS.count("ok")
+        requests = REQUESTS.value("POST", "/codex", "200")
+        self.client.post("/codex", json={"prompt": "metrics"})
+        codex_wrapper.CLI_COMMAND = FAILING
+        self.client.post("/codex", json={"prompt": "metrics"})
+
+        self.assertEqual(CLI_RUN_SECONDS.count("ok"), ok_runs + 1)
+        self.assertEqual(REQUESTS.value("POST", "/codex", "200"), requests + 1)
+        resp = self.client.get("/metrics")
+        self.assertTrue(resp.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('wrapper_cli_run_seconds_count{outcome="error"}', resp.text)
+        self.assertIn('wrapper_requests_total{method="POST",endpoint="/codex",status="500"}', resp.text)
+        self.assertIn("wrapper_cli_active 0", resp.text)
+
+    def test_trace_continues_the_callers_trace_down_to_the_cli(self):
+        parent = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+        collector = TRACER.exporter = _SpanCollector()
+        try:
+            self.client.post("/codex", json={"prompt": "traced"}, headers={"traceparent": parent})
+        finally:
+            TRACER.flush()
+            TRACER.exporter = None
+
+        spans = {span.name: span for span in collector.spans}
+        self.assertEqual(set(spans), {"POST /codex", "cli.queue", "cli.spawn", "cli.drain", "serialize"})
+        server = spans["POST /codex"]
+        self.assertEqual((server.trace_id, server.parent_id), parse_traceparent(parent))
+        for name in ("cli.queue", "cli.spawn", "cli.drain", "serialize"):
+            self.assertEqual(spans[name].trace_id, server.trace_id, name)
+        self.assertEqual(spans["cli.drain"].attributes["cli.outcome"], "ok")
+        self.assertIsNotNone(spans["cli.drain"].attributes["cli.first_byte_ms"])
+
+    def test_stream_endpoint_reports_cli_failure_in_band(self):
+        codex_wrapper.CLI_COMMAND = FAILING
+        with self.client.stream("POST", "/codex/stream", json={"prompt": "hi"}) as resp:
+            events = [json.loads(line) for line in resp.iter_lines() if line]
+
+        self.assertEqual(events, [{"type": "error", "status": 500, "detail": "codex CLI failed: bad auth"}])
+
+
+class CodexWrapperCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._original_command = codex_wrapper.CLI_COMMAND
+        codex_wrapper.CLI_COMMAND = ECHO_UPPER
+        codex_wrapper._cache = ResponseCache(ttl_seconds=60, directory="")
+        self.client = TestClient(codex_wrapper.app)
+
+    def tearDown(self):
+        codex_wrapper.CLI_COMMAND = self._original_command
+        codex_wrapper._cache = None
+
+    def _post(self, **headers):
+        resp = self.client.post("/codex", json={"prompt": "hi"}, headers=headers)
+        self.assertEqual(resp.status_code, 200)
+        return resp.headers["X-Cache"]
+
+    def test_repeated_prompt_is_served_from_cache(self):
+        self.assertEqual(self._post(), "miss")
+        self.assertEqual(self._post(), "hit")
+        self.assertEqual(self._post(**{"Cache-Control": "no-cache"}), "refresh")
+        self.assertEqual(self._post(**{"Cache-Control": "no-store"}), "bypass")
+        self.assertEqual(codex_wrapper._cache.stats()["stores"], 2)
+
+        with self.client.stream("POST", "/codex/stream", json={"prompt": "hi"}) as resp:
+            events = [json.loads(line) for line in resp.iter_lines() if line]
+        self.assertEqual(events[-1]["cache"], "hit")
+        self.assertEqual(events[-1]["output"].strip(), "HI")
+
+
+class CodexWrapperCoalescingTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._original_command = codex_wrapper.CLI_COMMAND
+        codex_wrapper.CLI_COMMAND = SLOW_ECHO
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=codex_wrapper.app), base_url="http://wrapper")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        codex_wrapper.CLI_COMMAND = self._original_command
+
+    async def test_identical_concurrent_requests_share_one_cli_run(self):
+        before = codex_wrapper._flights.stats()
+        responses = await asyncio.gather(
+            self.client.post("/codex", json={"prompt": "same"}),
+            self.client.post("/codex", json={"prompt": "same"}),
+            self.client.post("/codex", json={"prompt": "other"}),
+        )
+        self.assertEqual([resp.json()["output"].strip() for resp in responses], ["same", "same", "other"])
+        after = codex_wrapper._flights.stats()
+        self.assertEqual(after["started"] - before["started"], 2)
+        self.assertEqual(after["coalesced"] - before["coalesced"], 1)
+
+    async def test_requests_with_another_cache_directive_run_separately(self):
+        before = codex_wrapper._flights.stats()
+        responses = await asyncio.gather(
+            self.client.post("/codex", json={"prompt": "same"}),
+            self.client.post("/codex", json={"prompt": "same"}, headers={"Cache-Control": "no-store"}),
+        )
+        after = codex_wrapper._flights.stats()
+        self.assertEqual(after["started"] - before["started"], 2)
+        self.assertEqual(after["coalesced"] - before["coalesced"], 0)
+
+
+class CodexWrapperDisconnectTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._original_command = codex_wrapper.CLI_COMMAND
+        codex_wrapper.CLI_COMMAND = SLEEPING
+        self._grace = codex_wrapper._flights.grace_seconds
+        codex_wrapper._flights.grace_seconds = 0.1
+
+    async def asyncTearDown(self):
+        codex_wrapper.CLI_COMMAND = self._original_command
+        codex_wrapper._flights.grace_seconds = self._grace
+
+    async def test_client_disconnect_kills_the_cli(self):
+        body = json.dumps({"prompt": "abandoned"}).encode()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/codex",
+            "raw_path": b"/codex",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            "client": ("127.0.0.1", 50000),
+            "server": ("wrapper", 80),
+        }
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(0.3)  # the client gives up while the CLI is running
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        killed_before = CANCELLED_RUNS.killed
+        await asyncio.wait_for(codex_wrapper.app(scope, receive, send), timeout=10)
+        self.assertEqual(sent[0]["status"], 499)
+        for _ in range(100):
+            if CANCELLED_RUNS.killed > killed_before and codex_wrapper._cli_limiter.active == 0:
+                break
+            await asyncio.sleep(0.02)
+        self.assertEqual(CANCELLED_RUNS.killed, killed_before + 1)
+        self.assertEqual(codex_wrapper._cli_limiter.stats()["active"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
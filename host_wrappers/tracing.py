@@ -0,0 +1,288 @@
+"""
+Minimal distributed tracing shared by the MCP bridge and the host wrappers.
+
+Stdlib only, like `metrics`. Trace context crosses the HTTP hop from the
+bridge to a wrapper in a W3C `traceparent` header, and finished spans are
+written as OTLP/JSON lines (one `ExportTraceServiceRequest` per line), the
+format the OpenTelemetry Collector's `otlpjsonfile` receiver reads. Nothing
+is sent over the network, so tracing works offline.
+
+The current span is kept in a context variable, so tasks started inside a
+span (single-flight runs, `asyncio.gather`) inherit it. Without an exporter
+every span is a shared no-op and no header is sent.
+"""
+
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+TRACEPARENT = "traceparent"
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+# (trace_id, span_id) of a span in another process
+RemoteParent = Tuple[str, str]
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[RemoteParent]:
+    """The trace and parent span ids of a `traceparent` header, or None when it is missing or malformed."""
+    if not header:
+        return None
+    parts = header.strip().lower().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    trace_id, span_id = parts[1], parts[2]
+    if len(trace_id) != 32 or len(span_id) != 16:
+        return None
+    try:
+        if int(trace_id, 16) == 0 or int(span_id, 16) == 0:
+            return None
+    except ValueError:
+        return None
+    return trace_id, span_id
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+def _attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}  # int64 is a string in OTLP/JSON
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Span:
+    """One timed operation. End it once; `Tracer.span` does that for you."""
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        kind: int,
+        parent: Union["Span", RemoteParent, None],
+        attributes: Dict[str, Any],
+    ) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        if isinstance(parent, Span):
+            self.trace_id, self.parent_id, self.local_root = parent.trace_id, parent.span_id, False
+        elif parent is not None:
+            (self.trace_id, self.parent_id), self.local_root = parent, True
+        else:
+            self.trace_id, self.parent_id, self.local_root = _new_id(128), None, True
+        self.span_id = _new_id(64)
+        self.attributes = attributes
+        self.status = STATUS_OK
+        self.message = ""
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter()
+        self.end_ns: Optional[int] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def error(self, message: str) -> None:
+        self.status = STATUS_ERROR
+        self.message = message
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = self.start_ns + int((time.perf_counter() - self._started) * 1e9)
+            self.tracer._finished(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+            "status": {"code": self.status, "message": self.message} if self.message else {"code": self.status},
+        }
+        if self.parent_id is not None:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    traceparent = None
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def error(self, message: str) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+AnySpan = Union[Span, _NoopSpan]
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class FileExporter:
+    """Append finished spans to `path` as OTLP/JSON lines."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, service: str, spans: List[Span]) -> None:
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_attribute("service.name", service)]},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans]}],
+            }]
+        }
+        self._file.write(json.dumps(request, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Tracer:
+    """Creates spans for `service` and hands finished ones to `exporter` in batches.
+
+    A batch is exported when a local root span (one whose parent is in
+    another process, or that has none) ends, so each request's spans are
+    written together, or once `max_buffered` spans are waiting.
+    """
+
+    def __init__(self, service: str, exporter: Optional[Any] = None, max_buffered: int = 512) -> None:
+        self.service = service
+        self.exporter = exporter
+        self.max_buffered = max_buffered
+        self.started = 0
+        self.exported = 0
+        self._buffer: List[Span] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def current(self) -> Optional[Span]:
+        return _current.get()
+
+    def start(
+        self,
+        name: str,
+        kind: int = KIND_INTERNAL,
+        parent: Union[Span, RemoteParent, None] = None,
+        child_only: bool = False,
+        **attributes: Any,
+    ) -> AnySpan:
+        """Start a span without making it current; the caller must `end()` it.
+
+        The parent defaults to the current span. With `child_only`, a span
+        that would start a new trace is not recorded (background work such
+        as refilling a pool would otherwise produce one-span traces).
+        """
+        if self.exporter is None:
+            return NOOP_SPAN
+        if parent is None:
+            parent = _current.get()
+            if parent is None and child_only:
+                return NOOP_SPAN
+        self.started += 1
+        return Span(self, name, kind, parent, attributes)
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: int = KIND_INTERNAL,
+        parent: Union[Span, RemoteParent, None] = None,
+        child_only: bool = False,
+        **attributes: Any,
+    ) -> Iterator[AnySpan]:
+        """Run the block in a new current span, marking it as failed if the block raises."""
+        span = self.start(name, kind, parent, child_only, **attributes)
+        if span is NOOP_SPAN:
+            yield span
+            return
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.error(f"{type(exc).__name__}: {exc}".rstrip(": "))
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+
+    def headers(self) -> Dict[str, str]:
+        """The `traceparent` header for a call made from the current span."""
+        span = _current.get()
+        return {TRACEPARENT: span.traceparent} if span is not None else {}
+
+    def flush(self) -> None:
+        if self._buffer and self.exporter is not None:
+            spans, self._buffer = self._buffer, []
+            self.exporter.export(self.service, spans)
+            self.exported += len(spans)
+
+    def stats(self) -> dict:
+        return {"started": self.started, "exported": self.exported, "buffered": len(self._buffer)}
+
+    def _finished(self, span: Span) -> None:
+        self._buffer.append(span)
+        if span.local_root or len(self._buffer) >= self.max_buffered:
+            self.flush()
+
+
+class TraceRequests:
+    """ASGI middleware running each HTTP request in a server span.
+
+    The span continues the caller's trace when the request carries a
+    `traceparent` header, and is named after the route template once routing
+    has happened (`POST /step`), like `metrics.RequestMetrics`.
+    """
+
+    def __init__(self, app: Callable, tracer: Tracer) -> None:
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        header = next((value for name, value in scope["headers"] if name == b"traceparent"), None)
+        parent = parse_traceparent(header.decode("latin-1")) if header is not None else None
+
+        async def send_with_status(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                span.set("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.error(f"HTTP {message['status']}")
+            await send(message)
+
+        with self.tracer.span(scope["method"], KIND_SERVER, parent, **{"http.method": scope["method"]}) as span:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                span.name = f"{scope['method']} {route or 'unmatched'}"
+                span.set("http.route", route)
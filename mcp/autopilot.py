@@ -0,0 +1,77 @@
+"""
+Stopping rules for debates the bridge runs on its own for several rounds.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, Optional, Sequence, Set
+
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token); the CLIs do not report usage."""
+    return (len(text) + 3) // 4
+
+
+def _shingles(text: str, size: int = 3) -> Set[tuple]:
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the word trigrams of `a` and `b` (1.0 for identical texts)."""
+    left, right = _shingles(a), _shingles(b)
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+@dataclass
+class AutopilotPolicy:
+    """Decides, round by round, whether an autopilot debate keeps going.
+
+    A debate stops after `max_rounds`, or earlier when a reply contains
+    `agree_marker`, when a reply's `similarity` to another reply of this or
+    the previous rounds reaches `similarity_threshold` (the models are
+    repeating each other or themselves), when the estimated tokens of all
+    prompts and replies reach `max_tokens`, or when the time left is shorter
+    than the last round took. An empty marker, a threshold of 0 and a
+    `max_tokens` of None disable the respective rule.
+    """
+
+    max_rounds: int
+    similarity_threshold: float = 0.9
+    agree_marker: str = "[AGREE]"
+    max_tokens: Optional[int] = None
+    rounds: int = 0
+    tokens: int = 0
+    last_round_seconds: float = 0.0
+
+    def before_round(self, remaining_seconds: Optional[float]) -> Optional[str]:
+        """Why not to start another round, or None to start it."""
+        if self.rounds >= self.max_rounds:
+            return "max_rounds"
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            return "token_budget"
+        if remaining_seconds is not None and remaining_seconds <= self.last_round_seconds:
+            return "time_budget"
+        return None
+
+    def after_round(
+        self, prompts: Iterable[str], replies: Sequence[str], earlier_replies: Sequence[str], seconds: float
+    ) -> Optional[str]:
+        """Account for a finished round; why the debate has converged, or None."""
+        self.rounds += 1
+        self.last_round_seconds = seconds
+        self.tokens += sum(estimate_tokens(text) for text in (*prompts, *replies))
+        if self.agree_marker and any(self.agree_marker.lower() in reply.lower() for reply in replies):
+            return "agreed"
+        if self.similarity_threshold > 0:
+            for i, reply in enumerate(replies):
+                for other in (*replies[i + 1:], *earlier_replies):
+                    if similarity(reply, other) >= self.similarity_threshold:
+                        return "converged"
+        return None
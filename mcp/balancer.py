@@ -0,0 +1,139 @@
+"""
+Client-side load balancing over several wrapper replicas of one model.
+"""
+
+import statistics
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Sequence
+
+
+@dataclass
+class Replica:
+    url: str
+    outstanding: int = 0
+    ewma_ms: Optional[float] = None  # None until the first successful call
+    consecutive_failures: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+
+
+class LoadBalancer:
+    """Pick the replica with the fewest outstanding requests, weighted by EWMA latency.
+
+    A replica's cost is `(outstanding + 1) * ewma_ms`, so a replica that is
+    twice as slow gets about half the concurrent calls. Replicas without a
+    latency sample yet are costed at the median of the others, which lets
+    them join without being flooded. Ties go round-robin.
+
+    Health checks are passive: every call's outcome is recorded, and a replica
+    that fails `eject_after` calls in a row is ejected for `eject_seconds`,
+    doubling with each consecutive ejection up to `max_eject_seconds`. If every
+    replica is ejected or unavailable, the ones due back soonest are
+    used anyway rather than failing outright.
+
+    `is_failure` decides which exceptions count toward ejection. No exception
+    feeds the latency average, so calls cut short by the caller's own
+    deadline (mapped to False or None) leave the replica's record untouched.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        ewma_alpha: float = 0.3,
+        eject_after: int = 3,
+        eject_seconds: float = 30.0,
+        max_eject_seconds: float = 300.0,
+        is_failure: Callable[[Exception], Optional[bool]] = lambda exc: True,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not urls:
+            raise ValueError("LoadBalancer needs at least one replica URL")
+        self.replicas: List[Replica] = [Replica(url) for url in dict.fromkeys(urls)]
+        self.ewma_alpha = ewma_alpha
+        self.eject_after = max(1, eject_after)
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self._is_failure = is_failure
+        self._clock = clock
+        self._next = 0
+
+    @property
+    def urls(self) -> List[str]:
+        return [replica.url for replica in self.replicas]
+
+    def pick(self, available: Callable[[str], bool] = lambda url: True) -> Replica:
+        """The cheapest healthy replica; `available` can veto replicas (e.g. open circuits)."""
+        candidates = self._healthy(available)
+        if not candidates:
+            soonest = min(r.ejected_until for r in self.replicas)
+            candidates = [r for r in self.replicas if r.ejected_until == soonest]
+        known = [r.ewma_ms for r in self.replicas if r.ewma_ms is not None]
+        default_ms = statistics.median(known) if known else 1.0
+        start = self._next % len(self.replicas)
+        self._next += 1
+        # Rotating the scan start makes ties round-robin
+        order = {r.url: (i - start) % len(self.replicas) for i, r in enumerate(self.replicas)}
+        return min(
+            candidates,
+            key=lambda r: ((r.outstanding + 1) * (r.ewma_ms if r.ewma_ms is not None else default_ms), order[r.url]),
+        )
+
+    def has_healthy(self, available: Callable[[str], bool] = lambda url: True) -> bool:
+        """Whether `pick(available)` would find a replica without falling back to an ejected one."""
+        return bool(self._healthy(available))
+
+    @contextmanager
+    def track(self, replica: Replica) -> Iterator[None]:
+        """Count one call against `replica` and record its outcome."""
+        replica.outstanding += 1
+        replica.requests += 1
+        started = self._clock()
+        try:
+            yield
+        except Exception as exc:
+            if self._is_failure(exc):
+                self._failed(replica)
+            raise
+        finally:
+            replica.outstanding -= 1
+        self._succeeded(replica, (self._clock() - started) * 1000)
+
+    def stats(self) -> List[dict]:
+        now = self._clock()
+        return [
+            {
+                "url": r.url,
+                "outstanding": r.outstanding,
+                "ewma_ms": round(r.ewma_ms, 3) if r.ewma_ms is not None else None,
+                "ejected": r.ejected_until > now,
+                "ejections": r.ejections,
+                "requests": r.requests,
+                "failures": r.failures,
+            }
+            for r in self.replicas
+        ]
+
+    def _healthy(self, available: Callable[[str], bool]) -> List[Replica]:
+        now = self._clock()
+        return [r for r in self.replicas if r.ejected_until <= now and available(r.url)]
+
+    def _succeeded(self, replica: Replica, latency_ms: float) -> None:
+        replica.consecutive_failures = 0
+        replica.ejections = 0
+        if replica.ewma_ms is None:
+            replica.ewma_ms = latency_ms
+        else:
+            replica.ewma_ms += self.ewma_alpha * (latency_ms - replica.ewma_ms)
+
+    def _failed(self, replica: Replica) -> None:
+        replica.failures += 1
+        replica.consecutive_failures += 1
+        if replica.consecutive_failures >= self.eject_after:
+            seconds = min(self.max_eject_seconds, self.eject_seconds * 2 ** replica.ejections)
+            replica.ejected_until = self._clock() + seconds
+            replica.ejections += 1
+            replica.consecutive_failures = 0
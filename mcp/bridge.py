@@ -2,30 +2,120 @@
 Bridge MCP server exposing debate tools that call out to host CLI wrappers.
 """
 
+import asyncio
+import json
+import math
 import os
 import time
+from pathlib import Path
 import uuid
 import logging
-from dataclasses import dataclass, field
-from typing import Dict, List, Literal, Optional
-
-import requests
-from fastapi import Depends, FastAPI, Header, HTTPException, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Literal, Optional, Tuple, TypeVar
+
+import httpx
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, WebSocket
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.websockets import WebSocketState
+from pydantic import BaseModel, Field, ValidationError
+
+from host_wrappers.metrics import BYTES_BUCKETS, CONTENT_TYPE, SECONDS_BUCKETS, Registry, RequestMetrics
+from host_wrappers.ratelimit import SQLiteTokenBucketLimiter, TokenBucketLimiter
+from host_wrappers.singleflight import SingleFlight, fingerprint
+from host_wrappers.tracing import KIND_CLIENT, FileExporter, Tracer, TraceRequests
+from mcp.autopilot import AutopilotPolicy
+from mcp.balancer import LoadBalancer, Replica
+from mcp.circuit import CircuitBreaker, CircuitOpenError
+from mcp.hedging import Hedger
+from mcp.jobs import InMemoryJobStore, Job, JobConflictError, JobRunner, JobStatus, JobStore, SQLiteJobStore
+from mcp.outbox import Outbox, OutboxOverflow
+from mcp.rpc import (
+    INVALID_PARAMS,
+    PARSE_ERROR,
+    McpServer,
+    RpcError,
+    ToolContext,
+    ToolError,
+    ToolHandler,
+    error_response,
+    is_request,
+    progress_token,
+)
+from mcp.sessions import (
+    DebateSession,
+    InMemorySessionStore,
+    Mode,
+    Responder,
+    SessionStore,
+    SQLiteSessionStore,
+    Turn,
+    trim_history,
+)
+from mcp.speculation import Speculator
 
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 logger = logging.getLogger("mcp.bridge")
 
 CODEX_URL = os.getenv("CODEX_WRAPPER_URL", "http://host.docker.internal:9001/codex")
 CLAUDE_URL = os.getenv("CLAUDE_WRAPPER_URL", "http://host.docker.internal:9002/claude")
+# Comma-separated replicas of each wrapper; the single URL above when unset
+CODEX_URLS = [url.strip() for url in (os.getenv("CODEX_WRAPPER_URLS") or CODEX_URL).split(",") if url.strip()]
+CLAUDE_URLS = [url.strip() for url in (os.getenv("CLAUDE_WRAPPER_URLS") or CLAUDE_URL).split(",") if url.strip()]
+LB_EWMA_ALPHA = float(os.getenv("MCP_LB_EWMA_ALPHA", "0.3"))
+LB_EJECT_AFTER_FAILURES = int(os.getenv("MCP_LB_EJECT_AFTER_FAILURES", "3"))
+LB_EJECT_SECONDS = float(os.getenv("MCP_LB_EJECT_SECONDS", "30"))
+LB_MAX_EJECT_SECONDS = float(os.getenv("MCP_LB_MAX_EJECT_SECONDS", "300"))
 HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))  # デフォルト60秒（CLI処理に時間がかかる場合があるため）
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
 AUTH_TOKEN = os.getenv("MCP_AUTH_TOKEN")
 MAX_BODY_BYTES = int(os.getenv("MCP_MAX_BODY_BYTES", str(32 * 1024)))  # 32KB
 RATE_LIMIT_WINDOW = int(os.getenv("MCP_RATE_WINDOW", "60"))
 RATE_LIMIT_MAX_REQUESTS = int(os.getenv("MCP_RATE_MAX_REQUESTS", "20"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("MCP_RATE_MAX_CLIENTS", "100000"))
 MAX_HISTORY_TURNS = int(os.getenv("MCP_MAX_HISTORY_TURNS", "50"))
-_rate_log: Dict[str, List[float]] = {}
+SESSION_TTL_SECONDS = float(os.getenv("MCP_SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_ENTRIES = int(os.getenv("MCP_SESSION_MAX_ENTRIES", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("MCP_SESSION_MAX_BYTES", str(64 * 1024 * 1024)))  # 64MB
+BRIDGE_WORKERS = max(1, int(os.getenv("MCP_WORKERS", "1")))
+# Several workers only agree on sessions and rate limits through a shared backend
+_DEFAULT_STATE_BACKEND = "sqlite" if BRIDGE_WORKERS > 1 else "memory"
+SESSION_BACKEND = os.getenv("MCP_SESSION_BACKEND", _DEFAULT_STATE_BACKEND)  # memory | sqlite
+SESSION_DB_PATH = os.getenv("MCP_SESSION_DB_PATH", "mcp_sessions.db")
+RATE_LIMIT_BACKEND = os.getenv("MCP_RATE_BACKEND", _DEFAULT_STATE_BACKEND)  # memory | sqlite
+RATE_LIMIT_DB_PATH = os.getenv("MCP_RATE_DB_PATH", "mcp_ratelimit.db")
+AUTOPILOT_MAX_ROUNDS = int(os.getenv("MCP_AUTOPILOT_MAX_ROUNDS", "10"))
+AUTOPILOT_SIMILARITY = float(os.getenv("MCP_AUTOPILOT_SIMILARITY", "0.9"))  # 0 disables the near-duplicate stop
+AUTOPILOT_AGREE_MARKER = os.getenv("MCP_AUTOPILOT_AGREE_MARKER", "[AGREE]")  # empty disables the agreement stop
+JOB_BACKEND = os.getenv("MCP_JOB_BACKEND", _DEFAULT_STATE_BACKEND)  # memory | sqlite
+JOB_DB_PATH = os.getenv("MCP_JOB_DB_PATH", "mcp_jobs.db")
+JOB_TTL_SECONDS = float(os.getenv("MCP_JOB_TTL_SECONDS", "3600"))  # how long finished jobs can be collected
+JOB_MAX_ENTRIES = int(os.getenv("MCP_JOB_MAX_ENTRIES", "10000"))
+JOB_MAX_WAIT_SECONDS = float(os.getenv("MCP_JOB_MAX_WAIT_SECONDS", "30"))  # longest long-poll
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("MCP_JOB_POLL_INTERVAL_SECONDS", "0.25"))
+SPECULATIVE_MAX_INFLIGHT = int(os.getenv("MCP_SPECULATIVE_MAX_INFLIGHT", "0"))  # 0 disables speculation
+# Budget for a request whose client sends no X-Request-Deadline; 0 leaves such requests unbounded
+REQUEST_BUDGET_SECONDS = float(os.getenv("MCP_REQUEST_BUDGET_SECONDS", "0"))
+# How long a turn outlives its last disconnected client, so a retry can rejoin it
+RETRY_GRACE_SECONDS = float(os.getenv("MCP_RETRY_GRACE_SECONDS", "5"))
+BREAKER_WINDOW = int(os.getenv("MCP_BREAKER_WINDOW", "20"))  # 0 disables the circuit breakers
+BREAKER_MIN_CALLS = int(os.getenv("MCP_BREAKER_MIN_CALLS", "5"))
+BREAKER_ERROR_RATE = float(os.getenv("MCP_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("MCP_BREAKER_SLOW_CALL_SECONDS", str(HTTP_TIMEOUT * 0.8)))
+BREAKER_SLOW_CALL_RATE = float(os.getenv("MCP_BREAKER_SLOW_CALL_RATE", "0.8"))
+BREAKER_OPEN_SECONDS = float(os.getenv("MCP_BREAKER_OPEN_SECONDS", "10"))
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("MCP_BREAKER_HALF_OPEN_CALLS", "1"))
+HEDGE_PERCENTILE = float(os.getenv("MCP_HEDGE_PERCENTILE", "0"))  # e.g. 0.95; 0 disables hedging
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("MCP_HEDGE_MIN_DELAY_SECONDS", "1"))
+HEDGE_MIN_SAMPLES = int(os.getenv("MCP_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MAX_RATE = float(os.getenv("MCP_HEDGE_MAX_RATE", "0.1"))
+# Text a WebSocket client may fall behind by before it is disconnected
+WS_MAX_BUFFER_BYTES = int(os.getenv("MCP_WS_MAX_BUFFER_BYTES", str(1024 * 1024)))  # 1MB
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("MCP_WS_SEND_TIMEOUT_SECONDS", "30"))
+WS_MAX_PENDING = int(os.getenv("MCP_WS_MAX_PENDING", "8"))  # queued messages before reads pause
+TRACE_FILE = os.getenv("MCP_TRACE_FILE", "")  # OTLP/JSON lines; empty disables tracing
 
 
 ROLE_INSTRUCTIONS = {
@@ -45,7 +135,6 @@ ROLE_INSTRUCTIONS = {
 
 
 Role = Literal["user", "assistant", "system"]
-Mode = Literal["default", "critique", "consensus"]
 
 
 @dataclass
@@ -60,31 +149,131 @@ class ModelOutput:
     content: str
 
 
-@dataclass
-class Turn:
-    """A turn in the debate, containing alternating responses."""
-    user_instruction: str
-    codex_output: Optional[str] = None  # None if Codex didn't respond this turn
-    claude_output: Optional[str] = None  # None if Claude didn't respond this turn
-    responder: Literal["codex", "claude"] = "codex"  # Who responded in this turn
+def _check_backend(name: str, backend: str) -> None:
+    if backend not in ("memory", "sqlite"):
+        raise ValueError(f"Unknown {name}: {backend!r} (expected 'memory' or 'sqlite')")
+    if backend == "memory" and BRIDGE_WORKERS > 1:
+        logger.warning("%s=memory with MCP_WORKERS=%d: state is not shared between workers", name, BRIDGE_WORKERS)
 
 
-@dataclass
-class DebateSession:
-    active: bool = False
-    history: List[Turn] = field(default_factory=list)
-    user_id: Optional[str] = None
-    next_responder: Literal["codex", "claude"] = "codex"  # Track who should respond next
-    mode: Mode = "default"
+def _build_rate_limiter() -> TokenBucketLimiter:
+    _check_backend("MCP_RATE_BACKEND", RATE_LIMIT_BACKEND)
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteTokenBucketLimiter(
+            RATE_LIMIT_DB_PATH, RATE_LIMIT_MAX_REQUESTS, RATE_LIMIT_WINDOW, max_clients=RATE_LIMIT_MAX_CLIENTS
+        )
+    return TokenBucketLimiter(RATE_LIMIT_MAX_REQUESTS, RATE_LIMIT_WINDOW, max_clients=RATE_LIMIT_MAX_CLIENTS)
+
+
+def _build_session_store() -> SessionStore:
+    limits = dict(
+        ttl_seconds=SESSION_TTL_SECONDS,
+        max_entries=SESSION_MAX_ENTRIES,
+        max_bytes=SESSION_MAX_BYTES,
+        max_history_turns=MAX_HISTORY_TURNS,
+    )
+    _check_backend("MCP_SESSION_BACKEND", SESSION_BACKEND)
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore(SESSION_DB_PATH, **limits)
+    return InMemorySessionStore(**limits)
+
+
+def _build_job_store() -> JobStore:
+    _check_backend("MCP_JOB_BACKEND", JOB_BACKEND)
+    if JOB_BACKEND == "sqlite":
+        return SQLiteJobStore(JOB_DB_PATH, ttl_seconds=JOB_TTL_SECONDS, max_entries=JOB_MAX_ENTRIES)
+    return InMemoryJobStore(ttl_seconds=JOB_TTL_SECONDS, max_entries=JOB_MAX_ENTRIES)
+
 
+def _job_error(exc: Exception) -> dict:
+    if isinstance(exc, HTTPException):
+        return {"status": exc.status_code, "detail": exc.detail}
+    logger.exception("Debate job failed", exc_info=exc)
+    return {"status": 500, "detail": "internal error"}
 
+
+_rate_limiter = _build_rate_limiter()
 # Session storage: user_id -> DebateSession
-_sessions: Dict[str, DebateSession] = {}
+_sessions = _build_session_store()
+_speculator: Optional[Speculator] = (
+    Speculator(SPECULATIVE_MAX_INFLIGHT, ttl_seconds=SESSION_TTL_SECONDS, max_users=SESSION_MAX_ENTRIES)
+    if SPECULATIVE_MAX_INFLIGHT > 0
+    else None
+)
+# Identical requests that arrive while the first is still running share its result
+_call_flights = SingleFlight()  # wrapper calls, keyed by (model, prompt, Cache-Control)
+# buffered /start_debate and /step, keyed by (user, endpoint, body)
+_turn_flights = SingleFlight(RETRY_GRACE_SECONDS)
+# Slow wrapper calls are re-sent to another replica
+_hedger: Optional[Hedger] = (
+    Hedger(
+        percentile=HEDGE_PERCENTILE,
+        min_delay_seconds=HEDGE_MIN_DELAY_SECONDS,
+        min_samples=HEDGE_MIN_SAMPLES,
+        max_rate=HEDGE_MAX_RATE,
+    )
+    if HEDGE_PERCENTILE > 0
+    else None
+)
+_cancellations = {"client_disconnects": 0}
+_autopilot_stops: Dict[str, int] = {}  # stop reason -> autopilot runs that ended with it
+_websockets = {"connections": 0, "open": 0, "messages": 0, "merged_chunks": 0, "slow_consumer_closes": 0}
+# Turns run in the background for the /jobs endpoints
+_jobs = JobRunner(_build_job_store(), poll_interval=JOB_POLL_INTERVAL_SECONDS, describe_error=_job_error)
+# Wrapper URL -> circuit breaker, created on first use
+_breakers: Dict[str, CircuitBreaker] = {}
+# Prometheus metrics served on /metrics; gauges are read from the components when scraped
+_metrics = Registry()
+_requests_total = _metrics.counter(
+    "bridge_requests_total", "HTTP requests by route and status", ("method", "endpoint", "status")
+)
+_rate_limited_total = _metrics.counter(
+    "bridge_rate_limited_total", "Requests, WebSocket connections and turns rejected by the rate limiter"
+)
+_wrapper_call_seconds = _metrics.histogram(
+    "bridge_wrapper_call_seconds", "Wrapper call latency by model and outcome", SECONDS_BUCKETS, ("model", "outcome")
+)
+_wrapper_first_chunk_seconds = _metrics.histogram(
+    "bridge_wrapper_first_chunk_seconds",
+    "Time to the first chunk of a streamed wrapper call",
+    SECONDS_BUCKETS,
+    ("model",),
+)
+_wrapper_output_bytes = _metrics.histogram(
+    "bridge_wrapper_output_bytes", "Output bytes of successful wrapper calls", BYTES_BUCKETS, ("model",)
+)
+# Session count as of the last scrape; /metrics refreshes it off the event loop
+_scraped = {"sessions": 0}
+_metrics.gauge("bridge_sessions", "Stored debate sessions", lambda: _scraped["sessions"])
+_metrics.gauge(
+    "bridge_wrapper_inflight",
+    "Wrapper calls in flight by model",
+    lambda: {(model,): sum(r.outstanding for r in balancer.replicas) for model, balancer in _balancers.items()},
+    ("model",),
+)
+_metrics.gauge("bridge_jobs_running", "Background jobs running on this worker", lambda: _jobs.running)
+_metrics.gauge("bridge_websocket_connections", "Open WebSocket connections", lambda: _websockets["open"])
+# Spans of this worker; trace context reaches the wrappers in the traceparent header
+_tracer = Tracer("mcp-bridge", FileExporter(TRACE_FILE) if TRACE_FILE else None)
+
+T = TypeVar("T")
+
+
+async def _state_call(call: Callable[..., T], *args: Any) -> T:
+    """Call a method of a store or the rate limiter, in a worker thread if the backend is `blocking`.
+
+    The SQLite backends can wait seconds for a lock held by another worker,
+    which must not stall this worker's event loop.
+    """
+    if getattr(call.__self__, "blocking", False):
+        return await asyncio.to_thread(call, *args)
+    return call(*args)
 
 
 class StartDebateRequest(BaseModel):
     initial_prompt: str = Field(..., min_length=1, max_length=8192)  # Limit prompt size
     mode: Mode = Field(default="default", description="Debate style mode")
+    parallel: bool = Field(default=False, description="Both models answer every round concurrently")
 
 
 class Decision(BaseModel):
@@ -107,9 +296,11 @@ class TurnResponse(BaseModel):
     user_instruction: str
     codex_output: Optional[str] = None
     claude_output: Optional[str] = None
-    responder: Literal["codex", "claude"]
-    next_responder: Optional[Literal["codex", "claude"]] = None
+    responder: Responder
+    next_responder: Optional[Responder] = None
     mode: Optional[Mode] = None
+    codex_latency_ms: Optional[float] = None
+    claude_latency_ms: Optional[float] = None
 
 
 class StatusResponse(BaseModel):
@@ -118,7 +309,69 @@ class StatusResponse(BaseModel):
     message: Optional[str] = None
 
 
-app = FastAPI(title="AI Debate MCP Bridge", version="1.0.0")
+class AutopilotRequest(BaseModel):
+    rounds: int = Field(default=3, ge=1, le=AUTOPILOT_MAX_ROUNDS, description="Most rounds to run")
+    strategy: Literal["alternate", "adopt_codex", "adopt_claude"] = Field(
+        default="alternate", description="Decision for every round; alternate adopts the latest reply"
+    )
+    max_tokens: Optional[int] = Field(default=None, ge=1, description="Stop once prompts and replies reach ~this many tokens")
+    max_seconds: Optional[float] = Field(default=None, gt=0, description="Stop before a round that would not fit")
+
+
+class AutopilotResponse(BaseModel):
+    status: str
+    turns: List[TurnResponse]
+    rounds: int
+    stop_reason: Literal["max_rounds", "agreed", "converged", "token_budget", "time_budget"]
+    estimated_tokens: int
+
+
+class JobError(BaseModel):
+    status: int
+    detail: str
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: Literal["start_debate", "step"]
+    status: JobStatus
+    created_at: float
+    finished_at: Optional[float] = None
+    turn: Optional[TurnResponse] = None
+    error: Optional[JobError] = None
+
+
+# Process-wide async client: one keep-alive pool shared by all wrapper calls
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared wrapper client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _http_client
+
+
+@asynccontextmanager
+async def _lifespan(_: FastAPI):
+    global _http_client
+    yield
+    await _jobs.close()
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    _tracer.flush()
+
+
+app = FastAPI(title="AI Debate MCP Bridge", version="1.0.0", lifespan=_lifespan)
 
 
 def _verify_token(token: str = Header(default=None, alias="X-Auth-Token")) -> None:
@@ -138,10 +391,62 @@ def _get_user_id(request: Request) -> str:
     return str(uuid.uuid4())
 
 
+class DeadlineExceededError(HTTPException):
+    """504 because the client's deadline ran out; it says nothing about the wrapper's health."""
+
+    def __init__(self, detail: str = "request deadline exceeded") -> None:
+        super().__init__(status_code=504, detail=detail)
+
+
+class RequestDeadline:
+    """A client's time budget for one bridge request, shared out among its wrapper calls.
+
+    Each call gets an equal share of what is left for the sequential calls
+    still to come, so time an early call does not use carries over to the
+    later ones. Concurrent calls (parallel mode) count as one.
+    `call_budget` is the share each call started with.
+    """
+
+    def __init__(self, seconds: float, calls: int = 1, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self.expires_at = clock() + seconds
+        self.calls_left = max(1, calls)
+        self.call_budget = seconds / self.calls_left
+
+    def remaining(self) -> float:
+        return self.expires_at - self._clock()
+
+    def next_budget(self) -> float:
+        """Seconds the next wrapper call may take; 504 once the deadline has passed."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceededError()
+        budget = remaining / self.calls_left
+        self.calls_left = max(1, self.calls_left - 1)
+        return budget
+
+
+def _default_deadline(calls: int) -> Optional[RequestDeadline]:
+    return RequestDeadline(REQUEST_BUDGET_SECONDS, calls) if REQUEST_BUDGET_SECONDS > 0 else None
+
+
+def _request_deadline(request: Request, calls: int) -> Optional[RequestDeadline]:
+    """Deadline from the client's `X-Request-Deadline` (seconds left), else the configured budget."""
+    header = request.headers.get("X-Request-Deadline")
+    if header is None:
+        return _default_deadline(calls)
+    try:
+        seconds = float(header)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid X-Request-Deadline header")
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise HTTPException(status_code=400, detail="invalid X-Request-Deadline header")
+    return RequestDeadline(seconds, calls)
+
+
 def _trim_history(session: DebateSession) -> None:
     """Keep history within configured bounds."""
-    if len(session.history) > MAX_HISTORY_TURNS:
-        session.history[:] = session.history[-MAX_HISTORY_TURNS:]
+    trim_history(session, MAX_HISTORY_TURNS)
 
 
 def _mode_instruction_for(model: Literal["codex", "claude"], mode: Mode) -> str:
@@ -149,16 +454,23 @@ def _mode_instruction_for(model: Literal["codex", "claude"], mode: Mode) -> str:
     return model_map.get(model, "")
 
 
+def _with_mode_instruction(model: Literal["codex", "claude"], mode: Mode, prompt: str) -> str:
+    instruction = _mode_instruction_for(model, mode)
+    return f"{instruction}\n\n{prompt}" if instruction else prompt
+
+
 @app.middleware("http")
 async def rate_and_size_guard(request: Request, call_next):
     """Rate limiting and request size checking middleware."""
     client_ip = request.client.host if request.client else "unknown"
-    now = time.time()
-    entries = _rate_log.setdefault(client_ip, [])
-    entries[:] = [ts for ts in entries if now - ts < RATE_LIMIT_WINDOW]
-    if len(entries) >= RATE_LIMIT_MAX_REQUESTS:
-        raise HTTPException(status_code=429, detail="rate limit exceeded")
-    entries.append(now)
+    if not await _state_call(_rate_limiter.allow, client_ip):
+        _rate_limited_total.inc()
+        retry_after = await _state_call(_rate_limiter.retry_after, client_ip)
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "rate limit exceeded"},
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
 
     content_length = request.headers.get("content-length")
     if content_length:
@@ -176,28 +488,142 @@ async def rate_and_size_guard(request: Request, call_next):
     return await call_next(request)
 
 
-def call_model(url: str, prompt: str, auth_token: Optional[str] = None) -> str:
-    """Call model wrapper with optional authentication."""
-    payload = {"prompt": prompt, "history": []}
-    headers = {}
+app.add_middleware(RequestMetrics, counter=_requests_total)
+app.add_middleware(TraceRequests, tracer=_tracer)
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    # Once the body has been read, the next ASGI message is the disconnect
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _cancel_on_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """Await `work`, cancelling it if the client drops the connection first.
+
+    Cancelling aborts the in-flight wrapper requests, which in turn makes the
+    wrappers kill their CLI processes; a coalesced turn is only cancelled once
+    `MCP_RETRY_GRACE_SECONDS` pass without a retry rejoining it. Raises
+    HTTPException(499) afterwards.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.create_task(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait((task, watcher), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+    if task in done:
+        return task.result()
+    _cancellations["client_disconnects"] += 1
+    logger.info("Client disconnected, cancelled its wrapper calls", extra={"path": request.url.path})
+    raise HTTPException(status_code=499, detail="client disconnected")
+
+
+def _wrapper_headers(
+    auth_token: Optional[str], cache_control: Optional[str], deadline: Optional[float] = None
+) -> Dict[str, str]:
+    headers = _tracer.headers()
     if auth_token:
         headers["X-Auth-Token"] = auth_token
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    if deadline is not None:
+        headers["X-Request-Deadline"] = f"{deadline:.3f}"
+    return headers
+
+
+def _upstream_error(status: int, detail: str, deadline: Optional[float]) -> HTTPException:
+    """The error for a failed wrapper call; a 504 under a deadline shorter than our own timeout is the client's."""
+    if status == 504 and deadline is not None and deadline < HTTP_TIMEOUT:
+        return DeadlineExceededError(detail)
+    return HTTPException(status_code=status, detail=detail)
+
+
+def _upstream_status(exc: httpx.HTTPError) -> int:
+    """504 when the wrapper ran out of time (ours or its own), 502 for anything else."""
+    if isinstance(exc, httpx.TimeoutException):
+        return 504
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 504:
+        return 504
+    return 502
+
+
+async def call_model(
+    url: str,
+    prompt: str,
+    auth_token: Optional[str] = None,
+    cache_control: Optional[str] = None,
+    deadline: Optional[float] = None,
+) -> str:
+    """Call model wrapper with optional authentication.
+
+    `cache_control` is forwarded as `Cache-Control`: `no-cache` makes the
+    wrapper re-run the CLI and refresh its cache, `no-store` bypasses it.
+    `deadline` (seconds) is sent as `X-Request-Deadline` and also bounds the
+    HTTP request.
+    """
+    payload = {"prompt": prompt, "history": []}
+    headers = _wrapper_headers(auth_token, cache_control, deadline)
+    timeout = min(HTTP_TIMEOUT, deadline) if deadline is not None else httpx.USE_CLIENT_DEFAULT
     try:
         logger.debug("Calling model wrapper", extra={"url": url})
-        resp = requests.post(url, json=payload, headers=headers, timeout=HTTP_TIMEOUT)
+        resp = await _get_http_client().post(url, json=payload, headers=headers, timeout=timeout)
         resp.raise_for_status()
-    except requests.exceptions.RequestException as exc:
+        data = resp.json()
+    except httpx.HTTPError as exc:
         logger.error("Failed to reach model wrapper", extra={"url": url, "error": str(exc)})
-        raise HTTPException(status_code=502, detail=f"failed to reach model wrapper: {exc}") from exc
+        raise _upstream_error(_upstream_status(exc), f"failed to reach model wrapper: {exc}", deadline) from exc
+    except ValueError as exc:
+        logger.error("Wrapper response is not JSON", extra={"url": url, "error": str(exc)})
+        raise HTTPException(status_code=502, detail="invalid response from model wrapper") from exc
 
-    data: Dict[str, str] = resp.json()
-    output = data.get("output")
+    output = data.get("output") if isinstance(data, dict) else None
     if output is None:
         logger.error("Wrapper response missing output", extra={"url": url})
         raise HTTPException(status_code=500, detail="wrapper response missing 'output'")
     return output
 
 
+async def stream_model(
+    url: str,
+    prompt: str,
+    auth_token: Optional[str] = None,
+    cache_control: Optional[str] = None,
+    deadline: Optional[float] = None,
+) -> AsyncIterator[dict]:
+    """Call the wrapper's streaming endpoint and yield its NDJSON events.
+
+    In-band `error` events are raised as HTTPException(502), or 504 when the
+    wrapper ran out of time, matching the buffered `call_model` path.
+    """
+    payload = {"prompt": prompt, "history": []}
+    headers = _wrapper_headers(auth_token, cache_control, deadline)
+    timeout = min(HTTP_TIMEOUT, deadline) if deadline is not None else httpx.USE_CLIENT_DEFAULT
+    stream_url = f"{url.rstrip('/')}/stream"
+    client = _get_http_client()
+    try:
+        async with client.stream("POST", stream_url, json=payload, headers=headers, timeout=timeout) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError as exc:
+                    logger.error("Wrapper stream line is not JSON", extra={"url": url, "error": str(exc)})
+                    raise HTTPException(status_code=502, detail="invalid response from model wrapper") from exc
+                if event.get("type") == "error":
+                    logger.error("Wrapper stream reported an error", extra={"url": url, "error": event.get("detail")})
+                    status = 504 if event.get("status") == 504 else 502
+                    raise _upstream_error(status, f"model wrapper failed: {event.get('detail')}", deadline)
+                yield event
+    except httpx.HTTPError as exc:
+        logger.error("Failed to reach model wrapper", extra={"url": url, "error": str(exc)})
+        raise _upstream_error(_upstream_status(exc), f"failed to reach model wrapper: {exc}", deadline) from exc
+
+
 def build_next_prompt(
     decision: Decision,
     last_turn: Turn,
@@ -243,133 +669,796 @@ def build_next_prompt(
     return "".join(prompt_parts)
 
 
-@app.post("/start_debate", response_model=StatusResponse)
-async def start_debate(
-    body: StartDebateRequest,
-    request: Request,
-    _: None = Depends(_verify_token),
-) -> JSONResponse:
-    """Start a new debate session for the user. Codex responds first, then Claude."""
-    user_id = _get_user_id(request)
-    session = _sessions.get(user_id)
+ModelCaller = Callable[[Literal["codex", "claude"], str], Awaitable[str]]
 
+
+def _counts_against_upstream(exc: Exception) -> Optional[bool]:
+    # 4xx means this request was bad, not that the wrapper is unhealthy; a
+    # client's own deadline running out says nothing either way
+    if isinstance(exc, DeadlineExceededError):
+        return None
+    return not isinstance(exc, HTTPException) or exc.status_code >= 500
+
+
+def _build_balancer(urls: List[str]) -> LoadBalancer:
+    return LoadBalancer(
+        urls,
+        ewma_alpha=LB_EWMA_ALPHA,
+        eject_after=LB_EJECT_AFTER_FAILURES,
+        eject_seconds=LB_EJECT_SECONDS,
+        max_eject_seconds=LB_MAX_EJECT_SECONDS,
+        is_failure=_counts_against_upstream,
+    )
+
+
+_balancers: Dict[str, LoadBalancer] = {"codex": _build_balancer(CODEX_URLS), "claude": _build_balancer(CLAUDE_URLS)}
+
+
+def _breaker(url: str) -> Optional[CircuitBreaker]:
+    if BREAKER_WINDOW <= 0:
+        return None
+    breaker = _breakers.get(url)
+    if breaker is None:
+        breaker = _breakers[url] = CircuitBreaker(
+            url,
+            window=BREAKER_WINDOW,
+            min_calls=BREAKER_MIN_CALLS,
+            error_rate=BREAKER_ERROR_RATE,
+            slow_call_seconds=BREAKER_SLOW_CALL_SECONDS,
+            slow_call_rate=BREAKER_SLOW_CALL_RATE,
+            open_seconds=BREAKER_OPEN_SECONDS,
+            half_open_calls=BREAKER_HALF_OPEN_CALLS,
+            is_failure=_counts_against_upstream,
+        )
+    return breaker
+
+
+@contextmanager
+def _circuit(url: str) -> Iterator[None]:
+    """Guard one wrapper call with the URL's breaker; an open circuit fails with 503 at once."""
+    breaker = _breaker(url)
+    if breaker is None:
+        yield
+        return
+    try:
+        with breaker.call():
+            yield
+    except CircuitOpenError as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=f"model wrapper unavailable (circuit open): {url}",
+            headers={"Retry-After": str(math.ceil(exc.retry_after))},
+        ) from exc
+
+
+def _circuit_closed(url: str) -> bool:
+    breaker = _breaker(url)
+    return breaker is None or breaker.state != "open" or breaker.retry_after() <= 0
+
+
+@contextmanager
+def _upstream(model: Literal["codex", "claude"], replica: Optional[Replica] = None) -> Iterator[str]:
+    """Pick a replica of the model's wrapper (unless given one) and guard the call made to it."""
+    balancer = _balancers[model]
+    if replica is None:
+        replica = balancer.pick(available=_circuit_closed)
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with _tracer.span("wrapper.call", KIND_CLIENT, model=model, url=replica.url):
+            with balancer.track(replica), _circuit(replica.url):
+                yield replica.url
+        outcome = "ok"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except DeadlineExceededError:
+        outcome = "deadline"
+        raise
+    finally:
+        _wrapper_call_seconds.observe(time.perf_counter() - started, model, outcome)
+
+
+def _upstream_states() -> Optional[Dict[str, str]]:
+    stats = _breaker_stats()
+    return {url: breaker["state"] for url, breaker in stats.items()} if stats is not None else None
+
+
+def _breaker_stats() -> Optional[Dict[str, dict]]:
+    if BREAKER_WINDOW <= 0:
+        return None
+    urls = [url for balancer in _balancers.values() for url in balancer.urls]
+    return {url: _breaker(url).stats() for url in dict.fromkeys([*urls, *_breakers])}
+
+
+async def _call_wrapper(
+    model: Literal["codex", "claude"],
+    prompt: str,
+    cache_control: Optional[str] = None,
+    deadline: Optional[float] = None,
+) -> str:
+    """Call a replica of the model's wrapper, joining an identical call that is already in flight.
+
+    Calls are identical when model, prompt and `cache_control` match; a call
+    only joins one whose `deadline` lasts at least as long as its own.
+
+    With hedging on, a call that is slower than usual is also sent to a
+    second replica and the first answer wins.
+    """
+    used: List[str] = []
+
+    async def attempt(replica: Optional[Replica] = None, budget: Optional[float] = deadline) -> str:
+        with _upstream(model, replica) as url:
+            used.append(url)
+            output = await call_model(
+                url, prompt, auth_token=os.getenv("WRAPPER_AUTH_TOKEN"), cache_control=cache_control, deadline=budget
+            )
+        _wrapper_output_bytes.observe(len(output.encode("utf-8")), model)
+        return output
+
+    def hedge(elapsed: float) -> Optional[Awaitable[str]]:
+        balancer = _balancers[model]
+
+        def spare(url: str) -> bool:
+            return url not in used and _circuit_closed(url)
+
+        budget = deadline - elapsed if deadline is not None else None
+        if not balancer.has_healthy(spare) or (budget is not None and budget <= 0):
+            return None
+        return attempt(balancer.pick(available=spare), budget)
+
+    async def call() -> str:
+        if _hedger is None or len(_balancers[model].replicas) < 2:
+            return await attempt()
+        return await _hedger.run(model, attempt, hedge)
+
+    expires_at = time.monotonic() + deadline if deadline is not None else None
+    return await _call_flights.do(fingerprint(model, prompt, cache_control), call, expires_at)
+
+
+class _WrapperCaller:
+    """`_call_wrapper` forwarding the client's `Cache-Control` and a share of its deadline to the wrappers."""
+
+    def __init__(self, cache_control: Optional[str] = None, deadline: Optional[RequestDeadline] = None) -> None:
+        self.cache_control = cache_control
+        self.deadline = deadline
+
+    async def __call__(self, model: Literal["codex", "claude"], prompt: str) -> str:
+        budget = self.deadline.next_budget() if self.deadline is not None else None
+        return await _call_wrapper(model, prompt, cache_control=self.cache_control, deadline=budget)
+
+
+def _wrapper_caller(request: Request, deadline: Optional[RequestDeadline] = None) -> ModelCaller:
+    return _WrapperCaller(request.headers.get("Cache-Control"), deadline)
+
+
+async def _timed_call(call: ModelCaller, model: Literal["codex", "claude"], prompt: str) -> Tuple[str, float]:
+    """Return the model's output and the call's wall-clock latency in ms."""
+    started = time.perf_counter()
+    output = await call(model, prompt)
+    return output, (time.perf_counter() - started) * 1000
+
+
+async def _call_both(call: ModelCaller, prompts: Dict[str, str]) -> Dict[str, Tuple[str, float]]:
+    """Run one prompt per model concurrently; if either call fails, cancel the other."""
+    tasks = {model: asyncio.create_task(_timed_call(call, model, prompt)) for model, prompt in prompts.items()}
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return {model: task.result() for model, task in tasks.items()}
+
+
+def _turn_payload(turn: Turn, next_responder: Responder, mode: Mode) -> dict:
+    return {
+        "user_instruction": turn.user_instruction,
+        "codex_output": turn.codex_output,
+        "claude_output": turn.claude_output,
+        "responder": turn.responder,
+        "next_responder": next_responder,
+        "mode": mode,
+        "codex_latency_ms": turn.codex_latency_ms,
+        "claude_latency_ms": turn.claude_latency_ms,
+    }
+
+
+# The decisions whose next prompt is fully determined, and therefore worth precomputing
+_SPECULATED_DECISIONS = (Decision(type="adopt_codex"), Decision(type="adopt_claude"))
+
+
+def _speculate_next_turn(session: DebateSession, call: ModelCaller) -> None:
+    """Start the likely next /step calls in the background while the user decides.
+
+    The speculative calls keep the `Cache-Control` of the turn's caller `call`
+    and get no more time than each of its calls did.
+    """
+    if _speculator is None or not session.active or not session.history:
+        return
+    models: List[Literal["codex", "claude"]] = ["codex", "claude"] if session.parallel else [session.next_responder]
+    last_turn = session.history[-1]
+    prompts = [
+        (model, build_next_prompt(decision, last_turn, model, session.history, session.mode))
+        for decision in _SPECULATED_DECISIONS
+        for model in models
+    ]
+    cache_control: Optional[str] = getattr(call, "cache_control", None)
+    deadline: Optional[RequestDeadline] = getattr(call, "deadline", None)
+    budget = deadline.call_budget if deadline is not None else None
+
+    async def speculative_call(model: Literal["codex", "claude"], prompt: str) -> str:
+        return await _call_wrapper(model, prompt, cache_control=cache_control, deadline=budget)
+
+    _speculator.start(session.user_id, prompts, speculative_call)
+
+
+def _with_speculation(user_id: str, call: ModelCaller) -> ModelCaller:
+    return call if _speculator is None else _speculator.wrap(user_id, call)
+
+
+def _cancel_speculation(user_id: str) -> None:
+    if _speculator is not None:
+        _speculator.cancel(user_id)
+
+
+async def _load_session_for_start(user_id: str, body: StartDebateRequest) -> DebateSession:
+    session = await _state_call(_sessions.get, user_id)
     if session and session.active:
         raise HTTPException(status_code=400, detail="debate session already active")
-
-    if session is None:
-        session = DebateSession(user_id=user_id, next_responder="codex")
-        _sessions[user_id] = session
+    _cancel_speculation(user_id)
+    # Start from a clean session, dropping turns left behind by a failed start.
+    session = await _state_call(_sessions.create, user_id)
     session.mode = body.mode
+    session.parallel = body.parallel
+    return session
+
+
+async def _stop_session(user_id: str) -> None:
+    session = await _state_call(_sessions.get, user_id)
+    if not session or not session.active:
+        raise HTTPException(status_code=400, detail="no active session")
+    await _state_call(_sessions.delete, user_id)
+    _cancel_speculation(user_id)
+
+
+async def _load_active_session(user_id: str) -> DebateSession:
+    session = await _state_call(_sessions.get, user_id)
+    if not session or not session.active or not session.history:
+        raise HTTPException(status_code=400, detail="no active session")
+    return session
 
+
+async def _run_start_debate(session: DebateSession, body: StartDebateRequest, call: ModelCaller) -> dict:
+    """Codex answers the initial prompt, then Claude responds to Codex."""
+    if session.parallel:
+        return await _run_parallel_start(session, body, call)
     prompt = body.initial_prompt
-    wrapper_auth = os.getenv("WRAPPER_AUTH_TOKEN")
-    
+
     # Step 1: Codex responds first
-    codex_instruction = _mode_instruction_for("codex", session.mode)
-    codex_prompt = f"{codex_instruction}\n\n{prompt}" if codex_instruction else prompt
-    codex_output = call_model(CODEX_URL, codex_prompt, auth_token=wrapper_auth)
+    codex_prompt = _with_mode_instruction("codex", session.mode, prompt)
+    codex_output, codex_latency_ms = await _timed_call(call, "codex", codex_prompt)
     turn1 = Turn(
         user_instruction=prompt,
         codex_output=codex_output,
         claude_output=None,
         responder="codex",
+        codex_latency_ms=codex_latency_ms,
     )
-    session.history.append(turn1)
-    
+    await _state_call(_sessions.append_turn, session, turn1)
+
     # Step 2: Claude responds to Codex's output
-    claude_instruction = _mode_instruction_for("claude", session.mode)
     claude_prompt_base = f"Codex said: {codex_output}\n\nRespond to Codex's point and continue the discussion."
-    claude_prompt = f"{claude_instruction}\n\n{claude_prompt_base}" if claude_instruction else claude_prompt_base
-    claude_output = call_model(CLAUDE_URL, claude_prompt, auth_token=wrapper_auth)
+    claude_prompt = _with_mode_instruction("claude", session.mode, claude_prompt_base)
+    claude_output, claude_latency_ms = await _timed_call(call, "claude", claude_prompt)
     turn2 = Turn(
         user_instruction=claude_prompt,
         codex_output=None,
         claude_output=claude_output,
         responder="claude",
+        claude_latency_ms=claude_latency_ms,
     )
-    session.history.append(turn2)
-    _trim_history(session)
+    await _state_call(_sessions.append_turn, session, turn2)
     session.active = True
     session.next_responder = "codex"  # Next turn, Codex responds
-
-    return JSONResponse(
-        status_code=200,
-        content={
-            "status": "ok",
-            "turn": {
-                "user_instruction": prompt,
-                "codex_output": codex_output,
-                "claude_output": claude_output,
-                "responder": "claude",  # Last responder
-                "next_responder": "codex",
-                "mode": session.mode,
-            },
-        },
-        headers={"X-User-ID": user_id},
+    await _state_call(_sessions.save, session)
+    _speculate_next_turn(session, call)
+
+    return {
+        "user_instruction": prompt,
+        "codex_output": codex_output,
+        "claude_output": claude_output,
+        "responder": "claude",  # Last responder
+        "next_responder": "codex",
+        "mode": session.mode,
+        "codex_latency_ms": codex_latency_ms,
+        "claude_latency_ms": claude_latency_ms,
+    }
+
+
+async def _run_parallel_start(session: DebateSession, body: StartDebateRequest, call: ModelCaller) -> dict:
+    """Both models answer the initial prompt independently and at the same time."""
+    prompt = body.initial_prompt
+    results = await _call_both(call, {
+        "codex": _with_mode_instruction("codex", session.mode, prompt),
+        "claude": _with_mode_instruction("claude", session.mode, prompt),
+    })
+    turn = _parallel_turn(prompt, results)
+    await _state_call(_sessions.append_turn, session, turn)
+    session.active = True
+    await _state_call(_sessions.save, session)
+    _speculate_next_turn(session, call)
+    return _turn_payload(turn, "both", session.mode)
+
+
+def _parallel_turn(user_instruction: str, results: Dict[str, Tuple[str, float]]) -> Turn:
+    return Turn(
+        user_instruction=user_instruction,
+        codex_output=results["codex"][0],
+        claude_output=results["claude"][0],
+        responder="both",
+        codex_latency_ms=results["codex"][1],
+        claude_latency_ms=results["claude"][1],
     )
 
 
-@app.post("/step", response_model=StatusResponse)
-async def step(
-    body: StepRequest,
-    request: Request,
-    _: None = Depends(_verify_token),
-) -> JSONResponse:
-    """Advance the debate session for the user. Only one model responds per turn."""
-    user_id = _get_user_id(request)
-    session = _sessions.get(user_id)
-
-    if not session or not session.active or not session.history:
-        raise HTTPException(status_code=400, detail="no active session")
-
+async def _run_step(session: DebateSession, decision: Decision, call: ModelCaller, speculate: bool = True) -> dict:
+    """Only the next responder answers, alternating between the models."""
+    if session.parallel:
+        return await _run_parallel_step(session, decision, call, speculate)
     last_turn = session.history[-1]
     next_responder = session.next_responder
-    
+
     # Build prompt for the next responder
-    next_prompt = build_next_prompt(body.decision, last_turn, next_responder, session.history, session.mode)
+    with _tracer.span("prompt.build"):
+        next_prompt = build_next_prompt(decision, last_turn, next_responder, session.history, session.mode)
 
-    wrapper_auth = os.getenv("WRAPPER_AUTH_TOKEN")
-    
-    # Only call the next responder (alternating)
+    output, latency_ms = await _timed_call(_with_speculation(session.user_id, call), next_responder, next_prompt)
     if next_responder == "codex":
-        codex_output = call_model(CODEX_URL, next_prompt, auth_token=wrapper_auth)
         turn = Turn(
             user_instruction=next_prompt,
-            codex_output=codex_output,
+            codex_output=output,
             claude_output=None,
             responder="codex",
+            codex_latency_ms=latency_ms,
         )
         session.next_responder = "claude"  # Next turn, Claude responds
     else:  # claude
-        claude_output = call_model(CLAUDE_URL, next_prompt, auth_token=wrapper_auth)
         turn = Turn(
             user_instruction=next_prompt,
             codex_output=None,
-            claude_output=claude_output,
+            claude_output=output,
             responder="claude",
+            claude_latency_ms=latency_ms,
         )
         session.next_responder = "codex"  # Next turn, Codex responds
-    
-    session.history.append(turn)
-    _trim_history(session)
+
+    await _state_call(_sessions.append_turn, session, turn)
+    await _state_call(_sessions.save, session)
+    if speculate:
+        _speculate_next_turn(session, call)
+
+    return _turn_payload(turn, session.next_responder, session.mode)
+
+
+async def _run_parallel_step(
+    session: DebateSession, decision: Decision, call: ModelCaller, speculate: bool = True
+) -> dict:
+    """Cross-critique round: each model answers the other's latest output, concurrently."""
+    last_turn = session.history[-1]
+    with _tracer.span("prompt.build"):
+        prompts = {
+            model: build_next_prompt(decision, last_turn, model, session.history, session.mode)
+            for model in ("codex", "claude")
+        }
+    results = await _call_both(_with_speculation(session.user_id, call), prompts)
+    # The two prompts differ only in which answer they quote; keep Codex's as the record.
+    turn = _parallel_turn(prompts["codex"], results)
+    await _state_call(_sessions.append_turn, session, turn)
+    await _state_call(_sessions.save, session)
+    if speculate:
+        _speculate_next_turn(session, call)
+    return _turn_payload(turn, "both", session.mode)
+
+
+def _autopilot_deadline(request: Request, body: AutopilotRequest) -> Optional[RequestDeadline]:
+    """The tighter of the client's deadline and `max_seconds`; every call may use all that is left."""
+    deadline = _request_deadline(request, calls=1)
+    if body.max_seconds is not None and (deadline is None or deadline.remaining() > body.max_seconds):
+        deadline = RequestDeadline(body.max_seconds)
+    return deadline
+
+
+def _autopilot_decision(strategy: str, session: DebateSession) -> Decision:
+    if strategy != "alternate":
+        return Decision(type=strategy)
+    last = session.history[-1].responder
+    if last == "both":
+        # Parallel rounds have no single latest reply; take each side in turn
+        last = "claude" if len(session.history) % 2 else "codex"
+    return Decision(type=f"adopt_{last}")
+
+
+def _with_agree_hint(call: ModelCaller) -> ModelCaller:
+    if not AUTOPILOT_AGREE_MARKER:
+        return call
+    hint = f"\n\nIf you now fully agree with the other side, include {AUTOPILOT_AGREE_MARKER} in your reply."
+
+    async def hinted(model: Literal["codex", "claude"], prompt: str) -> str:
+        return await call(model, prompt + hint)
+
+    return hinted
+
+
+def _turn_replies(turn: Turn) -> List[str]:
+    return [output for output in (turn.codex_output, turn.claude_output) if output is not None]
+
+
+async def _run_autopilot(
+    session: DebateSession, body: AutopilotRequest, call: ModelCaller, deadline: Optional[RequestDeadline]
+) -> dict:
+    """Run /step rounds back to back until `AutopilotPolicy` says stop."""
+    policy = AutopilotPolicy(
+        max_rounds=body.rounds,
+        similarity_threshold=AUTOPILOT_SIMILARITY,
+        agree_marker=AUTOPILOT_AGREE_MARKER,
+        max_tokens=body.max_tokens,
+    )
+    hinted = _with_agree_hint(call)
+    turns: List[dict] = []
+    while True:
+        stop_reason = policy.before_round(deadline.remaining() if deadline is not None else None)
+        if stop_reason is not None:
+            break
+        started = time.perf_counter()
+        try:
+            # Speculating between rounds would only race the next round for the same wrappers
+            turns.append(await _run_step(session, _autopilot_decision(body.strategy, session), hinted, speculate=False))
+        except HTTPException as exc:
+            if exc.status_code != 504 or deadline is None or not turns:
+                raise
+            stop_reason = "time_budget"
+            break
+        turn = session.history[-1]
+        replies = _turn_replies(turn)
+        earlier = [reply for previous in session.history[-3:-1] for reply in _turn_replies(previous)]
+        stop_reason = policy.after_round(
+            [turn.user_instruction] * len(replies), replies, earlier, time.perf_counter() - started
+        )
+        if stop_reason is not None:
+            break
+    _autopilot_stops[stop_reason] = _autopilot_stops.get(stop_reason, 0) + 1
+    _speculate_next_turn(session, call)
+    return {"turns": turns, "rounds": policy.rounds, "stop_reason": stop_reason, "estimated_tokens": policy.tokens}
+
+
+def _ndjson_line(event: dict) -> bytes:
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class _StreamingCaller:
+    """A `ModelCaller` using the wrappers' streaming endpoints.
+
+    Reports `turn_start`, `chunk`* and `turn_end` events for every model call
+    to `emit`, with time-to-first-token per turn and, in `first_token_ms`,
+    since the caller was created.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[dict], Awaitable[None]],
+        cache_control: Optional[str] = None,
+        deadline: Optional[RequestDeadline] = None,
+    ) -> None:
+        self.emit = emit
+        self.cache_control = cache_control
+        self.deadline = deadline
+        self.started = time.perf_counter()
+        self.first_token_ms: Optional[float] = None
+
+    async def __call__(self, model: Literal["codex", "claude"], prompt: str) -> str:
+        turn_started = time.perf_counter()
+        turn_first_token_ms: Optional[float] = None
+        await self.emit({"type": "turn_start", "responder": model})
+        output: Optional[str] = None
+        budget = self.deadline.next_budget() if self.deadline is not None else None
+        with _upstream(model) as url:
+            async for event in stream_model(
+                url,
+                prompt,
+                auth_token=os.getenv("WRAPPER_AUTH_TOKEN"),
+                cache_control=self.cache_control,
+                deadline=budget,
+            ):
+                if event["type"] == "chunk":
+                    now = time.perf_counter()
+                    if turn_first_token_ms is None:
+                        turn_first_token_ms = (now - turn_started) * 1000
+                        _wrapper_first_chunk_seconds.observe(turn_first_token_ms / 1000, model)
+                    if self.first_token_ms is None:
+                        self.first_token_ms = (now - self.started) * 1000
+                    await self.emit({"type": "chunk", "responder": model, "data": event["data"]})
+                elif event["type"] == "done":
+                    output = event["output"]
+        if output is None:
+            raise HTTPException(status_code=502, detail="wrapper stream ended without output")
+        _wrapper_output_bytes.observe(len(output.encode("utf-8")), model)
+        await self.emit({
+            "type": "turn_end",
+            "responder": model,
+            "output": output,
+            "ttft_ms": turn_first_token_ms,
+            "total_ms": (time.perf_counter() - turn_started) * 1000,
+        })
+        return output
+
+
+async def _run_streaming_flow(
+    flow: Callable[[ModelCaller], Awaitable[dict]], call: _StreamingCaller, user_id: str, result_key: str
+) -> None:
+    """Run `flow` with `call` and finish with a `done` event (the buffered result) or an `error` event."""
+    try:
+        result = await flow(call)
+        await call.emit({"type": "done", "status": "ok", result_key: result, "ttft_ms": call.first_token_ms})
+        logger.info("Streamed debate turn", extra={"user_id": user_id, "ttft_ms": call.first_token_ms})
+    except HTTPException as exc:
+        await call.emit({"type": "error", "status": exc.status_code, "detail": exc.detail})
+    except OutboxOverflow:
+        raise  # the client is too slow; the WebSocket handler drops it
+    except Exception:
+        logger.exception("Streamed debate turn failed", extra={"user_id": user_id})
+        await call.emit({"type": "error", "status": 500, "detail": "internal error"})
+
+
+def _streaming_response(
+    flow: Callable[[ModelCaller], Awaitable[dict]],
+    user_id: str,
+    cache_control: Optional[str] = None,
+    deadline: Optional[RequestDeadline] = None,
+    result_key: str = "turn",
+) -> StreamingResponse:
+    """Run a debate flow and stream its progress as NDJSON events.
+
+    Events: `turn_start`, `chunk`* and `turn_end` for every model call, then a
+    final `done` carrying the flow's result under `result_key` (the same
+    payload as the buffered endpoint), or `error`. Time-to-first-token is
+    reported per turn and for the request.
+    """
+    queue: "asyncio.Queue[Optional[dict]]" = asyncio.Queue()
+    call = _StreamingCaller(queue.put, cache_control, deadline)
+
+    async def run_flow() -> None:
+        try:
+            await _run_streaming_flow(flow, call, user_id, result_key)
+        finally:
+            await queue.put(None)
+
+    async def events() -> AsyncIterator[bytes]:
+        task = asyncio.create_task(run_flow())
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield _ndjson_line(event)
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson", headers={"X-User-ID": user_id})
+
+
+@app.post("/start_debate", response_model=StatusResponse)
+async def start_debate(
+    body: StartDebateRequest,
+    request: Request,
+    _: None = Depends(_verify_token),
+) -> JSONResponse:
+    """Start a new debate session for the user. Codex responds first, then Claude."""
+    user_id = _get_user_id(request)
+    call = _wrapper_caller(request, _request_deadline(request, calls=1 if body.parallel else 2))
+
+    async def run() -> dict:
+        return await _run_start_debate(await _load_session_for_start(user_id, body), body, call)
+
+    # A client retry of a start that is still running joins it instead of restarting the session
+    turn = await _cancel_on_disconnect(
+        request, _turn_flights.do(fingerprint(user_id, "start_debate", body.model_dump()), run)
+    )
+
+    with _tracer.span("serialize"):
+        return JSONResponse(
+            status_code=200,
+            content={"status": "ok", "turn": turn},
+            headers={"X-User-ID": user_id},
+        )
+
+
+@app.post("/start_debate/stream")
+async def start_debate_stream(
+    body: StartDebateRequest,
+    request: Request,
+    _: None = Depends(_verify_token),
+) -> StreamingResponse:
+    """Streaming variant of /start_debate that forwards CLI output as it arrives."""
+    user_id = _get_user_id(request)
+    deadline = _request_deadline(request, calls=1 if body.parallel else 2)
+    session = await _load_session_for_start(user_id, body)
+    return _streaming_response(
+        lambda call: _run_start_debate(session, body, call), user_id, request.headers.get("Cache-Control"), deadline
+    )
+
+
+@app.post("/step", response_model=StatusResponse)
+async def step(
+    body: StepRequest,
+    request: Request,
+    _: None = Depends(_verify_token),
+) -> JSONResponse:
+    """Advance the debate session for the user. Only one model responds per turn."""
+    user_id = _get_user_id(request)
+    call = _wrapper_caller(request, _request_deadline(request, calls=1))
+
+    async def run() -> dict:
+        return await _run_step(await _load_active_session(user_id), body.decision, call)
+
+    # A client retry of a step that is still running joins it, so the turn is recorded once
+    turn = await _cancel_on_disconnect(request, _turn_flights.do(fingerprint(user_id, "step", body.model_dump()), run))
+
+    with _tracer.span("serialize"):
+        return JSONResponse(
+            status_code=200,
+            content={"status": "ok", "turn": turn},
+            headers={"X-User-ID": user_id},
+        )
+
+
+@app.post("/step/stream")
+async def step_stream(
+    body: StepRequest,
+    request: Request,
+    _: None = Depends(_verify_token),
+) -> StreamingResponse:
+    """Streaming variant of /step that forwards CLI output as it arrives."""
+    user_id = _get_user_id(request)
+    session = await _load_active_session(user_id)
+    body.decision.validated_text()  # reject a bad custom_instruction before streaming starts
+    deadline = _request_deadline(request, calls=1)
+    return _streaming_response(
+        lambda call: _run_step(session, body.decision, call), user_id, request.headers.get("Cache-Control"), deadline
+    )
+
+
+@app.post("/autopilot", response_model=AutopilotResponse)
+async def autopilot(
+    body: AutopilotRequest,
+    request: Request,
+    _: None = Depends(_verify_token),
+) -> JSONResponse:
+    """Run up to `rounds` debate rounds server-side and return every turn."""
+    user_id = _get_user_id(request)
+    deadline = _autopilot_deadline(request, body)
+    call = _wrapper_caller(request, deadline)
+
+    async def run() -> dict:
+        return await _run_autopilot(await _load_active_session(user_id), body, call, deadline)
+
+    result = await _cancel_on_disconnect(
+        request, _turn_flights.do(fingerprint(user_id, "autopilot", body.model_dump()), run)
+    )
 
     return JSONResponse(
         status_code=200,
-        content={
-            "status": "ok",
-            "turn": {
-                "user_instruction": turn.user_instruction,
-                "codex_output": turn.codex_output,
-                "claude_output": turn.claude_output,
-                "responder": turn.responder,
-                "next_responder": session.next_responder,
-                "mode": session.mode,
-            },
-        },
+        content={"status": "ok", **result},
         headers={"X-User-ID": user_id},
     )
 
 
+@app.post("/autopilot/stream")
+async def autopilot_stream(
+    body: AutopilotRequest,
+    request: Request,
+    _: None = Depends(_verify_token),
+) -> StreamingResponse:
+    """Streaming variant of /autopilot; `done` carries the autopilot result."""
+    user_id = _get_user_id(request)
+    session = await _load_active_session(user_id)
+    deadline = _autopilot_deadline(request, body)
+    return _streaming_response(
+        lambda call: _run_autopilot(session, body, call, deadline),
+        user_id,
+        request.headers.get("Cache-Control"),
+        deadline,
+        result_key="autopilot",
+    )
+
+
+def _job_response(job: Job, user_id: str, status_code: int = 200) -> JSONResponse:
+    headers = {"X-User-ID": user_id, "Location": f"/jobs/{job.job_id}"}
+    if not job.finished:
+        headers["Retry-After"] = "1"
+    return JSONResponse(status_code=status_code, content=job.to_dict(), headers=headers)
+
+
+async def _submit_job(user_id: str, kind: str, body: BaseModel, work: Callable[[], Awaitable[dict]]) -> JSONResponse:
+    try:
+        job = await _jobs.submit(user_id, kind, fingerprint(user_id, kind, body.model_dump()), work)
+    except JobConflictError as exc:
+        raise HTTPException(status_code=409, detail=f"job {exc.job.job_id} is still running for this session")
+    return _job_response(job, user_id, status_code=202)
+
+
+async def _wait_for_job(job_id: str, user_id: str, wait: float) -> Job:
+    job = await _state_call(_jobs.store.get, job_id)
+    if job is not None and job.user_id == user_id:
+        job = await _jobs.wait(job_id, min(wait, JOB_MAX_WAIT_SECONDS))
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="unknown job")
+    return job
+
+
+@app.post("/jobs/start_debate", status_code=202, response_model=JobResponse)
+async def submit_start_debate(
+    body: StartDebateRequest,
+    request: Request,
+    _: None = Depends(_verify_token),
+) -> JSONResponse:
+    """Run /start_debate in the background and return its job id at once."""
+    user_id = _get_user_id(request)
+    call = _wrapper_caller(request, _request_deadline(request, calls=1 if body.parallel else 2))
+
+    async def run() -> dict:
+        return await _run_start_debate(await _load_session_for_start(user_id, body), body, call)
+
+    return await _submit_job(user_id, "start_debate", body, run)
+
+
+@app.post("/jobs/step", status_code=202, response_model=JobResponse)
+async def submit_step(
+    body: StepRequest,
+    request: Request,
+    _: None = Depends(_verify_token),
+) -> JSONResponse:
+    """Run /step in the background and return its job id at once."""
+    user_id = _get_user_id(request)
+    body.decision.validated_text()  # reject a bad custom_instruction before queueing
+    call = _wrapper_caller(request, _request_deadline(request, calls=1))
+
+    async def run() -> dict:
+        return await _run_step(await _load_active_session(user_id), body.decision, call)
+
+    return await _submit_job(user_id, "step", body, run)
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    request: Request,
+    wait: float = Query(default=0, ge=0, description="Seconds to long-poll for the job to finish"),
+    _: None = Depends(_verify_token),
+) -> JSONResponse:
+    """Status of a job, with its turn or error once finished."""
+    user_id = _get_user_id(request)
+    return _job_response(await _wait_for_job(job_id, user_id, wait), user_id)
+
+
+@app.get("/jobs/{job_id}/result", response_model=StatusResponse)
+async def get_job_result(
+    job_id: str,
+    request: Request,
+    wait: float = Query(default=0, ge=0, description="Seconds to long-poll for the job to finish"),
+    _: None = Depends(_verify_token),
+) -> JSONResponse:
+    """The job's result as the buffered endpoint would have returned it; 202 while still running."""
+    user_id = _get_user_id(request)
+    job = await _wait_for_job(job_id, user_id, wait)
+    if not job.finished:
+        return _job_response(job, user_id, status_code=202)
+    if job.error is not None:
+        raise HTTPException(status_code=job.error["status"], detail=job.error["detail"])
+    return JSONResponse(status_code=200, content={"status": "ok", "turn": job.turn}, headers={"X-User-ID": user_id})
+
+
 @app.post("/stop", response_model=StatusResponse)
 async def stop(
     request: Request,
@@ -377,13 +1466,7 @@ async def stop(
 ) -> JSONResponse:
     """Stop the debate session for the user."""
     user_id = _get_user_id(request)
-    session = _sessions.get(user_id)
-
-    if not session or not session.active:
-        raise HTTPException(status_code=400, detail="no active session")
-
-    session.active = False
-    session.history.clear()
+    await _stop_session(user_id)
 
     return JSONResponse(
         status_code=200,
@@ -392,11 +1475,342 @@ async def stop(
     )
 
 
+def _progress_caller(call: ModelCaller, ctx: ToolContext) -> ModelCaller:
+    """Report the start and end of every wrapper call as MCP progress."""
+
+    async def reporting(model: Literal["codex", "claude"], prompt: str) -> str:
+        await ctx.progress(f"{model} is responding")
+        output, latency_ms = await _timed_call(call, model, prompt)
+        await ctx.progress(f"{model} responded in {latency_ms:.0f} ms")
+        return output
+
+    return reporting
+
+
+def _mcp_tool(model: Optional[type], run: Callable[[Any, ToolContext], Awaitable[dict]]) -> ToolHandler:
+    """Validate the arguments against `model` and turn HTTP errors into tool errors."""
+
+    async def handler(arguments: dict, ctx: ToolContext) -> dict:
+        try:
+            body = model.model_validate(arguments) if model is not None else None
+        except ValidationError as exc:
+            raise RpcError(INVALID_PARAMS, "invalid arguments", json.loads(exc.json())) from exc
+        try:
+            return await run(body, ctx)
+        except HTTPException as exc:
+            raise ToolError(f"{exc.status_code}: {exc.detail}") from exc
+
+    return handler
+
+
+async def _mcp_start_debate(body: StartDebateRequest, ctx: ToolContext) -> dict:
+    call = _progress_caller(_call_wrapper, ctx)
+
+    async def run() -> dict:
+        return await _run_start_debate(await _load_session_for_start(ctx.user_id, body), body, call)
+
+    turn = await _turn_flights.do(fingerprint(ctx.user_id, "start_debate", body.model_dump()), run)
+    return {"status": "ok", "turn": turn}
+
+
+async def _mcp_step(body: StepRequest, ctx: ToolContext) -> dict:
+    call = _progress_caller(_call_wrapper, ctx)
+
+    async def run() -> dict:
+        return await _run_step(await _load_active_session(ctx.user_id), body.decision, call)
+
+    turn = await _turn_flights.do(fingerprint(ctx.user_id, "step", body.model_dump()), run)
+    return {"status": "ok", "turn": turn}
+
+
+async def _mcp_autopilot(body: AutopilotRequest, ctx: ToolContext) -> dict:
+    deadline = RequestDeadline(body.max_seconds) if body.max_seconds is not None else None
+    call = _progress_caller(_call_wrapper, ctx)
+
+    async def run() -> dict:
+        return await _run_autopilot(await _load_active_session(ctx.user_id), body, call, deadline)
+
+    result = await _turn_flights.do(fingerprint(ctx.user_id, "autopilot", body.model_dump()), run)
+    return {"status": "ok", **result}
+
+
+async def _mcp_stop(_: None, ctx: ToolContext) -> dict:
+    await _stop_session(ctx.user_id)
+    return {"status": "stopped"}
+
+
+def _build_mcp_server() -> McpServer:
+    metadata = json.loads((Path(__file__).parent / "mcp.json").read_text(encoding="utf-8"))
+    return McpServer(metadata["name"], metadata["version"], metadata["tools"], {
+        "start_debate": _mcp_tool(StartDebateRequest, _mcp_start_debate),
+        "step": _mcp_tool(StepRequest, _mcp_step),
+        "autopilot": _mcp_tool(AutopilotRequest, _mcp_autopilot),
+        "stop": _mcp_tool(None, _mcp_stop),
+    })
+
+
+_mcp_server = _build_mcp_server()
+
+
+async def _discard(_: dict) -> None:
+    return None
+
+
+def _sse_event(message: dict) -> bytes:
+    return f"event: message\ndata: {json.dumps(message, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+@app.post("/mcp")
+async def mcp_endpoint(
+    request: Request,
+    _: None = Depends(_verify_token),
+) -> Response:
+    """MCP over streamable HTTP: one JSON-RPC message (or batch) per POST.
+
+    The session is identified by `X-User-ID`, else by the `Mcp-Session-Id`
+    handed out on `initialize`. Responses are plain JSON, except that a
+    `tools/call` with a progress token is answered as an SSE stream carrying
+    the progress notifications and then the result.
+    """
+    try:
+        payload = json.loads(await request.body())
+    except ValueError:
+        return JSONResponse(error_response(None, RpcError(PARSE_ERROR, "parse error")), status_code=400)
+    messages = payload if isinstance(payload, list) else [payload]
+    session_id = request.headers.get("Mcp-Session-Id")
+    if session_id is None and any(isinstance(m, dict) and m.get("method") == "initialize" for m in messages):
+        session_id = uuid.uuid4().hex
+    user_id = request.headers.get("X-User-ID") or session_id or str(uuid.uuid4())
+    headers = {"Mcp-Session-Id": session_id} if session_id else {}
+
+    if not any(is_request(message) for message in messages):
+        await _mcp_server.handle_payload(payload, user_id, _discard)
+        return Response(status_code=202, headers=headers)
+
+    wants_progress = any(progress_token(message) is not None for message in messages)
+    if not wants_progress or "text/event-stream" not in request.headers.get("Accept", ""):
+        response = await _cancel_on_disconnect(request, _mcp_server.handle_payload(payload, user_id, _discard))
+        return JSONResponse(response, headers=headers)
+
+    queue: "asyncio.Queue[Optional[dict]]" = asyncio.Queue()
+
+    async def run() -> None:
+        try:
+            response = await _mcp_server.handle_payload(payload, user_id, queue.put)
+            for message in response if isinstance(response, list) else [response]:
+                await queue.put(message)
+        finally:
+            await queue.put(None)
+
+    async def events() -> AsyncIterator[bytes]:
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                yield _sse_event(message)
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+async def _socket_flow(message: dict, user_id: str) -> Tuple[Callable[[ModelCaller], Awaitable[dict]], int, str]:
+    """The debate flow a WebSocket message asks for, its sequential wrapper calls and its result key."""
+    kind = message.get("type")
+    if kind == "start_debate":
+        body = StartDebateRequest.model_validate(message)
+        session = await _load_session_for_start(user_id, body)
+        return lambda call: _run_start_debate(session, body, call), 1 if body.parallel else 2, "turn"
+    if kind == "step":
+        decision = StepRequest.model_validate(message).decision
+        session = await _load_active_session(user_id)
+        decision.validated_text()
+        return lambda call: _run_step(session, decision, call), 1, "turn"
+    if kind == "autopilot":
+        body = AutopilotRequest.model_validate(message)
+        session = await _load_active_session(user_id)
+        return lambda call: _run_autopilot(session, body, call, _default_deadline(1)), 1, "autopilot"
+    raise HTTPException(status_code=400, detail=f"unknown message type: {kind!r}")
+
+
+def _socket_message_type(text: str) -> Optional[str]:
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return None
+    return message.get("type") if isinstance(message, dict) else None
+
+
+async def _handle_socket_message(text: str, user_id: str, client_ip: str, outbox: Outbox) -> None:
+    """Answer one WebSocket message with the events the matching streaming endpoint would send.
+
+    A turn cancelled by a `stop` ends with an `error` event (status 499).
+    """
+    try:
+        message = json.loads(text)
+    except ValueError:
+        outbox.put({"type": "error", "status": 400, "detail": "invalid JSON"})
+        return
+    if not isinstance(message, dict):
+        outbox.put({"type": "error", "status": 400, "detail": "message must be an object"})
+        return
+    tag = {"id": message["id"]} if "id" in message else {}
+
+    async def emit(event: dict) -> None:
+        outbox.put({**event, **tag})
+
+    kind = message.get("type")
+    if kind == "ping":
+        await emit({"type": "pong"})
+        return
+    if kind == "stop":
+        try:
+            await _stop_session(user_id)
+        except HTTPException as exc:
+            await emit({"type": "error", "status": exc.status_code, "detail": exc.detail})
+            return
+        await emit({"type": "done", "status": "stopped"})
+        return
+    try:
+        await _run_socket_turn(message, user_id, client_ip, emit)
+    except asyncio.CancelledError:
+        await emit({"type": "error", "status": 499, "detail": "turn cancelled"})
+        raise
+
+
+async def _run_socket_turn(
+    message: dict, user_id: str, client_ip: str, emit: Callable[[dict], Awaitable[None]]
+) -> None:
+    # Turns draw on the same rate limit as their HTTP counterparts
+    if not await _state_call(_rate_limiter.allow, client_ip):
+        _rate_limited_total.inc()
+        retry_after = math.ceil(await _state_call(_rate_limiter.retry_after, client_ip))
+        await emit({"type": "error", "status": 429, "detail": "rate limit exceeded", "retry_after": retry_after})
+        return
+    try:
+        flow, calls, result_key = await _socket_flow(message, user_id)
+    except ValidationError as exc:
+        await emit({"type": "error", "status": 422, "detail": json.loads(exc.json())})
+        return
+    except HTTPException as exc:
+        await emit({"type": "error", "status": exc.status_code, "detail": exc.detail})
+        return
+    await _run_streaming_flow(flow, _StreamingCaller(emit, deadline=_default_deadline(calls)), user_id, result_key)
+
+
+@app.websocket("/ws")
+async def debate_socket(websocket: WebSocket) -> None:
+    """Interactive debate over one WebSocket, bound to one user's session.
+
+    Authentication and the user id are checked once, on connect (`X-Auth-Token`
+    and `X-User-ID` headers, or `token` and `user_id` query parameters for
+    clients that cannot set headers). Each text message is a JSON object whose
+    `type` is `start_debate`, `step` or `autopilot` (with the fields of the
+    HTTP request body), `stop` or `ping`; an optional `id` is echoed on every
+    event of the answer. Turns run one after another and stream the same
+    events as the NDJSON endpoints. A `stop` does not wait behind the turn in
+    progress: it cancels it, then ends the session; messages queued in
+    between still run.
+
+    Slow clients get backpressure: chunks waiting to be sent are merged, and a
+    client that falls more than `MCP_WS_MAX_BUFFER_BYTES` behind, or does not
+    take a message within `MCP_WS_SEND_TIMEOUT_SECONDS`, is disconnected
+    (close code 1008) and its running turn cancelled.
+    """
+    client_ip = websocket.client.host if websocket.client else "unknown"
+    if not await _state_call(_rate_limiter.allow, client_ip):
+        _rate_limited_total.inc()
+        await websocket.close(code=1008, reason="rate limit exceeded")
+        return
+    token = websocket.headers.get("X-Auth-Token") or websocket.query_params.get("token")
+    if AUTH_TOKEN is not None and token != AUTH_TOKEN:
+        await websocket.close(code=1008, reason="unauthorized")
+        return
+    user_id = websocket.headers.get("X-User-ID") or websocket.query_params.get("user_id") or str(uuid.uuid4())
+    await websocket.accept(headers=[(b"x-user-id", user_id.encode("utf-8"))])
+    _websockets["connections"] += 1
+    _websockets["open"] += 1
+
+    outbox = Outbox(WS_MAX_BUFFER_BYTES)
+    inbox: "asyncio.Queue[Tuple[str, Optional[str]]]" = asyncio.Queue(maxsize=WS_MAX_PENDING)
+    current: Optional["asyncio.Task[None]"] = None  # the message being answered
+    turn: Optional["asyncio.Task[None]"] = None  # the same, when it runs a debate flow
+    outbox.put({"type": "ready", "user_id": user_id})
+
+    async def receive() -> None:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            text = message.get("text")
+            if text is None:
+                text = (message.get("bytes") or b"").decode("utf-8", errors="replace")
+            if len(text) > MAX_BODY_BYTES:
+                outbox.put({"type": "error", "status": 413, "detail": "message too large"})
+                continue
+            kind = _socket_message_type(text)
+            if kind == "stop" and turn is not None:
+                turn.cancel()
+            await inbox.put((text, kind))  # a full inbox stops reading, which pushes back on the client
+
+    async def serve() -> None:
+        nonlocal current, turn
+        while True:
+            text, kind = await inbox.get()
+            _websockets["messages"] += 1
+            current = asyncio.create_task(_handle_socket_message(text, user_id, client_ip, outbox))
+            turn = current if kind not in ("stop", "ping") else None
+            try:
+                await asyncio.wait({current})
+            finally:
+                current.cancel()  # no-op once answered; stops the turn when the connection closes
+            answered, current, turn = current, None, None
+            if not answered.cancelled():
+                answered.result()  # anything unexpected closes the connection with 1011
+
+    async def send() -> None:
+        while True:
+            event = await outbox.get()
+            if event is None:
+                return
+            await asyncio.wait_for(websocket.send_text(json.dumps(event, ensure_ascii=False)), WS_SEND_TIMEOUT_SECONDS)
+
+    tasks = {work.__name__: asyncio.create_task(work()) for work in (receive, serve, send)}
+    try:
+        done, _ = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        outbox.close()
+        _websockets["open"] -= 1
+        _websockets["merged_chunks"] += outbox.merged
+
+    failure = next(task for task in done).exception()
+    if tasks["receive"] in done and failure is None:
+        if current is not None:
+            _cancellations["client_disconnects"] += 1
+            logger.info("WebSocket client disconnected, cancelled its turn", extra={"user_id": user_id})
+        return
+    if websocket.client_state != WebSocketState.CONNECTED:
+        return  # the client is gone; sending to it is what failed
+    if isinstance(failure, (OutboxOverflow, asyncio.TimeoutError)):
+        _websockets["slow_consumer_closes"] += 1
+        logger.warning("Dropping slow WebSocket client", extra={"user_id": user_id, "reason": str(failure)})
+        await websocket.close(code=1008, reason="client too slow")
+        return
+    logger.error("WebSocket connection failed", exc_info=failure, extra={"user_id": user_id})
+    await websocket.close(code=1011)
+
+
 @app.get("/health")
 async def health(request: Request) -> dict:
-    """Health check endpoint (no auth required)."""
+    """Health check endpoint (no auth required); reads the session without refreshing it."""
     user_id = _get_user_id(request)
-    session = _sessions.get(user_id)
+    session = await _state_call(_sessions.peek, user_id)
     if session:
         return {
             "status": "ok",
@@ -404,8 +1818,38 @@ async def health(request: Request) -> dict:
             "turns": len(session.history),
             "user_id": user_id,
             "mode": session.mode,
+            "parallel": session.parallel,
+            "upstreams": _upstream_states(),
         }
-    return {"status": "ok", "active": False, "turns": 0}
+    return {"status": "ok", "active": False, "turns": 0, "upstreams": _upstream_states()}
+
+
+@app.get("/stats")
+async def stats() -> dict:
+    """Aggregate bridge statistics (no auth required, no per-user data)."""
+    return {
+        "worker": os.getpid(),
+        "sessions": await _state_call(_sessions.stats),
+        "rate_limit": await _state_call(_rate_limiter.stats),
+        "speculation": _speculator.stats() if _speculator is not None else None,
+        "coalescing": {"turns": _turn_flights.stats(), "wrapper_calls": _call_flights.stats()},
+        "cancelled": dict(_cancellations),
+        "circuit_breakers": _breaker_stats(),
+        "replicas": {model: balancer.stats() for model, balancer in _balancers.items()},
+        "hedging": _hedger.stats() if _hedger is not None else None,
+        "jobs": await _jobs.stats(),
+        "autopilot_stops": dict(_autopilot_stops),
+        "mcp": _mcp_server.stats(),
+        "websocket": dict(_websockets),
+        "tracing": _tracer.stats() if _tracer.enabled else None,
+    }
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Prometheus text-format metrics of this worker (no auth required, no per-user data)."""
+    _scraped["sessions"] = (await _state_call(_sessions.stats))["entries"]
+    return Response(_metrics.render(), media_type=CONTENT_TYPE)
 
 
 if __name__ == "__main__":
@@ -415,5 +1859,6 @@ if __name__ == "__main__":
         "mcp.bridge:app",
         host=os.getenv("MCP_BIND_HOST", "127.0.0.1"),
         port=int(os.getenv("MCP_BIND_PORT", "8080")),
+        workers=BRIDGE_WORKERS,
         reload=False,
     )
@@ -0,0 +1,147 @@
+"""
+Circuit breakers for the bridge's calls to the host wrappers.
+"""
+
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Iterator, Literal, Optional, Tuple
+
+State = Literal["closed", "open", "half_open"]
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"circuit for {name} is open")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over the outcomes of the last `window` calls.
+
+    The circuit opens once at least `min_calls` outcomes are recorded and
+    either the share of failures reaches `error_rate` or the share of calls
+    slower than `slow_call_seconds` reaches `slow_call_rate`. While open,
+    calls fail immediately with `CircuitOpenError`. After `open_seconds` the
+    breaker lets `half_open_calls` trial calls through: if they all succeed
+    (and are not slow) it closes with a fresh window, otherwise it opens again.
+
+    `is_failure` decides which exceptions count against the upstream. An
+    exception it maps to None is not counted either way, just like a
+    cancelled call (`BaseException` that is not an `Exception`).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = math.inf,
+        slow_call_rate: float = 0.8,
+        open_seconds: float = 10.0,
+        half_open_calls: int = 1,
+        is_failure: Callable[[Exception], Optional[bool]] = lambda exc: True,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = max(1, half_open_calls)
+        self._is_failure = is_failure
+        self._clock = clock
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=max(1, window))  # (failed, slow)
+        self.state: State = "closed"
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self.counters = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "opened": 0}
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.open_seconds - self._clock())
+
+    def allow(self) -> None:
+        """Admit a call or raise `CircuitOpenError`; never blocks."""
+        if self.state == "open":
+            if self.retry_after() > 0:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.name, self.retry_after())
+            self.state = "half_open"
+            self._trials = self._trial_successes = 0
+        if self.state == "half_open":
+            if self._trials >= self.half_open_calls:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.name, self.open_seconds)
+            self._trials += 1
+        self.counters["calls"] += 1
+
+    def record(self, failed: bool, seconds: float) -> None:
+        slow = seconds >= self.slow_call_seconds
+        self.counters["failures"] += failed
+        self.counters["slow_calls"] += slow
+        if self.state == "half_open":
+            if failed or slow:
+                self._open()
+                return
+            self._trial_successes += 1
+            if self._trial_successes >= self.half_open_calls:
+                self.state = "closed"
+                self._outcomes.clear()
+            return
+        if self.state == "open":
+            return  # a call admitted before the circuit opened
+        self._outcomes.append((failed, slow))
+        if len(self._outcomes) >= self.min_calls and self._tripped():
+            self._open()
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        """Guard one upstream call: `allow()` on entry, `record()` on exit."""
+        self.allow()
+        started = self._clock()
+        try:
+            yield
+        except Exception as exc:
+            failed = self._is_failure(exc)
+            if failed is None:
+                self._release_trial()
+            else:
+                self.record(failed, self._clock() - started)
+            raise
+        except BaseException:
+            self._release_trial()
+            raise
+        self.record(False, self._clock() - started)
+
+    def stats(self) -> dict:
+        total = len(self._outcomes)
+        return {
+            "state": self.state,
+            "error_rate": round(sum(failed for failed, _ in self._outcomes) / total, 3) if total else None,
+            "slow_call_rate": round(sum(slow for _, slow in self._outcomes) / total, 3) if total else None,
+            "retry_after": round(self.retry_after(), 3) if self.state == "open" else None,
+            **self.counters,
+        }
+
+    def _tripped(self) -> bool:
+        total = len(self._outcomes)
+        failures = sum(failed for failed, _ in self._outcomes)
+        slow = sum(slow for _, slow in self._outcomes)
+        return failures / total >= self.error_rate or slow / total >= self.slow_call_rate
+
+    def _open(self) -> None:
+        self.state = "open"
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self.counters["opened"] += 1
+
+    def _release_trial(self) -> None:
+        if self.state == "half_open" and self._trials > 0:
+            self._trials -= 1
@@ -0,0 +1,128 @@
+"""
+Hedged wrapper calls: a backup request to another replica when the first is slow.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from host_wrappers.latency import LatencyTracker
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """Send a second copy of a call once the first has taken longer than usual.
+
+    The hedge delay is the `percentile` of recent successful call latencies
+    for the key (one tracker per model), but never below `min_delay_seconds`;
+    until `min_samples` latencies are known nothing is hedged. The first
+    attempt to succeed wins and the other is cancelled. If one attempt fails
+    the other is still awaited, so a hedge also covers a replica that errors.
+
+    At most `max_rate` of the last `window` calls may be hedged, which bounds
+    the extra load hedging puts on the wrappers when every replica is slow.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_delay_seconds: float = 1.0,
+        min_samples: int = 20,
+        max_rate: float = 0.1,
+        window: int = 100,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.percentile = percentile
+        self.min_delay_seconds = min_delay_seconds
+        self.min_samples = max(1, min_samples)
+        self.max_rate = max_rate
+        self._clock = clock
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._recent: Deque[bool] = deque(maxlen=max(1, window))  # was each recent call hedged
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.over_budget = 0
+
+    def delay(self, key: str) -> Optional[float]:
+        """Seconds to wait before hedging a call for `key`, or None to never hedge it."""
+        tracker = self._latency.get(key)
+        if tracker is None or tracker.count < self.min_samples:
+            return None
+        return max(self.min_delay_seconds, tracker.percentile(self.percentile) / 1000)
+
+    async def run(
+        self,
+        key: str,
+        primary: Callable[[], Awaitable[T]],
+        hedge: Callable[[float], Optional[Awaitable[T]]],
+    ) -> T:
+        """Run `primary()`, hedging it with `hedge(elapsed_seconds)` if it is slow.
+
+        `hedge` returns None when there is nothing to hedge with (e.g. no other
+        replica is available); the primary is then simply awaited.
+        """
+        self.calls += 1
+        started = self._clock()
+        first = asyncio.ensure_future(self._timed(key, primary()))
+        attempts = [first]
+        try:
+            delay = self.delay(key)
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done:
+                    second = self._start_hedge(key, hedge, self._clock() - started)
+                    if second is not None:
+                        attempts.append(second)
+            self._recent.append(len(attempts) > 1)
+            winner = await self._first_success(attempts)
+            if winner is not first:
+                self.hedge_wins += 1
+            return winner.result()
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "over_budget": self.over_budget,
+            "hedge_rate": round(self.hedged / self.calls, 3) if self.calls else None,
+            "delay_ms": {
+                key: round(delay * 1000, 3) if (delay := self.delay(key)) is not None else None
+                for key in self._latency
+            },
+        }
+
+    def _start_hedge(
+        self, key: str, hedge: Callable[[float], Optional[Awaitable[T]]], elapsed: float
+    ) -> "Optional[asyncio.Future[T]]":
+        if sum(self._recent) >= self.max_rate * self._recent.maxlen:
+            self.over_budget += 1
+            return None
+        attempt = hedge(elapsed)
+        if attempt is None:
+            return None
+        self.hedged += 1
+        return asyncio.ensure_future(self._timed(key, attempt))
+
+    async def _timed(self, key: str, attempt: Awaitable[T]) -> T:
+        started = self._clock()
+        result = await attempt
+        # Only successes: a fast failure would pull the hedge delay down
+        self._latency.setdefault(key, LatencyTracker()).observe((self._clock() - started) * 1000)
+        return result
+
+    async def _first_success(self, attempts: "List[asyncio.Future[T]]") -> "asyncio.Future[T]":
+        """The first attempt to succeed; if all fail, the primary's error is raised."""
+        pending = set(attempts)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for attempt in done:
+                if attempt.exception() is None:
+                    return attempt
+        return attempts[0]
@@ -0,0 +1,415 @@
+"""
+Background debate jobs: submit a turn, then poll or long-poll for its result.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, Literal, Optional, TypeVar
+
+JobStatus = Literal["running", "succeeded", "failed"]
+T = TypeVar("T")
+
+
+@dataclass
+class Job:
+    job_id: str
+    user_id: str
+    kind: str  # the endpoint the job stands in for: "start_debate" or "step"
+    status: JobStatus = "running"
+    created_at: float = 0.0  # wall-clock, shared between workers
+    finished_at: Optional[float] = None
+    turn: Optional[dict] = None  # the turn payload the buffered endpoint would have returned
+    error: Optional[dict] = None  # {"status": <HTTP status>, "detail": ...}
+    request_key: str = ""  # identifies the submitted request, so a resubmit can join the job
+
+    @property
+    def finished(self) -> bool:
+        return self.status != "running"
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        del data["user_id"], data["request_key"]
+        return data
+
+
+class JobConflictError(Exception):
+    """The user already has a different job running."""
+
+    def __init__(self, job: Job) -> None:
+        super().__init__(f"job {job.job_id} is still running for this user")
+        self.job = job
+
+
+class JobStore(ABC):
+    """Where jobs and their results live until they are collected.
+
+    Finished jobs are kept for `ttl_seconds` after they finish. A job that is
+    still marked running after `ttl_seconds` belonged to a worker that died
+    and is dropped as well.
+
+    `blocking` stores wait on disk I/O and locks shared with other processes;
+    `JobRunner` and async callers run their methods in a worker thread.
+    """
+
+    blocking = False
+
+    @abstractmethod
+    def start(self, job: Job) -> Job:
+        """Insert the running `job` unless its user already has a running job; return the one running."""
+
+    @abstractmethod
+    def put(self, job: Job) -> None:
+        """Insert or replace `job`."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job, or None if unknown or expired."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of stored jobs."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Sizes, limits and eviction counters."""
+
+
+def _last_change(job: Job) -> float:
+    return job.finished_at if job.finished_at is not None else job.created_at
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local job store bounded by TTL and entry count.
+
+    Over `max_entries`, the oldest finished jobs are evicted first; running
+    jobs are only evicted once nothing else is left.
+    """
+
+    def __init__(
+        self, ttl_seconds: float = 3600.0, max_entries: int = 10_000, clock: Callable[[], float] = time.time
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._clock = clock
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._running: Dict[str, str] = {}  # user_id -> job_id
+        self.evictions = {"ttl": 0, "lru": 0}
+
+    def start(self, job: Job) -> Job:
+        job_id = self._running.get(job.user_id)
+        running = self.get(job_id) if job_id is not None else None
+        if running is not None and not running.finished:
+            return running
+        self.put(job)
+        return job
+
+    def put(self, job: Job) -> None:
+        self._jobs[job.job_id] = job
+        self._jobs.move_to_end(job.job_id)
+        if not job.finished:
+            self._running[job.user_id] = job.job_id
+        elif self._running.get(job.user_id) == job.job_id:
+            del self._running[job.user_id]
+        self._enforce_limits()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is not None and self._clock() - _last_change(job) >= self.ttl_seconds:
+            self._drop(job_id)
+            self.evictions["ttl"] += 1
+            return None
+        return job
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def stats(self) -> dict:
+        self._expire()
+        return {
+            "backend": "memory",
+            "entries": len(self._jobs),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": dict(self.evictions),
+        }
+
+    def _expire(self) -> None:
+        cutoff = self._clock() - self.ttl_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if _last_change(job) <= cutoff]:
+            self._drop(job_id)
+            self.evictions["ttl"] += 1
+
+    def _enforce_limits(self) -> None:
+        self._expire()
+        while len(self._jobs) > self.max_entries:
+            victim = next((job_id for job_id, job in self._jobs.items() if job.finished), next(iter(self._jobs)))
+            self._drop(victim)
+            self.evictions["lru"] += 1
+
+    def _drop(self, job_id: str) -> None:
+        job = self._jobs.pop(job_id)
+        if self._running.get(job.user_id) == job_id:
+            del self._running[job.user_id]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    updated_at REAL NOT NULL,
+    turn TEXT,
+    error TEXT,
+    request_key TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at);
+CREATE INDEX IF NOT EXISTS jobs_user_status ON jobs (user_id, status);
+"""
+
+_ADDED_COLUMNS = [
+    ("jobs", "request_key", "TEXT NOT NULL DEFAULT ''"),
+]
+
+_COLUMNS = "job_id, user_id, kind, status, created_at, finished_at, updated_at, turn, error, request_key"
+
+
+class SQLiteJobStore(JobStore):
+    """Job store in a SQLite database in WAL mode, shared by every worker.
+
+    A job runs in the worker that accepted it, but its status and result are
+    written here, so a poll answered by any worker sees them, and `start`
+    checks for the user's running job in the same transaction that inserts
+    the new one, so workers cannot both start a job for one user. Limits
+    mirror `InMemoryJobStore`; eviction counters are per process.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 10_000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self.evictions = {"ttl": 0, "lru": 0}
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _migrate(self) -> None:
+        for table, column, definition in _ADDED_COLUMNS:
+            columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def start(self, job: Job) -> Job:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire_locked()
+                row = self._conn.execute(
+                    f"SELECT {_COLUMNS} FROM jobs WHERE user_id = ? AND status = 'running' LIMIT 1", (job.user_id,)
+                ).fetchone()
+                if row is None:
+                    self._insert_locked(job)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return _job_from_row(row) if row is not None else job
+
+    def put(self, job: Job) -> None:
+        with self._lock:
+            self._insert_locked(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if self._clock() - row[6] >= self.ttl_seconds:
+                self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+                self.evictions["ttl"] += 1
+                return None
+        return _job_from_row(row)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire_locked()
+            entries = self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": dict(self.evictions),
+        }
+
+    def _insert_locked(self, job: Job) -> None:
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO jobs ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.job_id, job.user_id, job.kind, job.status, job.created_at, job.finished_at, _last_change(job),
+             _dumps(job.turn), _dumps(job.error), job.request_key),
+        )
+        self._enforce_limits_locked()
+
+    def _expire_locked(self) -> None:
+        expired = self._conn.execute(
+            "DELETE FROM jobs WHERE updated_at <= ? RETURNING job_id", (self._clock() - self.ttl_seconds,)
+        ).fetchall()
+        self.evictions["ttl"] += len(expired)
+
+    def _enforce_limits_locked(self) -> None:
+        self._expire_locked()
+        excess = self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        evicted = self._conn.execute(
+            "DELETE FROM jobs WHERE job_id IN "
+            "(SELECT job_id FROM jobs ORDER BY status = 'running', updated_at LIMIT ?) RETURNING job_id",
+            (excess,),
+        ).fetchall()
+        self.evictions["lru"] += len(evicted)
+
+
+def _job_from_row(row: tuple) -> Job:
+    return Job(job_id=row[0], user_id=row[1], kind=row[2], status=row[3], created_at=row[4], finished_at=row[5],
+               turn=_loads(row[7]), error=_loads(row[8]), request_key=row[9])
+
+
+def _dumps(value: Optional[dict]) -> Optional[str]:
+    return json.dumps(value, ensure_ascii=False) if value is not None else None
+
+
+def _loads(value: Optional[str]) -> Optional[dict]:
+    return json.loads(value) if value is not None else None
+
+
+def _internal_error(exc: Exception) -> dict:
+    return {"status": 500, "detail": str(exc)}
+
+
+class JobRunner:
+    """Run debate turns as background tasks and record their outcome in a `JobStore`.
+
+    A job keeps running when the client that submitted it goes away; only
+    `close()` (bridge shutdown) cancels it. Each user has at most one job
+    running at a time, across every worker sharing the store: resubmitting
+    the same request (same `key`) returns the running job, anything else
+    raises `JobConflictError`. A job left running by a worker that crashed
+    holds its user until the store expires it.
+
+    `wait()` long-polls: jobs running in this process are awaited directly,
+    jobs owned by another worker are re-read from the store every
+    `poll_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        poll_interval: float = 0.25,
+        describe_error: Callable[[Exception], dict] = _internal_error,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.store = store
+        self.poll_interval = poll_interval
+        self._describe_error = describe_error
+        self._clock = clock
+        self._tasks: Dict[str, "asyncio.Task[None]"] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+        self.counters = {"submitted": 0, "joined": 0, "succeeded": 0, "failed": 0}
+
+    async def submit(self, user_id: str, kind: str, key: str, work: Callable[[], Awaitable[dict]]) -> Job:
+        job = Job(job_id=uuid.uuid4().hex, user_id=user_id, kind=kind, created_at=self._clock(), request_key=key)
+        running = await self._store_call(self.store.start, job)
+        if running.job_id != job.job_id:
+            if running.request_key != key:
+                raise JobConflictError(running)
+            self.counters["joined"] += 1
+            return running
+        self._done[job.job_id] = asyncio.Event()
+        self._tasks[job.job_id] = asyncio.create_task(self._run(job, work))
+        self.counters["submitted"] += 1
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """The job once finished, or as it stands after `timeout` seconds."""
+        job = await self._store_call(self.store.get, job_id)
+        if job is None or job.finished or timeout <= 0:
+            return job
+        done = self._done.get(job_id)
+        if done is not None:
+            try:
+                await asyncio.wait_for(done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return await self._store_call(self.store.get, job_id)
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            await asyncio.sleep(min(self.poll_interval, remaining))
+            job = await self._store_call(self.store.get, job_id)
+            if job is None or job.finished:
+                return job
+
+    async def close(self) -> None:
+        """Cancel the jobs running in this process; they are recorded as failed."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @property
+    def running(self) -> int:
+        """Jobs running in this process; cheap enough for every metrics scrape."""
+        return len(self._tasks)
+
+    async def stats(self) -> dict:
+        return {**await self._store_call(self.store.stats), "running": self.running, **self.counters}
+
+    async def _store_call(self, call: Callable[..., T], *args: Any) -> T:
+        if self.store.blocking:
+            return await asyncio.to_thread(call, *args)
+        return call(*args)
+
+    async def _run(self, job: Job, work: Callable[[], Awaitable[dict]]) -> None:
+        try:
+            job.turn = await work()
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status, job.error = "failed", {"status": 503, "detail": "bridge shut down before the job finished"}
+            raise
+        except Exception as exc:
+            job.status, job.error = "failed", self._describe_error(exc)
+        finally:
+            job.finished_at = self._clock()
+            await self._store_call(self.store.put, job)
+            self.counters[job.status] += 1
+            self._tasks.pop(job.job_id, None)
+            self._done.pop(job.job_id).set()
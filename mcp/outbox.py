@@ -0,0 +1,78 @@
+"""
+Bounded, coalescing buffer of events on their way to a possibly slow consumer.
+"""
+
+import asyncio
+from collections import deque
+from typing import Deque, Optional
+
+
+class OutboxOverflow(Exception):
+    """The consumer fell further behind than the outbox allows."""
+
+
+def _text_size(event: dict) -> int:
+    return sum(len(value) for value in event.values() if isinstance(value, str))
+
+
+class Outbox:
+    """Events for one consumer, buffered without ever blocking the producer.
+
+    A `chunk` event waiting behind another `chunk` of the same stream (same
+    fields apart from `data`) is merged into it, so a consumer that falls
+    behind receives fewer, larger chunks while the CLI output keeps flowing.
+    Only when the text waiting for the consumer exceeds `max_bytes` does
+    `put` raise `OutboxOverflow`; the caller is expected to drop the consumer.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._events: Deque[dict] = deque()
+        self._size = 0
+        self._ready = asyncio.Event()
+        self._closed = False
+        self.merged = 0
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._size
+
+    def put(self, event: dict) -> None:
+        if self._closed:
+            return
+        tail = self._events[-1] if self._events else None
+        if tail is not None and event.get("type") == "chunk" and self._same_stream(tail, event):
+            tail["data"] += event["data"]
+            self._size += len(event["data"])
+            self.merged += 1
+        else:
+            self._events.append(dict(event))
+            self._size += _text_size(event)
+        self._ready.set()
+        if self._size > self.max_bytes:
+            raise OutboxOverflow(f"{self._size} bytes waiting for the consumer")
+
+    def close(self) -> None:
+        """Stop accepting events; `get` returns None once the buffer is drained."""
+        self._closed = True
+        self._ready.set()
+
+    async def get(self) -> Optional[dict]:
+        while not self._events:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        event = self._events.popleft()
+        self._size -= _text_size(event)
+        return event
+
+    @staticmethod
+    def _same_stream(tail: dict, event: dict) -> bool:
+        if tail.get("type") != "chunk":
+            return False
+        keys = (set(tail) | set(event)) - {"data"}
+        return all(tail.get(key) == event.get(key) for key in keys)
@@ -0,0 +1,175 @@
+"""
+Model Context Protocol (JSON-RPC 2.0) dispatch shared by the stdio and HTTP transports.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger("mcp.rpc")
+
+PROTOCOL_VERSIONS = ("2025-06-18", "2025-03-26", "2024-11-05")  # newest first
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+Notify = Callable[[dict], Awaitable[None]]
+
+
+class RpcError(Exception):
+    """A JSON-RPC error response."""
+
+    def __init__(self, code: int, message: str, data: Any = None) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def to_dict(self) -> dict:
+        error = {"code": self.code, "message": self.message}
+        if self.data is not None:
+            error["data"] = self.data
+        return error
+
+
+class ToolError(Exception):
+    """A tool ran but failed; reported to the model as a result with `isError`."""
+
+
+@dataclass
+class ToolContext:
+    """What a tool handler gets besides its arguments."""
+
+    user_id: str
+    progress: Callable[[str], Awaitable[None]]  # sends a progress notification if the client asked for them
+
+
+ToolHandler = Callable[[dict, ToolContext], Awaitable[dict]]
+
+
+def error_response(request_id: Any, error: RpcError) -> dict:
+    return {"jsonrpc": "2.0", "id": request_id, "error": error.to_dict()}
+
+
+def is_request(message: Any) -> bool:
+    """A call that expects a response, as opposed to a notification or a response."""
+    return isinstance(message, dict) and "method" in message and "id" in message
+
+
+def progress_token(message: Any) -> Optional[Union[str, int]]:
+    if not isinstance(message, dict) or not isinstance(message.get("params"), dict):
+        return None
+    meta = message["params"].get("_meta")
+    return meta.get("progressToken") if isinstance(meta, dict) else None
+
+
+class McpServer:
+    """Serve `initialize`, `ping`, `tools/list` and `tools/call`.
+
+    `tools` are the definitions from `mcp.json` (`input_schema` is exposed as
+    `inputSchema`); `handlers` maps each tool name to the coroutine that runs
+    it. A handler's dict result is returned both as JSON text content and as
+    `structuredContent`. When the client passes `_meta.progressToken`, the
+    handler's `progress()` calls become `notifications/progress` messages.
+    """
+
+    def __init__(self, name: str, version: str, tools: List[dict], handlers: Dict[str, ToolHandler]) -> None:
+        self.name = name
+        self.version = version
+        self.tools = [
+            {"name": tool["name"], "description": tool.get("description", ""), "inputSchema": tool["input_schema"]}
+            for tool in tools
+        ]
+        self.handlers = handlers
+        self.counters = {"requests": 0, "notifications": 0, "errors": 0, "tool_calls": 0, "tool_errors": 0}
+
+    async def handle_payload(self, payload: Any, user_id: str, notify: Notify) -> Optional[Union[dict, List[dict]]]:
+        """Handle one message or a batch; None when nothing needs a response."""
+        if isinstance(payload, list):
+            if not payload:
+                return error_response(None, RpcError(INVALID_REQUEST, "empty batch"))
+            responses = [await self.handle(message, user_id, notify) for message in payload]
+            return [response for response in responses if response is not None] or None
+        return await self.handle(payload, user_id, notify)
+
+    async def handle(self, message: Any, user_id: str, notify: Notify) -> Optional[dict]:
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0":
+            self.counters["errors"] += 1
+            return error_response(None, RpcError(INVALID_REQUEST, "not a JSON-RPC 2.0 message"))
+        if "method" not in message:
+            return None  # a response to a server request; this server sends none
+        if "id" not in message:
+            self.counters["notifications"] += 1
+            return None  # notifications/initialized, notifications/cancelled, ...
+        self.counters["requests"] += 1
+        request_id = message["id"]
+        try:
+            result = await self._dispatch(message["method"], message.get("params") or {}, message, user_id, notify)
+        except RpcError as exc:
+            self.counters["errors"] += 1
+            return error_response(request_id, exc)
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    def stats(self) -> dict:
+        return dict(self.counters)
+
+    async def _dispatch(self, method: str, params: Any, message: dict, user_id: str, notify: Notify) -> dict:
+        if not isinstance(params, dict):
+            raise RpcError(INVALID_PARAMS, "params must be an object")
+        if method == "initialize":
+            requested = params.get("protocolVersion")
+            return {
+                "protocolVersion": requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0],
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": {"name": self.name, "version": self.version},
+            }
+        if method == "ping":
+            return {}
+        if method == "tools/list":
+            return {"tools": self.tools}
+        if method == "tools/call":
+            return await self._call_tool(params, progress_token(message), user_id, notify)
+        raise RpcError(METHOD_NOT_FOUND, f"method not found: {method}")
+
+    async def _call_tool(
+        self, params: dict, token: Optional[Union[str, int]], user_id: str, notify: Notify
+    ) -> dict:
+        name = params.get("name")
+        handler = self.handlers.get(name)
+        if handler is None:
+            raise RpcError(INVALID_PARAMS, f"unknown tool: {name}")
+        arguments = params.get("arguments") or {}
+        if not isinstance(arguments, dict):
+            raise RpcError(INVALID_PARAMS, "arguments must be an object")
+        sent = 0
+
+        async def progress(text: str) -> None:
+            nonlocal sent
+            if token is None:
+                return
+            sent += 1
+            await notify({
+                "jsonrpc": "2.0",
+                "method": "notifications/progress",
+                "params": {"progressToken": token, "progress": sent, "message": text},
+            })
+
+        self.counters["tool_calls"] += 1
+        try:
+            result = await handler(arguments, ToolContext(user_id=user_id, progress=progress))
+        except ToolError as exc:
+            self.counters["tool_errors"] += 1
+            return {"content": [{"type": "text", "text": str(exc)}], "isError": True}
+        except RpcError:
+            raise
+        except Exception as exc:
+            logger.exception("MCP tool failed", extra={"tool": name})
+            raise RpcError(INTERNAL_ERROR, "internal error") from exc
+        return {
+            "content": [{"type": "text", "text": json.dumps(result, ensure_ascii=False)}],
+            "structuredContent": result,
+        }
@@ -0,0 +1,469 @@
+"""
+Debate session state and the stores that hold it.
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, List, Literal, Optional
+
+Mode = Literal["default", "critique", "consensus"]
+Responder = Literal["codex", "claude", "both"]
+
+# Rough per-object overhead so that sessions with tiny outputs still count.
+_SESSION_OVERHEAD_BYTES = 512
+_TURN_OVERHEAD_BYTES = 256
+
+
+@dataclass
+class Turn:
+    """A turn in the debate: one model's response, or both in a parallel round."""
+    user_instruction: str
+    codex_output: Optional[str] = None  # None if Codex didn't respond this turn
+    claude_output: Optional[str] = None  # None if Claude didn't respond this turn
+    responder: Responder = "codex"  # Who responded in this turn ("both" in parallel mode)
+    codex_latency_ms: Optional[float] = None  # CLI round trip as seen by the bridge
+    claude_latency_ms: Optional[float] = None
+
+
+@dataclass
+class DebateSession:
+    active: bool = False
+    history: List[Turn] = field(default_factory=list)
+    user_id: Optional[str] = None
+    next_responder: Literal["codex", "claude"] = "codex"  # Track who should respond next
+    mode: Mode = "default"
+    parallel: bool = False  # Both models answer every round concurrently
+    generation: str = ""  # Set by stores that outlive this object, so writes to a replaced session are dropped
+
+
+def trim_history(session: DebateSession, max_turns: int) -> None:
+    """Keep at most `max_turns` of the most recent turns."""
+    if len(session.history) > max_turns:
+        session.history[:] = session.history[-max_turns:]
+
+
+def turn_size(turn: Turn) -> int:
+    """Approximate memory held by a turn, dominated by the stored texts."""
+    return (
+        _TURN_OVERHEAD_BYTES
+        + len(turn.user_instruction)
+        + len(turn.codex_output or "")
+        + len(turn.claude_output or "")
+    )
+
+
+def session_size(session: DebateSession) -> int:
+    return _SESSION_OVERHEAD_BYTES + sum(turn_size(turn) for turn in session.history)
+
+
+class SessionStore(ABC):
+    """Where debate sessions live between requests.
+
+    Handlers mutate the returned `DebateSession` and report changes back:
+    `append_turn` for new turns and `save` for metadata (active flag, next
+    responder, mode, parallel). Implementations must not require rewriting the whole
+    history to persist a turn, and must drop both for a session that has since
+    been deleted or replaced by `create`.
+
+    `blocking` stores wait on disk I/O and locks shared with other processes;
+    async callers run their methods in a worker thread.
+    """
+
+    blocking = False
+
+    @abstractmethod
+    def get(self, user_id: str) -> Optional[DebateSession]:
+        """Return the live session for `user_id`, refreshing its idle timer."""
+
+    @abstractmethod
+    def peek(self, user_id: str) -> Optional[DebateSession]:
+        """Return the live session for `user_id` without refreshing its idle timer or writing anything."""
+
+    @abstractmethod
+    def create(self, user_id: str) -> DebateSession:
+        """Create (or replace) the session for `user_id`."""
+
+    @abstractmethod
+    def append_turn(self, session: DebateSession, turn: Turn) -> None:
+        """Append `turn` to the session and trim its history."""
+
+    @abstractmethod
+    def save(self, session: DebateSession) -> None:
+        """Persist the session's metadata."""
+
+    @abstractmethod
+    def delete(self, user_id: str) -> None:
+        """Remove the session for `user_id` if present."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of stored sessions."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Sizes, limits and eviction counters."""
+
+
+@dataclass
+class _Entry:
+    session: DebateSession
+    size: int
+    last_access: float
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local session store bounded by idle TTL, entry count and bytes.
+
+    Entries are kept in least-recently-used order, so expired sessions and
+    eviction candidates are always at the front and each operation does O(1)
+    amortized cleanup work. Sessions are only ever evicted whole.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_entries: int,
+        max_bytes: int,
+        max_history_turns: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self.max_history_turns = max_history_turns
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = {"ttl": 0, "lru": 0, "bytes": 0}
+
+    def get(self, user_id: str) -> Optional[DebateSession]:
+        now = self._clock()
+        self._expire(now)
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        entry.last_access = now
+        self._entries.move_to_end(user_id)
+        return entry.session
+
+    def peek(self, user_id: str) -> Optional[DebateSession]:
+        entry = self._entries.get(user_id)
+        if entry is None or self._clock() - entry.last_access >= self.ttl_seconds:
+            return None
+        return entry.session
+
+    def create(self, user_id: str) -> DebateSession:
+        """Create (or replace) the session for `user_id`."""
+        self.delete(user_id)
+        session = DebateSession(user_id=user_id, next_responder="codex")
+        size = session_size(session)
+        self._entries[user_id] = _Entry(session=session, size=size, last_access=self._clock())
+        self._bytes += size
+        self._enforce_limits()
+        return session
+
+    def append_turn(self, session: DebateSession, turn: Turn) -> None:
+        """Append `turn`, trim the history and re-account the session's size."""
+        session.history.append(turn)
+        trim_history(session, self.max_history_turns)
+        self._resize(session)
+
+    def save(self, session: DebateSession) -> None:
+        """Persist session metadata; in memory it only refreshes the entry's recency."""
+        entry = self._entries.get(session.user_id)
+        if entry is not None and entry.session is session:
+            entry.last_access = self._clock()
+            self._entries.move_to_end(session.user_id)
+
+    def delete(self, user_id: str) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        self._expire(self._clock())
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": dict(self.evictions),
+        }
+
+    def _resize(self, session: DebateSession) -> None:
+        entry = self._entries.get(session.user_id)
+        if entry is None or entry.session is not session:
+            return
+        size = session_size(session)
+        self._bytes += size - entry.size
+        entry.size = size
+        entry.last_access = self._clock()
+        self._entries.move_to_end(session.user_id)
+        self._enforce_limits()
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            user_id, entry = next(iter(self._entries.items()))
+            if now - entry.last_access < self.ttl_seconds:
+                return
+            self._evict(user_id, "ttl")
+
+    def _enforce_limits(self) -> None:
+        self._expire(self._clock())
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)), "lru")
+        # Never evict the most recently used session for its own size.
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._evict(next(iter(self._entries)), "bytes")
+
+    def _evict(self, user_id: str, reason: str) -> None:
+        self.delete(user_id)
+        self.evictions[reason] += 1
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id TEXT PRIMARY KEY,
+    active INTEGER NOT NULL,
+    next_responder TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    parallel INTEGER NOT NULL DEFAULT 0,
+    last_access REAL NOT NULL,
+    bytes INTEGER NOT NULL,
+    generation TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    user_instruction TEXT NOT NULL,
+    codex_output TEXT,
+    claude_output TEXT,
+    responder TEXT NOT NULL,
+    codex_latency_ms REAL,
+    claude_latency_ms REAL,
+    bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_user ON turns (user_id, id);
+"""
+
+# Columns added after the first release of the schema: (table, column, definition)
+_ADDED_COLUMNS = [
+    ("sessions", "parallel", "INTEGER NOT NULL DEFAULT 0"),
+    ("turns", "codex_latency_ms", "REAL"),
+    ("turns", "claude_latency_ms", "REAL"),
+    ("sessions", "generation", "TEXT NOT NULL DEFAULT ''"),
+]
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store in a SQLite database in WAL mode.
+
+    Every `uvicorn` worker opens the same file, so sessions survive restarts
+    and are shared across workers. A new turn is a single INSERT (plus a
+    DELETE of the oldest rows once the history exceeds its cap) rather than a
+    rewrite of the session. Limits mirror `InMemorySessionStore`; idle time is
+    measured in wall-clock seconds because it is shared between processes,
+    and eviction counters are per process.
+
+    Each `create` gives the session a new generation. `append_turn` and `save`
+    only write while the stored session still has the caller's generation, so
+    a turn that finishes after the session was stopped or restarted (possibly
+    by another worker) is dropped instead of landing in the wrong debate.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float,
+        max_entries: int,
+        max_bytes: int,
+        max_history_turns: int,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self.max_history_turns = max_history_turns
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self.evictions = {"ttl": 0, "lru": 0, "bytes": 0}
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _migrate(self) -> None:
+        for table, column, definition in _ADDED_COLUMNS:
+            columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def get(self, user_id: str) -> Optional[DebateSession]:
+        return self._load(user_id, touch=True)
+
+    def peek(self, user_id: str) -> Optional[DebateSession]:
+        return self._load(user_id, touch=False)
+
+    def _load(self, user_id: str, touch: bool) -> Optional[DebateSession]:
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT active, next_responder, mode, parallel, last_access, generation "
+                "FROM sessions WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[4] >= self.ttl_seconds:
+                if touch:
+                    self._delete_locked(user_id)
+                    self.evictions["ttl"] += 1
+                return None
+            if touch:
+                self._conn.execute("UPDATE sessions SET last_access = ? WHERE user_id = ?", (now, user_id))
+            turns = self._conn.execute(
+                "SELECT user_instruction, codex_output, claude_output, responder, codex_latency_ms, claude_latency_ms "
+                "FROM turns WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+                (user_id, self.max_history_turns),
+            ).fetchall()
+        history = [Turn(user_instruction=t[0], codex_output=t[1], claude_output=t[2], responder=t[3],
+                        codex_latency_ms=t[4], claude_latency_ms=t[5])
+                   for t in reversed(turns)]
+        return DebateSession(active=bool(row[0]), history=history, user_id=user_id,
+                             next_responder=row[1], mode=row[2], parallel=bool(row[3]), generation=row[5])
+
+    def create(self, user_id: str) -> DebateSession:
+        session = DebateSession(user_id=user_id, next_responder="codex", generation=uuid.uuid4().hex)
+        with self._lock, self._transaction():
+            self._delete_locked(user_id)
+            self._conn.execute(
+                "INSERT INTO sessions (user_id, active, next_responder, mode, parallel, last_access, bytes, "
+                "generation) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_id, int(session.active), session.next_responder, session.mode, int(session.parallel),
+                 self._clock(), _SESSION_OVERHEAD_BYTES, session.generation),
+            )
+            self._enforce_limits_locked(keep=user_id)
+        return session
+
+    def append_turn(self, session: DebateSession, turn: Turn) -> None:
+        session.history.append(turn)
+        trim_history(session, self.max_history_turns)
+        size = turn_size(turn)
+        with self._lock, self._transaction():
+            inserted = self._conn.execute(
+                "INSERT INTO turns (user_id, user_instruction, codex_output, claude_output, responder, "
+                "codex_latency_ms, claude_latency_ms, bytes) SELECT ?, ?, ?, ?, ?, ?, ?, ? "
+                "WHERE EXISTS (SELECT 1 FROM sessions WHERE user_id = ? AND generation = ?)",
+                (session.user_id, turn.user_instruction, turn.codex_output, turn.claude_output, turn.responder,
+                 turn.codex_latency_ms, turn.claude_latency_ms, size, session.user_id, session.generation),
+            ).rowcount
+            if not inserted:
+                return  # the session was stopped or replaced while the turn ran
+            trimmed = self._conn.execute(
+                "DELETE FROM turns WHERE user_id = ? AND id <= "
+                "(SELECT id FROM turns WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?) RETURNING bytes",
+                (session.user_id, session.user_id, self.max_history_turns),
+            ).fetchall()
+            size -= sum(row[0] for row in trimmed)
+            self._conn.execute(
+                "UPDATE sessions SET bytes = bytes + ?, last_access = ? WHERE user_id = ?",
+                (size, self._clock(), session.user_id),
+            )
+            self._enforce_limits_locked(keep=session.user_id)
+
+    def save(self, session: DebateSession) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET active = ?, next_responder = ?, mode = ?, parallel = ?, last_access = ? "
+                "WHERE user_id = ? AND generation = ?",
+                (int(session.active), session.next_responder, session.mode, int(session.parallel), self._clock(),
+                 session.user_id, session.generation),
+            )
+
+    def delete(self, user_id: str) -> None:
+        with self._lock, self._transaction():
+            self._delete_locked(user_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire_locked()
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions").fetchone()
+        return {
+            "backend": "sqlite",
+            "entries": entries,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": dict(self.evictions),
+        }
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._conn)
+
+    def _delete_locked(self, user_id: str) -> None:
+        self._conn.execute("DELETE FROM turns WHERE user_id = ?", (user_id,))
+        self._conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+
+    def _expire_locked(self) -> None:
+        expired = self._conn.execute(
+            "SELECT user_id FROM sessions WHERE last_access <= ?", (self._clock() - self.ttl_seconds,)
+        ).fetchall()
+        for (user_id,) in expired:
+            self._delete_locked(user_id)
+        self.evictions["ttl"] += len(expired)
+
+    def _enforce_limits_locked(self, keep: str) -> None:
+        self._expire_locked()
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        oldest = self._conn.execute(
+            "SELECT user_id, bytes FROM sessions WHERE user_id != ? ORDER BY last_access", (keep,)
+        )
+        for user_id, size in oldest.fetchall():
+            if count > self.max_entries:
+                reason = "lru"
+            elif total > self.max_bytes:
+                reason = "bytes"
+            else:
+                break
+            self._delete_locked(user_id)
+            self.evictions[reason] += 1
+            count -= 1
+            total -= size
+
+
+class _Transaction:
+    """`BEGIN IMMEDIATE` ... `COMMIT`/`ROLLBACK` on an autocommit connection."""
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self._conn = conn
+
+    def __enter__(self) -> None:
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
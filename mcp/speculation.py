@@ -0,0 +1,150 @@
+"""
+Speculative execution of the likely next debate turn.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+ModelCaller = Callable[[str, str], Awaitable[str]]
+
+
+@dataclass
+class _Speculation:
+    task: "asyncio.Task[str]"
+    started: float
+    finished: Optional[float] = None
+
+
+class Speculator:
+    """Background CLI calls for the prompts the next /step is likely to send.
+
+    Speculations are keyed by user, model and the exact prompt, so a result is
+    only reused when the real step sends the identical prompt. Claiming a
+    prompt cancels the user's other speculations for that model (the losing
+    decision); anything left over is cancelled when the user's next round of
+    speculation starts or the session ends. Results live in this process only.
+
+    Sessions that expire or are evicted never say so, so speculations are
+    bounded like the sessions themselves: a round older than `ttl_seconds` is
+    dropped, and past `max_users` users the oldest round goes first.
+
+    At most `max_inflight` speculative calls run at once across all users;
+    further candidates are skipped rather than queued.
+    """
+
+    def __init__(
+        self,
+        max_inflight: int,
+        ttl_seconds: float = 3600.0,
+        max_users: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_inflight = max(1, max_inflight)
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max(1, max_users)
+        self._clock = clock
+        # user_id -> that user's round, oldest round first
+        self._pending: "OrderedDict[str, Dict[Tuple[str, str], _Speculation]]" = OrderedDict()
+        self.started = 0
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.wasted_seconds = 0.0
+        self.expired = 0
+
+    def start(self, user_id: str, prompts: Iterable[Tuple[str, str]], call: ModelCaller) -> None:
+        """Cancel the user's previous speculations and launch one call per (model, prompt)."""
+        self.cancel(user_id)
+        self._expire(room=1)
+        pending = self._pending.setdefault(user_id, {})
+        for key in prompts:
+            if key in pending:
+                continue
+            if self.inflight() >= self.max_inflight:
+                self.skipped += 1
+                continue
+            speculation = _Speculation(task=asyncio.create_task(call(*key)), started=self._clock())
+            speculation.task.add_done_callback(lambda task, s=speculation: self._finished(s, task))
+            pending[key] = speculation
+            self.started += 1
+        if not pending:
+            del self._pending[user_id]
+
+    def wrap(self, user_id: str, call: ModelCaller) -> ModelCaller:
+        """Return a caller that serves speculated prompts and falls back to `call`."""
+
+        async def speculative_call(model: str, prompt: str) -> str:
+            task = self._claim(user_id, model, prompt)
+            if task is not None:
+                try:
+                    return await task
+                except Exception:
+                    pass  # a failed speculation is retried for real
+            return await call(model, prompt)
+
+        return speculative_call
+
+    def cancel(self, user_id: str) -> None:
+        """Drop every outstanding speculation for `user_id`."""
+        for speculation in self._pending.pop(user_id, {}).values():
+            self._discard(speculation)
+
+    def inflight(self) -> int:
+        return sum(1 for pending in self._pending.values() for s in pending.values() if not s.task.done())
+
+    def stats(self) -> dict:
+        self._expire()
+        lookups = self.hits + self.misses
+        return {
+            "max_inflight": self.max_inflight,
+            "inflight": self.inflight(),
+            "users": len(self._pending),
+            "started": self.started,
+            "skipped": self.skipped,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "wasted_cli_seconds": round(self.wasted_seconds, 3),
+            "expired": self.expired,
+        }
+
+    def _claim(self, user_id: str, model: str, prompt: str) -> Optional["asyncio.Task[str]"]:
+        pending = self._pending.get(user_id)
+        if not pending:
+            return None
+        hit = pending.pop((model, prompt), None)
+        for key in [key for key in pending if key[0] == model]:
+            self._discard(pending.pop(key))
+        if not pending:
+            del self._pending[user_id]
+        if hit is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.saved_seconds += (hit.finished or self._clock()) - hit.started
+        return hit.task
+
+    def _expire(self, room: int = 0) -> None:
+        """Cancel rounds older than `ttl_seconds`, then the oldest until `room` more users fit."""
+        cutoff = self._clock() - self.ttl_seconds
+        while self._pending:
+            user_id, pending = next(iter(self._pending.items()))
+            started = min(speculation.started for speculation in pending.values())
+            if started > cutoff and len(self._pending) + room <= self.max_users:
+                return
+            self.cancel(user_id)
+            self.expired += 1
+
+    def _discard(self, speculation: _Speculation) -> None:
+        self.wasted_seconds += (speculation.finished or self._clock()) - speculation.started
+        speculation.task.cancel()
+
+    def _finished(self, speculation: _Speculation, task: "asyncio.Task[str]") -> None:
+        speculation.finished = self._clock()
+        if not task.cancelled():
+            task.exception()  # retrieved here so unclaimed failures are not logged as lost
@@ -0,0 +1,79 @@
+"""
+MCP over stdio: newline-delimited JSON-RPC on stdin and stdout.
+
+Runs the bridge's debate logic in this process, so an IDE that launches it
+talks to the session logic without an HTTP hop to the bridge; the host
+wrappers are still reached over HTTP as configured for the bridge
+(`CODEX_WRAPPER_URL`, ...). Logs go to stderr because stdout carries the
+protocol.
+
+    python -m mcp.stdio
+"""
+
+import asyncio
+import json
+import os
+import sys
+import uuid
+from typing import Callable, Set, Union
+
+from mcp import bridge
+from mcp.rpc import PARSE_ERROR, RpcError, error_response
+
+# One stdio server per IDE window; a random id keeps windows apart in a shared session store
+USER_ID = os.getenv("MCP_STDIO_USER_ID") or f"stdio-{uuid.uuid4().hex}"
+MAX_LINE_BYTES = 1024 * 1024
+
+
+async def serve(reader: asyncio.StreamReader, write: Callable[[bytes], None], user_id: str = USER_ID) -> None:
+    """Answer messages until EOF.
+
+    Each request runs in its own task, so pings and progress notifications
+    keep flowing while a CLI run is in progress. Calls still running at EOF
+    are awaited before returning.
+    """
+
+    async def send(message: Union[dict, list]) -> None:
+        write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    async def handle(line: bytes) -> None:
+        try:
+            payload = json.loads(line)
+        except ValueError:
+            await send(error_response(None, RpcError(PARSE_ERROR, "parse error")))
+            return
+        response = await bridge._mcp_server.handle_payload(payload, user_id, send)
+        if response is not None:
+            await send(response)
+
+    tasks: Set["asyncio.Task[None]"] = set()
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        task = asyncio.create_task(handle(line))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _main() -> None:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    def write(data: bytes) -> None:
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+
+    try:
+        await serve(reader, write)
+    finally:
+        if bridge._http_client is not None:
+            await bridge._http_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
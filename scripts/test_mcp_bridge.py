@@ -1,9 +1,24 @@
 """
 MCPブリッジの動作確認用スクリプト
+
+引数なしで実行すると1つの議論を順に確認します。`--load` を付けると負荷生成モードになり、
+仮想ユーザーを使ってリクエスト数を段階的に増やし、スループットとレイテンシの変化、
+律速になった箇所（レート制限 / ラッパーの同時実行数など）を報告します。
+
+    python test_mcp_bridge.py
+    python test_mcp_bridge.py --load --users 20 --rates 0.5,1,2,4 --stage-seconds 60
 """
-import requests
+import argparse
+import json
+import random
 import sys
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import requests
 
 MCP_URL = "http://localhost:8080"
 USER_ID = str(uuid.uuid4())  # テスト用の固定ユーザーID
@@ -121,6 +136,253 @@ def test_stop() -> bool:
         return False
 
 
+# ---- 負荷生成モード ----
+
+LOAD_OPERATIONS = ("start", "step", "stop")
+# 律速の判定: 到着したリクエストのうち成功した割合がこれを下回るか、p95 が最初の段階のこの倍数を超えたら飽和とみなす
+KNEE_SUCCESS_RATIO = 0.9
+KNEE_LATENCY_FACTOR = 2.0
+
+
+class SyntheticUser:
+    """負荷生成用の仮想ユーザー（固有の X-User-ID を持ち、同時に1リクエストだけ送る）"""
+
+    def __init__(self, timeout: float):
+        self.user_id = f"load-{uuid.uuid4()}"
+        self.timeout = timeout
+        self.active = False  # 議論中かどうか
+        self.debates = 0
+        self.session = requests.Session()
+
+    def send(self, operation: str) -> Tuple[str, float, str]:
+        """操作を1回実行し、(ステータス, レイテンシ秒, エラー詳細) を返す"""
+        if operation == "start":
+            self.debates += 1
+            path, payload = "/start_debate", {"initial_prompt": f"負荷試験のトピック {self.user_id} #{self.debates}"}
+        elif operation == "step":
+            path, payload = "/step", {"decision": {"type": "adopt_codex"}}
+        else:
+            path, payload = "/stop", None
+        started = time.perf_counter()
+        try:
+            resp = self.session.post(
+                f"{MCP_URL}{path}", json=payload, headers={"X-User-ID": self.user_id}, timeout=self.timeout
+            )
+            status, detail = str(resp.status_code), "" if resp.ok else resp.text[:200]
+        except requests.exceptions.Timeout:
+            status, detail = "timeout", ""
+        except requests.exceptions.RequestException as e:
+            status, detail = "error", str(e)[:200]
+        latency = time.perf_counter() - started
+        if operation == "start":
+            self.active = status == "200"
+        elif operation == "stop" or status in ("400", "404"):
+            self.active = False  # 終了済み・期限切れのセッションは次に start からやり直す
+        return status, latency, detail
+
+
+class LoadGenerator:
+    """オープンループ（到着レート固定）で仮想ユーザーにリクエストを割り当てる
+
+    到着はポアソン過程で、応答を待たずに次の到着が来ます。到着時に空いている
+    ユーザーがいなければ、そのリクエストは「取りこぼし」として数えます。
+    """
+
+    def __init__(self, users: int, mix: Sequence[float], timeout: float, seed: int):
+        self.users = [SyntheticUser(timeout) for _ in range(users)]
+        self.idle = list(self.users)
+        self.mix = mix
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=users)
+
+    def _checkout(self, operation: str) -> Optional[Tuple[SyntheticUser, str]]:
+        """操作に合う空きユーザーを選ぶ。議論中のユーザーがいなければ start、議論前のユーザーしかいなければ step を諦めて start"""
+        with self.lock:
+            preferred = operation != "start"  # step / stop は議論中のユーザーに送る
+            fallback = "step" if operation == "start" else "start"
+            for active, op in ((preferred, operation), (not preferred, fallback)):
+                for idx, user in enumerate(self.idle):
+                    if user.active == active:
+                        return self.idle.pop(idx), op
+        return None
+
+    def _run(self, user: SyntheticUser, operation: str) -> Tuple[str, str, float, str]:
+        try:
+            return (operation, *user.send(operation))
+        finally:
+            with self.lock:
+                self.idle.append(user)
+
+    def run_stage(self, rate: float, seconds: float) -> dict:
+        futures = []
+        dropped = 0
+        started = time.perf_counter()
+        arrival = started
+        while True:
+            arrival += self.rng.expovariate(rate)
+            if arrival >= started + seconds:
+                break
+            time.sleep(max(0.0, arrival - time.perf_counter()))
+            operation = self.rng.choices(LOAD_OPERATIONS, weights=self.mix)[0]
+            checkout = self._checkout(operation)
+            if checkout is None:
+                dropped += 1
+                continue
+            futures.append(self.executor.submit(self._run, *checkout))
+        wait(futures)
+        elapsed = max(time.perf_counter() - started, seconds)
+        return summarize_stage(rate, elapsed, [future.result() for future in futures], dropped)
+
+    def close(self) -> None:
+        """議論中のユーザーのセッションを終了する"""
+        wait([self.executor.submit(user.send, "stop") for user in self.users if user.active])
+        self.executor.shutdown()
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize_stage(rate: float, elapsed: float, results: List[Tuple[str, str, float, str]], dropped: int) -> dict:
+    latencies = [latency * 1000 for _, status, latency, _ in results if status == "200"]
+    statuses: Dict[str, int] = {}
+    details: Dict[str, str] = {}
+    for _, status, _, detail in results:
+        statuses[status] = statuses.get(status, 0) + 1
+        if detail:
+            details.setdefault(status, detail)
+    return {
+        "offered_per_s": rate,
+        "sent": len(results),
+        "dropped": dropped,
+        "ok": len(latencies),
+        "ok_per_s": round(len(latencies) / elapsed, 3),
+        "p50_ms": round(_percentile(latencies, 50), 1),
+        "p95_ms": round(_percentile(latencies, 95), 1),
+        "p99_ms": round(_percentile(latencies, 99), 1),
+        "status": dict(sorted(statuses.items())),
+        "error_samples": details,
+    }
+
+
+def classify_bottleneck(stage: dict) -> Optional[str]:
+    """段階の応答から律速箇所を推定する（エラーも取りこぼしもなければ None）"""
+    status = stage["status"]
+    errors = {code: count for code, count in status.items() if code != "200"}
+    wrapper_busy = sum(
+        count for code, count in errors.items()
+        if code in ("502", "503") and any(
+            marker in stage["error_samples"].get(code, "") for marker in ("503", "queue is full", "circuit open")
+        )
+    )
+    if errors.get("429", 0) and errors["429"] >= wrapper_busy:
+        return "ブリッジのレート制限（MCP_RATE_MAX_REQUESTS / MCP_RATE_WINDOW）"
+    if wrapper_busy:
+        return "ラッパーの同時実行数（WRAPPER_MAX_CONCURRENCY / WRAPPER_MAX_QUEUE）"
+    if errors.get("504", 0) or errors.get("timeout", 0):
+        return "タイムアウト（CLI の処理時間が期限を超えている）"
+    if stage["dropped"]:
+        return "仮想ユーザー数（全員が応答待ち。--users を増やすか、バックエンドの遅延を確認）"
+    if errors:
+        return f"その他のエラー（{', '.join(sorted(errors))}）"
+    return None
+
+
+def find_knee(stages: List[dict]) -> Optional[dict]:
+    """到着したリクエストをさばけなくなるか、p95 が急増した最初の段階"""
+    baseline_p95 = stages[0]["p95_ms"] if stages else 0.0
+    for idx, stage in enumerate(stages):
+        arrived = stage["sent"] + stage["dropped"]
+        behind = arrived > 0 and stage["ok"] < KNEE_SUCCESS_RATIO * arrived
+        slower = baseline_p95 > 0 and stage["p95_ms"] > KNEE_LATENCY_FACTOR * baseline_p95
+        if behind or slower:
+            # 遅くなっただけの段階では原因が分からないので、より高い到着レートで出たエラーも見る
+            causes = (classify_bottleneck(later) for later in stages[idx:])
+            bottleneck = next((cause for cause in causes if cause), None)
+            return {
+                "offered_per_s": stage["offered_per_s"],
+                "bottleneck": bottleneck or "レイテンシの増加（ラッパーで CLI の実行枠を待っている可能性）",
+            }
+    return None
+
+
+def run_load(args: argparse.Namespace) -> dict:
+    mix = [float(weight) for weight in (args.mix.get(op, 0) for op in LOAD_OPERATIONS)]
+    generator = LoadGenerator(args.users, mix, args.timeout, args.seed)
+    stages = []
+    try:
+        for rate in args.rates:
+            print(f"  到着レート {rate}/s で {args.stage_seconds:.0f} 秒実行中...")
+            stages.append(generator.run_stage(rate, args.stage_seconds))
+            stage = stages[-1]
+            print(f"    成功 {stage['ok_per_s']}/s, p50 {stage['p50_ms']}ms, p95 {stage['p95_ms']}ms, "
+                  f"ステータス {stage['status']}, 取りこぼし {stage['dropped']}")
+    finally:
+        generator.close()
+    return {
+        "users": args.users,
+        "mix": dict(zip(LOAD_OPERATIONS, mix)),
+        "stage_seconds": args.stage_seconds,
+        "stages": stages,
+        "saturation_ok_per_s": max((stage["ok_per_s"] for stage in stages), default=0.0),
+        "knee": find_knee(stages),
+    }
+
+
+def print_load_report(report: dict) -> None:
+    print()
+    print(f"{'到着/s':>8} {'成功/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'429':>5} {'5xx':>5} {'取りこぼし':>6}")
+    for stage in report["stages"]:
+        status = stage["status"]
+        server_errors = sum(count for code, count in status.items() if code.startswith("5"))
+        print(f"{stage['offered_per_s']:>8} {stage['ok_per_s']:>8} {stage['p50_ms']:>9} {stage['p95_ms']:>9} "
+              f"{stage['p99_ms']:>9} {status.get('429', 0):>5} {server_errors:>5} {stage['dropped']:>6}")
+    print()
+    print(f"飽和スループット: {report['saturation_ok_per_s']} 成功リクエスト/s")
+    knee = report["knee"]
+    if knee is None:
+        print("飽和点: 検出されませんでした（--rates をさらに上げてください）")
+    else:
+        print(f"飽和点: 到着レート {knee['offered_per_s']}/s 付近")
+        print(f"  律速: {knee['bottleneck']}")
+
+
+def _rates(value: str) -> List[float]:
+    rates = [float(rate) for rate in value.split(",") if rate.strip()]
+    if not rates or any(rate <= 0 for rate in rates):
+        raise argparse.ArgumentTypeError("到着レートは正の数をカンマ区切りで指定してください（例: 0.5,1,2,4）")
+    return rates
+
+
+def _mix(value: str) -> Dict[str, float]:
+    try:
+        mix = {name.strip(): float(weight) for name, weight in (part.split("=") for part in value.split(","))}
+    except ValueError:
+        raise argparse.ArgumentTypeError("比率は start=1,step=8,stop=1 の形式で指定してください")
+    if set(mix) - set(LOAD_OPERATIONS) or sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("比率には start / step / stop の重みを指定してください")
+    return mix
+
+
+def main_load(args: argparse.Namespace) -> None:
+    print("=" * 60)
+    print("MCPブリッジの負荷試験")
+    print("=" * 60)
+    if not check_health():
+        sys.exit(1)
+    print()
+    report = run_load(args)
+    print_load_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        print(f"結果を {args.output} に保存しました")
+
+
 def main():
     print("=" * 60)
     print("MCPブリッジの動作確認")
@@ -179,6 +441,27 @@ def main():
     print("2. start_debate, step, stopツールを使用して議論を開始")
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=MCP_URL, help="ブリッジのURL")
+    parser.add_argument("--load", action="store_true", help="負荷生成モードで実行する")
+    parser.add_argument("--users", type=int, default=20, help="仮想ユーザー数（同時に送るリクエストの上限）")
+    parser.add_argument("--rates", type=_rates, default=[0.5, 1, 2, 4],
+                        help="段階ごとの到着レート（リクエスト/秒、カンマ区切り）")
+    parser.add_argument("--stage-seconds", type=float, default=60, help="1段階の秒数")
+    parser.add_argument("--mix", type=_mix, default={"start": 1, "step": 8, "stop": 1},
+                        help="操作の比率（例: start=1,step=8,stop=1）")
+    parser.add_argument("--timeout", type=float, default=250, help="1リクエストのタイムアウト秒数")
+    parser.add_argument("--seed", type=int, default=0, help="到着間隔と操作の選択に使う乱数シード")
+    parser.add_argument("--output", help="結果をJSONで保存するファイル")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    MCP_URL = args.url.rstrip("/")
+    if args.load:
+        main_load(args)
+    else:
+        main()
 
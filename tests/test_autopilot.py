@@ -0,0 +1,63 @@
+import unittest
+
+from mcp.autopilot import AutopilotPolicy, estimate_tokens, similarity
+
+
+class SimilarityTests(unittest.TestCase):
+    def test_identical_and_disjoint_texts(self):
+        self.assertEqual(similarity("use a queue for the jobs", "Use a queue for the jobs!"), 1.0)
+        self.assertEqual(similarity("use a queue for the jobs", "cache every response forever"), 0.0)
+
+    def test_small_edit_stays_similar(self):
+        a = "We should add a bounded queue in front of the CLI workers and reject work when it is full."
+        b = "We should add a bounded queue in front of the CLI workers and shed work when it is full."
+        self.assertGreater(similarity(a, b), 0.6)
+        self.assertLess(similarity(a, b), 1.0)
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("abcde"), 2)
+
+
+class AutopilotPolicyTests(unittest.TestCase):
+    def _round(self, policy, replies, earlier=(), seconds=1.0):
+        return policy.after_round(["prompt"], replies, list(earlier), seconds)
+
+    def test_runs_until_max_rounds(self):
+        policy = AutopilotPolicy(max_rounds=2)
+        self.assertIsNone(policy.before_round(None))
+        self.assertIsNone(self._round(policy, ["first idea about caching"]))
+        self.assertIsNone(self._round(policy, ["a different take on queues"], ["first idea about caching"]))
+        self.assertEqual(policy.before_round(None), "max_rounds")
+
+    def test_agree_marker_stops(self):
+        policy = AutopilotPolicy(max_rounds=5)
+        self.assertEqual(self._round(policy, ["Fine by me. [agree]"]), "agreed")
+
+    def test_near_duplicate_replies_stop(self):
+        policy = AutopilotPolicy(max_rounds=5, similarity_threshold=0.8)
+        text = "Use a bounded queue in front of the workers and reject when full"
+        self.assertEqual(self._round(policy, [text + "."], [text]), "converged")
+        # Parallel rounds compare the two replies of the same round as well
+        self.assertEqual(self._round(policy, [text, text + " please"]), "converged")
+
+    def test_disabled_rules(self):
+        policy = AutopilotPolicy(max_rounds=5, similarity_threshold=0, agree_marker="")
+        self.assertIsNone(self._round(policy, ["same [AGREE]"], ["same [AGREE]"]))
+
+    def test_token_budget(self):
+        policy = AutopilotPolicy(max_rounds=5, max_tokens=10)
+        policy.after_round(["x" * 20], ["y" * 20], [], 1.0)
+        self.assertEqual(policy.tokens, 10)
+        self.assertEqual(policy.before_round(None), "token_budget")
+
+    def test_stops_when_the_next_round_would_not_fit(self):
+        policy = AutopilotPolicy(max_rounds=5)
+        self.assertIsNone(policy.before_round(0.5))  # nothing to go by before the first round
+        self._round(policy, ["reply"], seconds=2.0)
+        self.assertIsNone(policy.before_round(3.0))
+        self.assertEqual(policy.before_round(1.5), "time_budget")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+
+from mcp.balancer import LoadBalancer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LoadBalancerTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.balancer = LoadBalancer(
+            ["http://a/codex", "http://b/codex"], ewma_alpha=0.5, eject_after=2, eject_seconds=10, clock=self.clock
+        )
+        self.a, self.b = self.balancer.replicas
+
+    def _succeed(self, replica, seconds):
+        with self.balancer.track(replica):
+            self.clock.now += seconds
+
+    def _fail(self, replica):
+        with self.assertRaises(RuntimeError):
+            with self.balancer.track(replica):
+                raise RuntimeError("connect failed")
+
+    def test_ties_round_robin(self):
+        picked = [self.balancer.pick().url for _ in range(4)]
+        self.assertEqual(picked, ["http://a/codex", "http://b/codex"] * 2)
+
+    def test_prefers_fewer_outstanding_requests(self):
+        with self.balancer.track(self.a):
+            self.assertIs(self.balancer.pick(), self.b)
+            self.assertIs(self.balancer.pick(), self.b)
+
+    def test_slow_replica_gets_fewer_concurrent_calls(self):
+        self._succeed(self.a, 1.0)
+        self._succeed(self.b, 3.0)
+        self.assertEqual((self.a.ewma_ms, self.b.ewma_ms), (1000.0, 3000.0))
+
+        with self.balancer.track(self.a), self.balancer.track(self.a):
+            # (2 + 1) * 1000 ties with (0 + 1) * 3000, so both take turns
+            self.assertIs(self.balancer.pick(), self.a)
+            self.assertIs(self.balancer.pick(), self.b)
+            with self.balancer.track(self.a):
+                self.assertIs(self.balancer.pick(), self.b)
+
+        self._succeed(self.b, 1.0)
+        self.assertEqual(self.b.ewma_ms, 2000.0)
+
+    def test_consecutive_failures_eject_with_growing_backoff(self):
+        self._fail(self.a)
+        self.assertIs(self.balancer.pick(available=lambda url: url == "http://a/codex"), self.a)
+        self._fail(self.a)
+        self.assertEqual(self.balancer.stats()[0]["ejected"], True)
+        self.assertEqual([self.balancer.pick().url for _ in range(3)], ["http://b/codex"] * 3)
+
+        self.clock.now += 10
+        self._fail(self.a)
+        self._fail(self.a)
+        self.assertEqual(self.a.ejected_until, self.clock.now + 20)
+
+        self.clock.now += 20
+        self._succeed(self.a, 0.1)
+        self.assertEqual((self.a.ejections, self.a.consecutive_failures), (0, 0))
+
+    def test_success_between_failures_resets_the_streak(self):
+        self._fail(self.a)
+        self._succeed(self.a, 0.1)
+        self._fail(self.a)
+        self.assertEqual(self.a.ejected_until, 0.0)
+
+    def test_ignored_failures_do_not_count(self):
+        balancer = LoadBalancer(["http://a/codex"], eject_after=1, is_failure=lambda exc: False, clock=self.clock)
+        with self.assertRaises(ValueError):
+            with balancer.track(balancer.replicas[0]):
+                raise ValueError("bad request")
+        self.assertEqual(balancer.stats()[0]["failures"], 0)
+        self.assertEqual(balancer.stats()[0]["outstanding"], 0)
+
+    def test_neutral_errors_neither_eject_nor_reset_the_streak(self):
+        balancer = LoadBalancer(
+            ["http://a/codex"], eject_after=2, clock=self.clock,
+            is_failure=lambda exc: None if isinstance(exc, TimeoutError) else True,
+        )
+        replica = balancer.replicas[0]
+        with self.assertRaises(RuntimeError):
+            with balancer.track(replica):
+                raise RuntimeError("connect failed")
+        for _ in range(3):
+            with self.assertRaises(TimeoutError):
+                with balancer.track(replica):
+                    self.clock.now += 5
+                    raise TimeoutError("client deadline")
+        self.assertEqual((replica.failures, replica.consecutive_failures, replica.ewma_ms), (1, 1, None))
+        self.assertEqual(replica.ejected_until, 0.0)
+
+    def test_falls_back_to_the_replica_due_back_soonest(self):
+        self._fail(self.a)
+        self._fail(self.a)
+        self.clock.now += 1
+        self._fail(self.b)
+        self._fail(self.b)
+        self.assertIs(self.balancer.pick(), self.a)
+        self.assertIs(self.balancer.pick(available=lambda url: False), self.a)
+
+    def test_needs_a_replica(self):
+        with self.assertRaises(ValueError):
+            LoadBalancer([])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,37 @@
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
 import unittest
+import uuid
+from unittest import mock
 
+import httpx
+from fastapi import HTTPException
+
+from mcp import bridge
 from mcp.bridge import (
     MAX_HISTORY_TURNS,
     Decision,
     DebateSession,
+    RequestDeadline,
     Turn,
     _trim_history,
     build_next_prompt,
+    call_model,
 )
+from host_wrappers.ratelimit import TokenBucketLimiter
+from mcp.hedging import Hedger
+from mcp.jobs import JobRunner, SQLiteJobStore
+from mcp.outbox import OutboxOverflow
+from mcp.sessions import SQLiteSessionStore
+from mcp.speculation import Speculator
+
+
+def setUpModule():
+    # Every test client shares one address; keep the suite clear of the default rate limit
+    bridge._rate_limiter = TokenBucketLimiter(10_000, 60)
 
 
 class BuildNextPromptTests(unittest.TestCase):
@@ -50,5 +74,1182 @@ class HistoryTrimTests(unittest.TestCase):
         self.assertEqual(session.history[0].codex_output, f"c{10}")
 
 
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RequestDeadlineTests(unittest.TestCase):
+    def test_sequential_calls_split_the_budget_and_carry_over_unused_time(self):
+        clock = FakeClock()
+        deadline = RequestDeadline(60, calls=2, clock=clock)
+        self.assertEqual(deadline.next_budget(), 30)
+        clock.now = 10  # the first call took 10s
+        self.assertEqual(deadline.next_budget(), 50)
+
+    def test_expired_deadline_fails_fast(self):
+        clock = FakeClock()
+        deadline = RequestDeadline(5, clock=clock)
+        clock.now = 6
+        with self.assertRaises(HTTPException) as ctx:
+            deadline.next_budget()
+        self.assertEqual(ctx.exception.status_code, 504)
+
+
+class CallModelTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        if bridge._http_client is not None:
+            await bridge._http_client.aclose()
+        bridge._http_client = None
+
+    def _use_transport(self, handler):
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def test_call_model_returns_output_and_forwards_auth(self):
+        seen = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen["token"] = request.headers.get("X-Auth-Token")
+            seen["cache_control"] = request.headers.get("Cache-Control")
+            seen["body"] = request.content
+            return httpx.Response(200, json={"output": "hello"})
+
+        self._use_transport(handler)
+        output = await call_model("http://wrapper/codex", "ping", auth_token="secret", cache_control="no-cache")
+
+        self.assertEqual(output, "hello")
+        self.assertEqual(seen["token"], "secret")
+        self.assertEqual(seen["cache_control"], "no-cache")
+        self.assertIn(b'"prompt":"ping"', seen["body"].replace(b" ", b""))
+
+    async def test_call_model_forwards_the_deadline_and_maps_timeouts_to_504(self):
+        seen = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen["deadline"] = request.headers.get("X-Request-Deadline")
+            seen["timeout"] = request.extensions["timeout"]["read"]
+            raise httpx.ReadTimeout("slow", request=request)
+
+        self._use_transport(handler)
+        with self.assertRaises(HTTPException) as ctx:
+            await call_model("http://wrapper/codex", "ping", deadline=12.5)
+        self.assertEqual(ctx.exception.status_code, 504)
+        self.assertEqual(seen, {"deadline": "12.500", "timeout": 12.5})
+
+    async def test_call_model_maps_upstream_errors_to_502(self):
+        self._use_transport(lambda request: httpx.Response(500, json={"detail": "boom"}))
+        with self.assertRaises(HTTPException) as ctx:
+            await call_model("http://wrapper/codex", "ping")
+        self.assertEqual(ctx.exception.status_code, 502)
+
+    async def test_non_json_response_is_a_502_counted_against_the_wrapper(self):
+        self._use_transport(lambda request: httpx.Response(200, text="<html>proxy error</html>"))
+        bridge._breakers.clear()
+        try:
+            with self.assertRaises(HTTPException) as ctx:
+                await bridge._call_wrapper("codex", "not json")
+            self.assertEqual(ctx.exception.status_code, 502)
+            self.assertEqual(bridge._breakers[bridge.CODEX_URL].stats()["failures"], 1)
+        finally:
+            bridge._breakers.clear()
+
+    async def test_call_model_requires_output_field(self):
+        self._use_transport(lambda request: httpx.Response(200, json={}))
+        with self.assertRaises(HTTPException) as ctx:
+            await call_model("http://wrapper/codex", "ping")
+        self.assertEqual(ctx.exception.status_code, 500)
+
+
+def _ndjson(*events):
+    return "".join(json.dumps(event) + "\n" for event in events).encode("utf-8")
+
+
+class StreamingEndpointTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            model = "codex" if "codex" in request.url.path else "claude"
+            self.assertTrue(request.url.path.endswith("/stream"))
+            body = _ndjson(
+                {"type": "chunk", "data": f"{model} "},
+                {"type": "chunk", "data": "says hi"},
+                {"type": "done", "output": f"{model} says hi"},
+            )
+            return httpx.Response(200, content=body, headers={"content-type": "application/x-ndjson"})
+
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._sessions.delete("streamer")
+
+    async def _events(self, path, payload):
+        resp = await self.client.post(path, json=payload, headers={"X-User-ID": "streamer"})
+        self.assertEqual(resp.status_code, 200)
+        return [json.loads(line) for line in resp.text.splitlines() if line]
+
+    async def test_start_and_step_stream_chunks_and_store_turns(self):
+        events = await self._events("/start_debate/stream", {"initial_prompt": "topic"})
+
+        self.assertEqual([e["type"] for e in events if e["type"] != "chunk"],
+                         ["turn_start", "turn_end", "turn_start", "turn_end", "done"])
+        done = events[-1]
+        self.assertEqual(done["turn"]["codex_output"], "codex says hi")
+        self.assertEqual(done["turn"]["claude_output"], "claude says hi")
+        self.assertIsNotNone(done["ttft_ms"])
+        session = bridge._sessions.get("streamer")
+        self.assertTrue(session.active)
+        self.assertEqual(len(session.history), 2)
+
+        events = await self._events("/step/stream", {"decision": {"type": "adopt_claude"}})
+        self.assertEqual(events[-1]["turn"]["responder"], "codex")
+        self.assertEqual(len(session.history), 3)
+        self.assertEqual(session.history[-1].codex_output, "codex says hi")
+
+    async def test_overflow_inside_a_turn_is_not_reported_as_a_turn_error(self):
+        events = []
+
+        async def emit(event):
+            events.append(event)
+
+        async def overflowing(call):
+            raise OutboxOverflow("too far behind")
+
+        with self.assertRaises(OutboxOverflow):
+            await bridge._run_streaming_flow(overflowing, bridge._StreamingCaller(emit), "streamer", "turn")
+        self.assertEqual(events, [])
+
+
+class ParallelModeTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.prompts = {}
+        arrived = asyncio.Barrier(2)
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            model = "codex" if "codex" in request.url.path else "claude"
+            self.prompts[model] = json.loads(request.content)["prompt"]
+            # Both calls must be in flight at once, or the barrier times out
+            await asyncio.wait_for(arrived.wait(), timeout=2)
+            return httpx.Response(200, json={"output": f"{model} answer"})
+
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._sessions.delete("fanout")
+
+    async def _post(self, path, payload):
+        resp = await self.client.post(path, json=payload, headers={"X-User-ID": "fanout"})
+        self.assertEqual(resp.status_code, 200, resp.text)
+        return resp.json()["turn"]
+
+    async def test_parallel_start_and_cross_critique_round(self):
+        turn = await self._post("/start_debate", {"initial_prompt": "topic", "parallel": True})
+        self.assertEqual(turn["responder"], "both")
+        self.assertEqual(turn["next_responder"], "both")
+        self.assertEqual((turn["codex_output"], turn["claude_output"]), ("codex answer", "claude answer"))
+        self.assertIsNotNone(turn["codex_latency_ms"])
+        self.assertIsNotNone(turn["claude_latency_ms"])
+        self.assertEqual(self.prompts, {"codex": "topic", "claude": "topic"})
+
+        turn = await self._post("/step", {"decision": {"type": "adopt_claude"}})
+        self.assertEqual(turn["responder"], "both")
+        self.assertIn("Claude said: claude answer", self.prompts["codex"])
+        self.assertIn("Codex said: codex answer", self.prompts["claude"])
+        self.assertEqual(len(bridge._sessions.get("fanout").history), 2)
+
+
+class SpeculativeStepTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.prompts = []
+        self.headers = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.prompts.append(json.loads(request.content)["prompt"])
+            self.headers.append(request.headers)
+            return httpx.Response(200, json={"output": f"answer {len(self.prompts)}"})
+
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        bridge._speculator = Speculator(max_inflight=4)
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        bridge._speculator.cancel("speculator")
+        bridge._speculator = None
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._sessions.delete("speculator")
+
+    async def test_adopt_decision_is_served_from_the_precomputed_turn(self):
+        headers = {"X-User-ID": "speculator"}
+        await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers=headers)
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(self.prompts), 4)  # codex, claude, then both speculated decisions
+
+        resp = await self.client.post("/step", json={"decision": {"type": "adopt_claude"}}, headers=headers)
+        turn = resp.json()["turn"]
+        self.assertTrue(turn["user_instruction"].startswith("Proceed using Claude's approach"))
+        self.assertEqual(turn["codex_output"], f"answer {self.prompts.index(turn['user_instruction']) + 1}")
+        stats = (await self.client.get("/stats")).json()["speculation"]
+        self.assertEqual(stats["hits"], 1)
+
+    async def test_speculative_calls_keep_the_turns_cache_directive_and_budget(self):
+        headers = {"X-User-ID": "speculator", "Cache-Control": "no-store", "X-Request-Deadline": "30"}
+        await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers=headers)
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(self.headers), 4)
+        for sent in self.headers[2:]:
+            self.assertEqual(sent["Cache-Control"], "no-store")
+            self.assertLessEqual(float(sent["X-Request-Deadline"]), 15.0)  # two sequential calls share 30s
+
+
+class CoalescingTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.prompts = []
+        self.release = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.prompts.append(json.loads(request.content)["prompt"])
+            await self.release.wait()
+            return httpx.Response(200, json={"output": f"answer {len(self.prompts)}"})
+
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+        self.headers = {"X-User-ID": "retrier"}
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._sessions.delete("retrier")
+
+    async def test_retried_step_joins_the_running_one_and_records_one_turn(self):
+        self.release.set()
+        await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers=self.headers)
+        self.release.clear()
+        before = bridge._turn_flights.stats()["coalesced"]
+
+        step = {"decision": {"type": "adopt_codex"}}
+        first = asyncio.create_task(self.client.post("/step", json=step, headers=self.headers))
+        while len(self.prompts) < 3:
+            await asyncio.sleep(0.01)
+        retry = asyncio.create_task(self.client.post("/step", json=step, headers=self.headers))
+        while bridge._turn_flights.stats()["coalesced"] == before:
+            await asyncio.sleep(0.01)
+        self.release.set()
+        responses = await asyncio.gather(first, retry)
+
+        self.assertEqual(responses[0].json(), responses[1].json())
+        self.assertEqual(len(self.prompts), 3)  # codex, claude, then a single step call
+        self.assertEqual(len(bridge._sessions.get("retrier").history), 3)
+        stats = (await self.client.get("/stats")).json()["coalescing"]
+        self.assertEqual(stats["turns"]["coalesced"] - before, 1)
+
+    async def test_identical_wrapper_calls_share_one_request(self):
+        calls = [asyncio.create_task(bridge._call_wrapper("codex", "same prompt")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        self.release.set()
+        self.assertEqual(await asyncio.gather(*calls), ["answer 1", "answer 1"])
+        self.assertEqual(self.prompts, ["same prompt"])
+
+    async def test_calls_with_another_cache_directive_or_a_longer_deadline_run_separately(self):
+        calls = [
+            asyncio.create_task(bridge._call_wrapper("codex", "same prompt", deadline=5)),
+            asyncio.create_task(bridge._call_wrapper("codex", "same prompt", cache_control="no-cache", deadline=5)),
+            asyncio.create_task(bridge._call_wrapper("codex", "same prompt", deadline=30)),
+            asyncio.create_task(bridge._call_wrapper("codex", "same prompt", deadline=10)),
+        ]
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(self.prompts), 3)  # the last call joins the 30s one
+        self.release.set()
+        await asyncio.gather(*calls)
+        self.assertEqual(len(self.prompts), 3)
+
+
+class DeadlineEndpointTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.deadlines = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.deadlines.append(float(request.headers["X-Request-Deadline"]))
+            return httpx.Response(200, json={"output": "answer"})
+
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._sessions.delete("budgeted")
+
+    async def test_start_debate_splits_the_client_budget_across_both_calls(self):
+        headers = {"X-User-ID": "budgeted", "X-Request-Deadline": "40"}
+        resp = await self.client.post("/start_debate", json={"initial_prompt": "budget"}, headers=headers)
+        self.assertEqual(resp.status_code, 200)
+        codex_budget, claude_budget = self.deadlines
+        self.assertLessEqual(codex_budget, 20)
+        self.assertGreater(claude_budget, 39)  # the fast first call left almost everything
+
+    async def test_invalid_deadline_is_rejected(self):
+        headers = {"X-User-ID": "budgeted", "X-Request-Deadline": "later"}
+        resp = await self.client.post("/start_debate", json={"initial_prompt": "budget"}, headers=headers)
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(self.deadlines, [])
+
+
+class CircuitBreakerEndpointTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.attempts = 0
+        self.out_of_time = False
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.attempts += 1
+            if self.out_of_time:  # the wrapper sheds a request whose deadline it cannot meet
+                return httpx.Response(504, json={"detail": "request deadline too short"})
+            raise httpx.ConnectError("connection refused", request=request)
+
+        bridge._breakers.clear()
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._breakers.clear()
+        bridge._sessions.delete("unlucky")
+
+    async def test_down_wrapper_opens_the_circuit_and_later_calls_fail_fast(self):
+        headers = {"X-User-ID": "unlucky"}
+        for _ in range(bridge.BREAKER_MIN_CALLS):
+            resp = await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers=headers)
+            self.assertEqual(resp.status_code, 502)
+
+        resp = await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers=headers)
+        self.assertEqual(resp.status_code, 503)
+        self.assertIn("Retry-After", resp.headers)
+        self.assertEqual(self.attempts, bridge.BREAKER_MIN_CALLS)
+
+        health = (await self.client.get("/health")).json()
+        self.assertEqual(health["upstreams"][bridge.CODEX_URL], "open")
+        self.assertEqual(health["upstreams"][bridge.CLAUDE_URL], "closed")
+        breaker = (await self.client.get("/stats")).json()["circuit_breakers"][bridge.CODEX_URL]
+        self.assertEqual((breaker["opened"], breaker["rejected"]), (1, 1))
+
+    async def test_client_deadlines_running_out_do_not_open_the_circuit(self):
+        self.out_of_time = True
+        headers = {"X-User-ID": "unlucky", "X-Request-Deadline": "3"}
+        for _ in range(bridge.BREAKER_MIN_CALLS + 1):
+            resp = await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers=headers)
+            self.assertEqual(resp.status_code, 504)
+
+        self.assertEqual(self.attempts, bridge.BREAKER_MIN_CALLS + 1)
+        breaker = (await self.client.get("/stats")).json()["circuit_breakers"][bridge.CODEX_URL]
+        self.assertEqual((breaker["state"], breaker["failures"]), ("closed", 0))
+
+
+class ReplicaBalancingTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hits = []
+
+        self.out_of_time = False
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.hits.append(request.url.host)
+            if self.out_of_time and request.url.host.startswith("codex"):
+                return httpx.Response(504, json={"detail": "request deadline too short"})
+            if request.url.host == "codex-b":
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(200, json={"output": "answer"})
+
+        self.saved_balancers = bridge._balancers
+        bridge._balancers = {
+            "codex": bridge._build_balancer(["http://codex-a/codex", "http://codex-b/codex"]),
+            "claude": bridge._build_balancer(["http://claude-a/claude"]),
+        }
+        bridge._breakers.clear()
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._balancers = self.saved_balancers
+        bridge._breakers.clear()
+        for user in range(8):
+            bridge._sessions.delete(f"spread-{user}")
+
+    async def test_failing_replica_is_ejected_and_traffic_moves_to_the_healthy_one(self):
+        statuses = []
+        for user in range(8):
+            resp = await self.client.post(
+                "/start_debate", json={"initial_prompt": f"topic {user}"}, headers={"X-User-ID": f"spread-{user}"}
+            )
+            statuses.append(resp.status_code)
+
+        failures = bridge.LB_EJECT_AFTER_FAILURES
+        self.assertEqual(statuses.count(502), failures)
+        self.assertEqual(self.hits.count("codex-b"), failures)
+        self.assertEqual(self.hits.count("codex-a"), 8 - failures)
+
+        replicas = (await self.client.get("/stats")).json()["replicas"]["codex"]
+        self.assertEqual([r["ejected"] for r in replicas], [False, True])
+        self.assertEqual(replicas[1]["failures"], failures)
+
+    async def test_client_deadlines_running_out_do_not_eject_replicas(self):
+        self.out_of_time = True
+        for user in range(8):
+            resp = await self.client.post(
+                "/start_debate",
+                json={"initial_prompt": f"topic {user}"},
+                headers={"X-User-ID": f"spread-{user}", "X-Request-Deadline": "3"},
+            )
+            self.assertEqual(resp.status_code, 504)
+
+        self.assertEqual((self.hits.count("codex-a"), self.hits.count("codex-b")), (4, 4))
+        replicas = (await self.client.get("/stats")).json()["replicas"]["codex"]
+        self.assertEqual([(r["ejected"], r["failures"], r["ewma_ms"]) for r in replicas], [(False, 0, None)] * 2)
+
+
+class HedgingEndpointTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.stall_next_codex_call = False
+        self.codex_hosts = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.host.startswith("codex"):
+                self.codex_hosts.append(request.url.host)
+                if self.stall_next_codex_call:
+                    self.stall_next_codex_call = False
+                    await asyncio.sleep(30)
+            return httpx.Response(200, json={"output": f"answer from {request.url.host}"})
+
+        self.saved = (bridge._balancers, bridge._hedger)
+        bridge._balancers = {
+            "codex": bridge._build_balancer(["http://codex-a/codex", "http://codex-b/codex"]),
+            "claude": bridge._build_balancer(["http://claude-a/claude"]),
+        }
+        bridge._hedger = Hedger(percentile=0.5, min_delay_seconds=0.05, min_samples=1)
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._balancers, bridge._hedger = self.saved
+        bridge._sessions.delete("hedged-warm-up")
+        bridge._sessions.delete("hedged")
+
+    async def test_stalled_replica_is_hedged_to_the_other(self):
+        resp = await self.client.post(
+            "/start_debate", json={"initial_prompt": "warm up"}, headers={"X-User-ID": "hedged-warm-up"}
+        )
+        self.assertEqual(resp.status_code, 200)
+
+        self.stall_next_codex_call = True
+        self.codex_hosts.clear()
+        resp = await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers={"X-User-ID": "hedged"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(sorted(self.codex_hosts), ["codex-a", "codex-b"])
+        self.assertIn(f"answer from {self.codex_hosts[1]}", resp.text)
+
+        hedging = (await self.client.get("/stats")).json()["hedging"]
+        self.assertEqual((hedging["hedged"], hedging["hedge_wins"]), (1, 1))
+        replicas = (await self.client.get("/stats")).json()["replicas"]["codex"]
+        self.assertEqual(sum(r["outstanding"] for r in replicas), 0)
+
+
+class JobEndpointTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.release = asyncio.Event()
+        self.fail = False
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await self.release.wait()
+            if self.fail:
+                return httpx.Response(500, json={"detail": "cli crashed"})
+            return httpx.Response(200, json={"output": f"answer from {request.url.path}"})
+
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+        self.headers = {"X-User-ID": "async-user"}
+
+    async def asyncTearDown(self):
+        self.release.set()
+        await self.client.aclose()
+        await bridge._jobs.close()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._sessions.delete("async-user")
+
+    async def test_submit_returns_at_once_and_long_poll_returns_the_turn(self):
+        resp = await self.client.post("/jobs/start_debate", json={"initial_prompt": "topic"}, headers=self.headers)
+        self.assertEqual(resp.status_code, 202)
+        job = resp.json()
+        self.assertEqual((job["kind"], job["status"]), ("start_debate", "running"))
+        self.assertEqual(resp.headers["Location"], f"/jobs/{job['job_id']}")
+
+        resp = await self.client.get(f"/jobs/{job['job_id']}/result", headers=self.headers)
+        self.assertEqual(resp.status_code, 202)
+
+        self.release.set()
+        resp = await self.client.get(f"/jobs/{job['job_id']}/result?wait=5", headers=self.headers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["turn"]["claude_output"], "answer from /claude")
+
+        resp = await self.client.post(
+            "/jobs/step", json={"decision": {"type": "adopt_codex"}}, headers=self.headers
+        )
+        resp = await self.client.get(f"/jobs/{resp.json()['job_id']}?wait=5", headers=self.headers)
+        self.assertEqual(resp.json()["status"], "succeeded")
+        self.assertEqual(resp.json()["turn"]["responder"], "codex")
+
+    async def test_resubmit_joins_and_a_different_request_conflicts(self):
+        first = await self.client.post("/jobs/start_debate", json={"initial_prompt": "topic"}, headers=self.headers)
+        again = await self.client.post("/jobs/start_debate", json={"initial_prompt": "topic"}, headers=self.headers)
+        self.assertEqual(again.json()["job_id"], first.json()["job_id"])
+        other = await self.client.post("/jobs/start_debate", json={"initial_prompt": "other"}, headers=self.headers)
+        self.assertEqual(other.status_code, 409)
+
+    async def test_failed_job_result_carries_the_upstream_status(self):
+        self.fail = True
+        self.release.set()
+        resp = await self.client.post("/jobs/start_debate", json={"initial_prompt": "topic"}, headers=self.headers)
+        job_id = resp.json()["job_id"]
+
+        resp = await self.client.get(f"/jobs/{job_id}?wait=5", headers=self.headers)
+        self.assertEqual(resp.json()["status"], "failed")
+        self.assertEqual(resp.json()["error"]["status"], 502)
+        resp = await self.client.get(f"/jobs/{job_id}/result", headers=self.headers)
+        self.assertEqual(resp.status_code, 502)
+
+    async def test_jobs_are_private_to_their_user(self):
+        resp = await self.client.post("/jobs/start_debate", json={"initial_prompt": "topic"}, headers=self.headers)
+        resp = await self.client.get(f"/jobs/{resp.json()['job_id']}", headers={"X-User-ID": "someone-else"})
+        self.assertEqual(resp.status_code, 404)
+
+
+class AutopilotEndpointTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.prompts = []
+        self.replies = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.prompts.append(json.loads(request.content)["prompt"])
+            reply = self.replies.pop(0) if self.replies else f"fresh idea {uuid.uuid4().hex} {uuid.uuid4().hex}"
+            if request.url.path.endswith("/stream"):
+                body = _ndjson({"type": "chunk", "data": reply}, {"type": "done", "output": reply})
+                return httpx.Response(200, content=body, headers={"content-type": "application/x-ndjson"})
+            return httpx.Response(200, json={"output": reply})
+
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+        self.headers = {"X-User-ID": "pilot"}
+        await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers=self.headers)
+        self.prompts.clear()
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._sessions.delete("pilot")
+
+    async def test_runs_the_requested_rounds_alternating_responders(self):
+        resp = await self.client.post("/autopilot", json={"rounds": 3}, headers=self.headers)
+        self.assertEqual(resp.status_code, 200)
+        result = resp.json()
+        self.assertEqual((result["rounds"], result["stop_reason"]), (3, "max_rounds"))
+        self.assertEqual([turn["responder"] for turn in result["turns"]], ["codex", "claude", "codex"])
+        self.assertTrue(self.prompts[0].startswith("Proceed using Claude's approach"))
+        self.assertTrue(self.prompts[1].startswith("Proceed using Codex's approach"))
+        self.assertIn(bridge.AUTOPILOT_AGREE_MARKER, self.prompts[0])
+        self.assertEqual(len(bridge._sessions.get("pilot").history), 5)
+
+    async def test_agreement_stops_early(self):
+        self.replies = [f"Sounds right to me. {bridge.AUTOPILOT_AGREE_MARKER}"]
+        result = (await self.client.post("/autopilot", json={"rounds": 5}, headers=self.headers)).json()
+        self.assertEqual((result["rounds"], result["stop_reason"]), (1, "agreed"))
+
+    async def test_repeating_replies_stop_early(self):
+        repeated = "Put a bounded queue in front of the CLI workers and reject new work when it is full"
+        self.replies = [repeated, repeated + "."]
+        result = (await self.client.post("/autopilot", json={"rounds": 5}, headers=self.headers)).json()
+        self.assertEqual((result["rounds"], result["stop_reason"]), (2, "converged"))
+
+    async def test_token_budget_stops_early(self):
+        result = (await self.client.post("/autopilot", json={"rounds": 5, "max_tokens": 1}, headers=self.headers)).json()
+        self.assertEqual((result["rounds"], result["stop_reason"]), (1, "token_budget"))
+
+    async def test_rounds_are_capped(self):
+        resp = await self.client.post(
+            "/autopilot", json={"rounds": bridge.AUTOPILOT_MAX_ROUNDS + 1}, headers=self.headers
+        )
+        self.assertEqual(resp.status_code, 422)
+
+    async def test_stream_ends_with_the_autopilot_result(self):
+        self.replies = [f"Agreed. {bridge.AUTOPILOT_AGREE_MARKER}"]
+        resp = await self.client.post("/autopilot/stream", json={"rounds": 3}, headers=self.headers)
+        events = [json.loads(line) for line in resp.text.splitlines()]
+        self.assertEqual(events[-1]["type"], "done")
+        self.assertEqual(events[-1]["autopilot"]["stop_reason"], "agreed")
+        self.assertEqual([e["type"] for e in events if e["type"].startswith("turn")], ["turn_start", "turn_end"])
+
+
+class McpEndpointTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            model = "codex" if "codex" in str(request.url) else "claude"
+            return httpx.Response(200, json={"output": f"{model} answer"})
+
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+        self.users = []
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        for user in self.users:
+            bridge._sessions.delete(user)
+
+    async def _rpc(self, method, params=None, headers=None, request_id=1):
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}}
+        return await self.client.post("/mcp", json=message, headers=headers or {})
+
+    async def test_initialize_hands_out_a_session_used_by_tool_calls(self):
+        resp = await self._rpc("initialize", {"protocolVersion": "2025-03-26"})
+        session_id = resp.headers["Mcp-Session-Id"]
+        self.users.append(session_id)
+        self.assertEqual(resp.json()["result"]["protocolVersion"], "2025-03-26")
+
+        headers = {"Mcp-Session-Id": session_id}
+        notified = await self.client.post("/mcp", json={"jsonrpc": "2.0", "method": "notifications/initialized"},
+                                          headers=headers)
+        self.assertEqual(notified.status_code, 202)
+        tools = (await self._rpc("tools/list", headers=headers)).json()["result"]["tools"]
+        self.assertEqual({tool["name"] for tool in tools}, {"start_debate", "step", "autopilot", "stop"})
+
+        resp = await self._rpc("tools/call", {"name": "start_debate", "arguments": {"initial_prompt": "topic"}},
+                               headers=headers)
+        turn = resp.json()["result"]["structuredContent"]["turn"]
+        self.assertEqual((turn["codex_output"], turn["claude_output"]), ("codex answer", "claude answer"))
+        self.assertEqual(len(bridge._sessions.get(session_id).history), 2)
+
+    async def test_tool_errors_and_invalid_arguments(self):
+        self.users.append("mcp-errors")
+        headers = {"X-User-ID": "mcp-errors"}
+        resp = await self._rpc("tools/call", {"name": "step", "arguments": {"decision": {"type": "adopt_codex"}}},
+                               headers=headers)
+        self.assertTrue(resp.json()["result"]["isError"])
+        self.assertIn("no active session", resp.json()["result"]["content"][0]["text"])
+
+        resp = await self._rpc("tools/call", {"name": "start_debate", "arguments": {}}, headers=headers)
+        self.assertEqual(resp.json()["error"]["code"], -32602)
+        self.assertEqual((await self.client.post("/mcp", content=b"{", headers=headers)).status_code, 400)
+
+    async def test_progress_is_streamed_as_server_sent_events(self):
+        self.users.append("mcp-progress")
+        headers = {"X-User-ID": "mcp-progress", "Accept": "application/json, text/event-stream"}
+        params = {"name": "start_debate", "arguments": {"initial_prompt": "topic"}, "_meta": {"progressToken": 9}}
+        resp = await self._rpc("tools/call", params, headers=headers, request_id=5)
+        self.assertTrue(resp.headers["content-type"].startswith("text/event-stream"))
+        messages = [json.loads(line[len("data: "):]) for line in resp.text.splitlines() if line.startswith("data: ")]
+        progress = [m["params"] for m in messages if m.get("method") == "notifications/progress"]
+        self.assertEqual(len(progress), 4)  # start and end of both wrapper calls
+        self.assertEqual([p["progress"] for p in progress], [1, 2, 3, 4])
+        self.assertEqual(messages[-1]["id"], 5)
+        self.assertIn("structuredContent", messages[-1]["result"])
+
+    async def test_stdio_transport_dispatches_in_process(self):
+        from mcp import stdio
+
+        self.users.append("mcp-stdio")
+        reader = asyncio.StreamReader()
+        for message in (
+            {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+            {"jsonrpc": "2.0", "method": "notifications/initialized"},
+            {"jsonrpc": "2.0", "id": 2, "method": "tools/call",
+             "params": {"name": "start_debate", "arguments": {"initial_prompt": "topic"},
+                        "_meta": {"progressToken": "p"}}},
+        ):
+            reader.feed_data(json.dumps(message).encode() + b"\n")
+        reader.feed_data(b"not json\n")
+        reader.feed_eof()
+        written = []
+
+        await asyncio.wait_for(stdio.serve(reader, written.append, user_id="mcp-stdio"), timeout=5)
+        messages = [json.loads(line) for line in written]
+        responses = {m["id"]: m for m in messages if "id" in m}
+        self.assertIn("protocolVersion", responses[1]["result"])
+        self.assertEqual(responses[2]["result"]["structuredContent"]["status"], "ok")
+        self.assertEqual(responses[None]["error"]["code"], -32700)
+        self.assertEqual(sum(m.get("method") == "notifications/progress" for m in messages), 4)
+        self.assertEqual(len(bridge._sessions.get("mcp-stdio").history), 2)
+
+
+class MetricsEndpointTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fail_codex = False
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if self.fail_codex and "codex" in request.url.path:
+                return httpx.Response(500, json={"detail": "boom"})
+            return httpx.Response(200, json={"output": "ok"})
+
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.speculator, bridge._speculator = bridge._speculator, None
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._speculator = self.speculator
+        bridge._sessions.delete("metered")
+        bridge._breakers.clear()
+
+    async def test_requests_and_wrapper_calls_are_recorded(self):
+        calls = bridge._wrapper_call_seconds
+        ok, failed = calls.count("claude", "ok"), calls.count("codex", "error")
+        started = bridge._requests_total.value("POST", "/start_debate", "200")
+        headers = {"X-User-ID": "metered"}
+
+        await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers=headers)
+        self.fail_codex = True
+        await self.client.post("/step", json={"decision": {"type": "adopt_codex"}}, headers=headers)
+
+        self.assertEqual(bridge._requests_total.value("POST", "/start_debate", "200"), started + 1)
+        self.assertEqual(calls.count("claude", "ok"), ok + 1)
+        self.assertEqual(calls.count("codex", "error"), failed + 1)
+        resp = await self.client.get("/metrics")
+        self.assertTrue(resp.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('bridge_requests_total{method="POST",endpoint="/step",status="502"}', resp.text)
+        self.assertIn('bridge_wrapper_output_bytes_bucket{model="codex",le="256"}', resp.text)
+        self.assertIn('bridge_wrapper_inflight{model="codex"} 0', resp.text)
+        self.assertIn("bridge_sessions ", resp.text)
+
+
+class TracingTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.sent = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.sent.append(request.headers.get("traceparent"))
+            return httpx.Response(200, json={"output": "ok"})
+
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+        self.spans = []
+        bridge._tracer.exporter = self
+
+    def export(self, service, spans):
+        self.spans.extend(spans)
+
+    async def asyncTearDown(self):
+        bridge._tracer.flush()
+        bridge._tracer.exporter = None
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._sessions.delete("traced")
+
+    async def test_step_is_traced_and_propagated_to_the_wrapper(self):
+        headers = {"X-User-ID": "traced"}
+        await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers=headers)
+        self.sent.clear()
+        self.spans.clear()
+        await self.client.post("/step", json={"decision": {"type": "adopt_codex"}}, headers=headers)
+
+        spans = {span.name: span for span in self.spans}
+        self.assertEqual(set(spans), {"POST /step", "prompt.build", "wrapper.call", "serialize"})
+        root, call = spans["POST /step"], spans["wrapper.call"]
+        self.assertIsNone(root.parent_id)
+        self.assertEqual(spans["prompt.build"].parent_id, root.span_id)
+        self.assertEqual((call.trace_id, call.attributes["model"]), (root.trace_id, "codex"))
+        self.assertEqual(self.sent, [call.traceparent])
+
+    async def test_disabled_tracing_sends_no_header(self):
+        bridge._tracer.exporter = None
+        await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers={"X-User-ID": "traced"})
+        self.assertEqual(self.sent, [None, None])
+
+
+class _SocketClient:
+    """Drives the bridge's /ws endpoint with raw ASGI messages."""
+
+    def __init__(self, headers=(), query=b""):
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "scheme": "ws",
+            "path": "/ws",
+            "raw_path": b"/ws",
+            "root_path": "",
+            "query_string": query,
+            "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+            "client": ("127.0.0.1", 50001),
+            "server": ("bridge", 80),
+            "subprotocols": [],
+        }
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        self.unblocked = asyncio.Event()
+        self.unblocked.set()
+
+    async def _send(self, message):
+        if message["type"] == "websocket.send":
+            await self.unblocked.wait()
+        self.outgoing.put_nowait(message)
+
+    async def connect(self):
+        self.incoming.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.create_task(bridge.app(self.scope, self.incoming.get, self._send))
+        return await asyncio.wait_for(self.outgoing.get(), timeout=5)
+
+    def send(self, message):
+        text = message if isinstance(message, str) else json.dumps(message)
+        self.incoming.put_nowait({"type": "websocket.receive", "text": text})
+
+    async def receive(self):
+        message = await asyncio.wait_for(self.outgoing.get(), timeout=5)
+        return json.loads(message["text"]) if message["type"] == "websocket.send" else message
+
+    async def answer(self):
+        """Events up to and including the next `done` or `error`."""
+        events = []
+        while not events or events[-1].get("type") not in ("done", "error"):
+            events.append(await self.receive())
+        return events
+
+    async def disconnect(self):
+        self.incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(self.task, timeout=5)
+
+
+class WebSocketTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.stall = False
+        self.aborted = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if self.stall:
+                try:
+                    await asyncio.sleep(30)
+                finally:
+                    self.aborted.set()
+            model = "codex" if "codex" in request.url.path else "claude"
+            chunks = [f"{model} ", "says ", "hi"]
+            body = _ndjson(*({"type": "chunk", "data": c} for c in chunks), {"type": "done", "output": "".join(chunks)})
+            return httpx.Response(200, content=body, headers={"content-type": "application/x-ndjson"})
+
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.socket = _SocketClient(headers=[("X-User-ID", "socket")])
+
+    async def asyncTearDown(self):
+        if not self.socket.task.done():
+            await self.socket.disconnect()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._sessions.delete("socket")
+
+    async def test_one_connection_runs_several_turns(self):
+        self.assertEqual((await self.socket.connect())["type"], "websocket.accept")
+        self.assertEqual(await self.socket.receive(), {"type": "ready", "user_id": "socket"})
+
+        self.socket.send({"type": "start_debate", "id": 1, "initial_prompt": "topic"})
+        events = await self.socket.answer()
+        self.assertEqual([e["type"] for e in events if e["type"] != "chunk"],
+                         ["turn_start", "turn_end", "turn_start", "turn_end", "done"])
+        self.assertTrue(all(e["id"] == 1 for e in events))
+        self.assertEqual(events[-1]["turn"]["claude_output"], "claude says hi")
+
+        self.socket.send({"type": "step", "id": 2, "decision": {"type": "adopt_claude"}})
+        done = (await self.socket.answer())[-1]
+        self.assertEqual((done["type"], done["turn"]["codex_output"]), ("done", "codex says hi"))
+        self.assertEqual(len(bridge._sessions.get("socket").history), 3)
+
+        self.socket.send({"type": "stop"})
+        self.assertEqual((await self.socket.receive())["status"], "stopped")
+        self.assertIsNone(bridge._sessions.get("socket"))
+
+    async def test_bad_messages_get_error_events(self):
+        await self.socket.connect()
+        await self.socket.receive()
+        self.socket.send({"type": "ping", "id": "p"})
+        self.assertEqual(await self.socket.receive(), {"type": "pong", "id": "p"})
+        self.socket.send("{not json")
+        self.assertEqual((await self.socket.receive())["status"], 400)
+        self.socket.send({"type": "dance"})
+        self.assertEqual((await self.socket.receive())["status"], 400)
+        self.socket.send({"type": "start_debate"})
+        self.assertEqual((await self.socket.receive())["status"], 422)
+        self.socket.send({"type": "step", "decision": {"type": "adopt_codex"}})
+        self.assertEqual(await self.socket.receive(), {"type": "error", "status": 400, "detail": "no active session"})
+        self.socket.send({"type": "stop", "id": "s"})
+        self.assertEqual(
+            await self.socket.receive(), {"type": "error", "status": 400, "detail": "no active session", "id": "s"}
+        )
+        self.socket.send({"type": "ping"})
+        self.assertEqual(await self.socket.receive(), {"type": "pong"})
+
+    async def test_stop_cancels_the_turn_in_progress(self):
+        await self.socket.connect()
+        await self.socket.receive()
+        self.socket.send({"type": "start_debate", "initial_prompt": "topic"})
+        await self.socket.answer()
+
+        self.stall = True
+        self.socket.send({"type": "step", "id": "turn", "decision": {"type": "adopt_codex"}})
+        self.assertEqual((await self.socket.receive())["type"], "turn_start")
+        self.socket.send({"type": "stop", "id": "stop"})
+        self.assertEqual(await self.socket.receive(),
+                         {"type": "error", "status": 499, "detail": "turn cancelled", "id": "turn"})
+        self.assertEqual(await self.socket.receive(), {"type": "done", "status": "stopped", "id": "stop"})
+        self.assertTrue(self.aborted.is_set())
+        self.assertIsNone(bridge._sessions.get("socket"))
+
+    async def test_unexpected_errors_become_error_events(self):
+        await self.socket.connect()
+        await self.socket.receive()
+        with mock.patch.object(bridge, "_run_start_debate", side_effect=RuntimeError("boom")):
+            self.socket.send({"type": "start_debate", "id": 1, "initial_prompt": "topic"})
+            self.assertEqual(await self.socket.receive(),
+                             {"type": "error", "status": 500, "detail": "internal error", "id": 1})
+        self.socket.send({"type": "ping"})
+        self.assertEqual(await self.socket.receive(), {"type": "pong"})
+
+    async def test_token_is_checked_on_connect(self):
+        original = bridge.AUTH_TOKEN
+        bridge.AUTH_TOKEN = "secret"
+        try:
+            closed = await self.socket.connect()
+            self.assertEqual((closed["type"], closed["code"]), ("websocket.close", 1008))
+            self.socket = _SocketClient(headers=[("X-User-ID", "socket")], query=b"token=secret")
+            self.assertEqual((await self.socket.connect())["type"], "websocket.accept")
+        finally:
+            bridge.AUTH_TOKEN = original
+
+    async def test_chunks_waiting_for_a_slow_client_are_merged(self):
+        self.socket.unblocked.clear()
+        await self.socket.connect()
+        self.socket.send({"type": "start_debate", "initial_prompt": "topic"})
+        for _ in range(100):
+            session = bridge._sessions.get("socket")
+            if session is not None and len(session.history) == 2:
+                break
+            await asyncio.sleep(0.01)
+
+        self.socket.unblocked.set()
+        await self.socket.receive()  # ready
+        chunks = [e for e in await self.socket.answer() if e["type"] == "chunk"]
+        self.assertEqual([c["data"] for c in chunks], ["codex says hi", "claude says hi"])
+
+    async def test_client_that_falls_too_far_behind_is_disconnected(self):
+        original = bridge.WS_MAX_BUFFER_BYTES
+        bridge.WS_MAX_BUFFER_BYTES = 20
+        before = bridge._websockets["slow_consumer_closes"]
+        try:
+            self.socket.unblocked.clear()
+            await self.socket.connect()
+            self.socket.send({"type": "start_debate", "initial_prompt": "topic"})
+            closed = await self.socket.receive()
+        finally:
+            bridge.WS_MAX_BUFFER_BYTES = original
+        self.assertEqual((closed["type"], closed["code"]), ("websocket.close", 1008))
+        self.assertEqual(bridge._websockets["slow_consumer_closes"], before + 1)
+        await self.socket.disconnect()
+
+
+class SQLiteBackendTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "sessions.db")
+        self.saved = bridge._sessions
+        bridge._sessions = SQLiteSessionStore(
+            self.path, ttl_seconds=60, max_entries=100, max_bytes=10**9, max_history_turns=50
+        )
+        bridge._http_client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"output": "answer"}))
+        )
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._sessions.close()
+        bridge._sessions = self.saved
+        self._tmp.cleanup()
+
+    async def _send_while_locked(self, path: str, send):
+        other_worker = sqlite3.connect(path, isolation_level=None)
+        other_worker.execute("BEGIN IMMEDIATE")
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        request = asyncio.create_task(send())
+        await asyncio.sleep(0.3)
+        self.assertFalse(request.done())
+        self.assertGreater(ticks, 10)  # the loop kept running while the store waited for the lock
+        other_worker.execute("ROLLBACK")
+        other_worker.close()
+        resp = await request
+        ticker.cancel()
+        return resp
+
+    async def test_a_locked_database_does_not_stall_the_event_loop(self):
+        resp = await self._send_while_locked(
+            self.path,
+            lambda: self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers={"X-User-ID": "sqlite"}),
+        )
+        self.assertEqual(resp.status_code, 200)
+
+    async def test_a_locked_job_database_does_not_stall_the_event_loop(self):
+        path = os.path.join(self._tmp.name, "jobs.db")
+        store, saved = SQLiteJobStore(path), bridge._jobs
+        bridge._jobs = JobRunner(store, poll_interval=0.01)
+        try:
+            resp = await self._send_while_locked(
+                path,
+                lambda: self.client.post(
+                    "/jobs/start_debate", json={"initial_prompt": "topic"}, headers={"X-User-ID": "sqlite"}
+                ),
+            )
+            self.assertEqual(resp.status_code, 202)
+            resp = await self._send_while_locked(
+                path,
+                lambda: self.client.get(f"/jobs/{resp.json()['job_id']}?wait=5", headers={"X-User-ID": "sqlite"}),
+            )
+            self.assertEqual(resp.json()["status"], "succeeded")
+        finally:
+            await bridge._jobs.close()
+            bridge._jobs = saved
+            store.close()
+
+    async def test_health_does_not_write(self):
+        await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers={"X-User-ID": "sqlite"})
+        other_worker = sqlite3.connect(self.path, isolation_level=None)
+        other_worker.execute("BEGIN IMMEDIATE")
+        try:
+            resp = await asyncio.wait_for(self.client.get("/health", headers={"X-User-ID": "sqlite"}), timeout=2)
+        finally:
+            other_worker.execute("ROLLBACK")
+            other_worker.close()
+        self.assertEqual((resp.json()["active"], resp.json()["turns"]), (True, 2))
+
+
+class DisconnectTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hang = False
+        self.release = asyncio.Event()
+        self.aborted = asyncio.Event()
+        self.hung_calls = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if self.hang:
+                self.hung_calls += 1
+                try:
+                    await asyncio.wait_for(self.release.wait(), timeout=30)
+                except asyncio.CancelledError:
+                    self.aborted.set()
+                    raise
+            return httpx.Response(200, json={"output": "answer"})
+
+        bridge._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=bridge.app), base_url="http://bridge")
+        self._grace = bridge._turn_flights.grace_seconds
+        bridge._turn_flights.grace_seconds = 0.3
+
+    async def asyncTearDown(self):
+        bridge._turn_flights.grace_seconds = self._grace
+        await self.client.aclose()
+        await bridge._http_client.aclose()
+        bridge._http_client = None
+        bridge._sessions.delete("leaver")
+
+    async def _step_then_disconnect(self) -> list:
+        """POST /step as a client that hangs up after 0.1s; returns the ASGI messages sent back."""
+        body = json.dumps({"decision": {"type": "adopt_codex"}}).encode()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/step",
+            "raw_path": b"/step",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-user-id", b"leaver"),
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("bridge", 80),
+        }
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(0.1)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        await asyncio.wait_for(bridge.app(scope, receive, send), timeout=5)
+        return sent
+
+    async def test_client_disconnect_aborts_the_wrapper_call(self):
+        await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers={"X-User-ID": "leaver"})
+        self.hang = True
+        before = bridge._cancellations["client_disconnects"]
+
+        sent = await self._step_then_disconnect()
+        self.assertEqual(sent[0]["status"], 499)
+        await asyncio.wait_for(self.aborted.wait(), timeout=2)
+        self.assertEqual(bridge._cancellations["client_disconnects"], before + 1)
+        self.assertEqual(len(bridge._sessions.get("leaver").history), 2)
+
+    async def test_retry_after_a_disconnect_rejoins_the_running_turn(self):
+        await self.client.post("/start_debate", json={"initial_prompt": "topic"}, headers={"X-User-ID": "leaver"})
+        self.hang = True
+
+        sent = await self._step_then_disconnect()
+        self.assertEqual(sent[0]["status"], 499)
+        retry = asyncio.create_task(
+            self.client.post("/step", json={"decision": {"type": "adopt_codex"}}, headers={"X-User-ID": "leaver"})
+        )
+        await asyncio.sleep(0.5)  # past the grace period the disconnect started
+        self.release.set()
+        resp = await retry
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.hung_calls, 1)
+        self.assertFalse(self.aborted.is_set())
+        self.assertEqual(len(bridge._sessions.get("leaver").history), 3)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import unittest
+
+from mcp.circuit import CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def _breaker(self, **overrides):
+        options = dict(window=4, min_calls=4, error_rate=0.5, open_seconds=10, clock=self.clock)
+        options.update(overrides)
+        return CircuitBreaker("http://wrapper/codex", **options)
+
+    def _fail(self, breaker):
+        with self.assertRaises(RuntimeError):
+            with breaker.call():
+                raise RuntimeError("connect failed")
+
+    def _succeed(self, breaker, seconds=0.0):
+        with breaker.call():
+            self.clock.now += seconds
+
+    def test_opens_on_error_rate_and_fails_fast(self):
+        breaker = self._breaker()
+        self._succeed(breaker)
+        self._succeed(breaker)
+        self._fail(breaker)
+        self.assertEqual(breaker.state, "closed")
+        self._fail(breaker)
+        self.assertEqual(breaker.state, "open")
+
+        with self.assertRaises(CircuitOpenError) as ctx:
+            breaker.allow()
+        self.assertEqual(ctx.exception.retry_after, 10)
+        self.assertEqual(breaker.stats()["rejected"], 1)
+
+    def test_half_open_trial_closes_or_reopens(self):
+        breaker = self._breaker()
+        for _ in range(4):
+            self._fail(breaker)
+        self.clock.now += 10
+
+        self._fail(breaker)  # the trial call fails
+        self.assertEqual(breaker.state, "open")
+        self.clock.now += 10
+
+        with breaker.call():
+            with self.assertRaises(CircuitOpenError):
+                breaker.allow()  # only one trial at a time
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(breaker.stats()["opened"], 2)
+
+    def test_slow_calls_open_the_circuit(self):
+        breaker = self._breaker(slow_call_seconds=30, slow_call_rate=0.75)
+        self._succeed(breaker, seconds=1)
+        for _ in range(3):
+            self._succeed(breaker, seconds=31)
+        self.assertEqual(breaker.state, "open")
+        self.assertEqual(breaker.stats()["slow_calls"], 3)
+
+    def test_ignored_errors_and_cancellation_do_not_count(self):
+        breaker = self._breaker(min_calls=1, is_failure=lambda exc: not isinstance(exc, ValueError))
+        with self.assertRaises(ValueError):
+            with breaker.call():
+                raise ValueError("bad request")
+        self.assertEqual(breaker.state, "closed")
+
+        breaker._open()
+        self.clock.now += 10
+        with self.assertRaises(asyncio.CancelledError):
+            with breaker.call():
+                raise asyncio.CancelledError
+        self.assertEqual(breaker.state, "half_open")
+        self._succeed(breaker)  # the released trial slot is available again
+        self.assertEqual(breaker.state, "closed")
+
+    def test_neutral_errors_are_not_recorded(self):
+        breaker = self._breaker(min_calls=1, is_failure=lambda exc: None if isinstance(exc, TimeoutError) else True)
+        for _ in range(3):
+            with self.assertRaises(TimeoutError):
+                with breaker.call():
+                    raise TimeoutError("client deadline")
+        self.assertEqual(breaker.stats()["error_rate"], None)
+        self.assertEqual(breaker.counters["failures"], 0)
+
+        breaker._open()
+        self.clock.now += 10
+        with self.assertRaises(TimeoutError):
+            with breaker.call():
+                raise TimeoutError("client deadline")
+        self.assertEqual(breaker.state, "half_open")
+        self._succeed(breaker)
+        self.assertEqual(breaker.state, "closed")
+
+
+if __name__ == "__main__":
+    unittest.main()
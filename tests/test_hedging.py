@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+
+from mcp.hedging import Hedger
+
+
+class HedgerTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hedger = Hedger(percentile=0.5, min_delay_seconds=0.01, min_samples=3, max_rate=0.5, window=4)
+        self.cancelled = []
+
+    async def _call(self, name, seconds, fail=False):
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            self.cancelled.append(name)
+            raise
+        if fail:
+            raise RuntimeError(f"{name} failed")
+        return name
+
+    async def _warm_up(self):
+        for _ in range(3):
+            await self.hedger.run("codex", lambda: self._call("primary", 0.01), lambda elapsed: None)
+
+    async def test_no_hedge_until_enough_samples(self):
+        self.assertIsNone(self.hedger.delay("codex"))
+        result = await self.hedger.run("codex", lambda: self._call("primary", 0.05), lambda elapsed: self._call("hedge", 0))
+        self.assertEqual(result, "primary")
+        self.assertEqual(self.hedger.hedged, 0)
+
+    async def test_slow_primary_is_hedged_and_cancelled(self):
+        await self._warm_up()
+        self.assertGreaterEqual(self.hedger.delay("codex"), 0.01)
+
+        result = await self.hedger.run("codex", lambda: self._call("primary", 5), lambda elapsed: self._call("hedge", 0))
+        self.assertEqual(result, "hedge")
+        await asyncio.sleep(0)
+        self.assertEqual(self.cancelled, ["primary"])
+        self.assertEqual((self.hedger.hedged, self.hedger.hedge_wins), (1, 1))
+
+    async def test_fast_primary_is_not_hedged(self):
+        await self._warm_up()
+        result = await self.hedger.run("codex", lambda: self._call("primary", 0), lambda elapsed: self._call("hedge", 0))
+        self.assertEqual(result, "primary")
+        self.assertEqual(self.hedger.hedged, 0)
+
+    async def test_failed_hedge_falls_back_to_the_primary(self):
+        await self._warm_up()
+        result = await self.hedger.run(
+            "codex", lambda: self._call("primary", 0.1), lambda elapsed: self._call("hedge", 0, fail=True)
+        )
+        self.assertEqual(result, "primary")
+        self.assertEqual((self.hedger.hedged, self.hedger.hedge_wins), (1, 0))
+
+    async def test_both_failing_raises_the_primary_error(self):
+        await self._warm_up()
+        with self.assertRaisesRegex(RuntimeError, "primary failed"):
+            await self.hedger.run(
+                "codex",
+                lambda: self._call("primary", 0.05, fail=True),
+                lambda elapsed: self._call("hedge", 0, fail=True),
+            )
+
+    async def test_nothing_to_hedge_with_waits_for_the_primary(self):
+        await self._warm_up()
+        offered = []
+
+        def hedge(elapsed):
+            offered.append(elapsed)
+            return None
+
+        self.assertEqual(await self.hedger.run("codex", lambda: self._call("primary", 0.05), hedge), "primary")
+        self.assertEqual(len(offered), 1)
+        self.assertGreaterEqual(offered[0], 0.01)
+        self.assertEqual(self.hedger.hedged, 0)
+
+    async def test_hedge_rate_is_capped(self):
+        await self._warm_up()
+        for _ in range(3):
+            await self.hedger.run("codex", lambda: self._call("primary", 0.1), lambda elapsed: self._call("hedge", 0))
+        # max_rate 0.5 of a 4-call window allows 2 hedges
+        self.assertEqual((self.hedger.hedged, self.hedger.over_budget), (2, 1))
+
+    async def test_cancelling_the_caller_cancels_both_attempts(self):
+        await self._warm_up()
+        caller = asyncio.create_task(
+            self.hedger.run("codex", lambda: self._call("primary", 5), lambda elapsed: self._call("hedge", 5))
+        )
+        await asyncio.sleep(0.1)
+        caller.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+        self.assertEqual(sorted(self.cancelled), ["hedge", "primary"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from mcp.jobs import InMemoryJobStore, Job, JobConflictError, JobRunner, SQLiteJobStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _job(job_id: str, finished: bool = True) -> Job:
+    if finished:
+        return Job(job_id=job_id, user_id="u", kind="step", status="succeeded", finished_at=0.0, turn={"n": job_id})
+    return Job(job_id=job_id, user_id="u", kind="step")
+
+
+class JobStoreContract:
+    """Retention behaviour every job store must share."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def _store(self, **overrides):
+        raise NotImplementedError
+
+    def test_finished_jobs_expire_after_ttl(self):
+        store = self._store()
+        store.put(_job("a"))
+        self.clock.now = 30
+        job = _job("b")
+        job.finished_at = 30
+        store.put(job)
+        self.clock.now = 61
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.get("b").turn, {"n": "b"})
+        self.assertEqual(store.stats()["evictions"]["ttl"], 1)
+
+    def test_finished_jobs_are_evicted_before_running_ones(self):
+        store = self._store(max_entries=2)
+        store.put(_job("running", finished=False))
+        store.put(_job("old"))
+        store.put(_job("new"))
+        self.assertIsNotNone(store.get("running"))
+        self.assertIsNone(store.get("old"))
+        self.assertIsNotNone(store.get("new"))
+        self.assertEqual(store.stats()["evictions"]["lru"], 1)
+
+    def test_put_replaces_the_job(self):
+        store = self._store()
+        store.put(_job("a", finished=False))
+        store.put(Job(job_id="a", user_id="u", kind="step", status="failed", finished_at=1.0,
+                      error={"status": 502, "detail": "down"}))
+        job = store.get("a")
+        self.assertEqual((job.status, job.error), ("failed", {"status": 502, "detail": "down"}))
+        self.assertEqual(len(store), 1)
+
+    def test_start_returns_the_users_running_job(self):
+        store = self._store()
+        first = Job(job_id="a", user_id="u", kind="step", request_key="k")
+        self.assertIs(store.start(first), first)
+        running = store.start(Job(job_id="b", user_id="u", kind="step", request_key="other"))
+        self.assertEqual((running.job_id, running.request_key), ("a", "k"))
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.start(Job(job_id="c", user_id="v", kind="step")).job_id, "c")
+
+        first.status, first.finished_at = "succeeded", 1.0
+        store.put(first)
+        self.assertEqual(store.start(Job(job_id="d", user_id="u", kind="step")).job_id, "d")
+
+
+class InMemoryJobStoreTests(JobStoreContract, unittest.TestCase):
+    def _store(self, **overrides):
+        options = dict(ttl_seconds=60, max_entries=100, clock=self.clock)
+        options.update(overrides)
+        return InMemoryJobStore(**options)
+
+
+class SQLiteJobStoreTests(JobStoreContract, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "jobs.db")
+        self._stores = []
+
+    def tearDown(self):
+        for store in self._stores:
+            store.close()
+        self._tmp.cleanup()
+
+    def _store(self, **overrides):
+        options = dict(ttl_seconds=60, max_entries=100, clock=self.clock)
+        options.update(overrides)
+        store = SQLiteJobStore(self.path, **options)
+        self._stores.append(store)
+        return store
+
+    def test_jobs_are_shared_between_store_instances(self):
+        writer, reader = self._store(), self._store()
+        writer.put(_job("a"))
+        self.assertEqual(reader.get("a").turn, {"n": "a"})
+
+
+class JobRunnerTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.runner = JobRunner(InMemoryJobStore(), poll_interval=0.01)
+        self.release = asyncio.Event()
+
+    async def asyncTearDown(self):
+        await self.runner.close()
+
+    async def _turn(self):
+        await self.release.wait()
+        return {"codex_output": "answer"}
+
+    async def test_job_result_is_recorded(self):
+        job = await self.runner.submit("u", "step", "k", self._turn)
+        self.assertEqual(job.status, "running")
+        self.assertEqual((await self.runner.wait(job.job_id, 0)).status, "running")
+        self.assertEqual(self.runner.running, 1)
+
+        self.release.set()
+        finished = await self.runner.wait(job.job_id, 5)
+        self.assertEqual((finished.status, finished.turn), ("succeeded", {"codex_output": "answer"}))
+        self.assertEqual((self.runner.running, (await self.runner.stats())["succeeded"]), (0, 1))
+
+    async def test_long_poll_returns_the_running_job_after_timeout(self):
+        job = await self.runner.submit("u", "step", "k", self._turn)
+        self.assertEqual((await self.runner.wait(job.job_id, 0.02)).status, "running")
+
+    async def test_failure_is_recorded_with_its_description(self):
+        async def failing():
+            raise RuntimeError("cli failed")
+
+        job = await self.runner.submit("u", "step", "k", failing)
+        finished = await self.runner.wait(job.job_id, 5)
+        self.assertEqual(finished.error, {"status": 500, "detail": "cli failed"})
+
+    async def test_same_request_joins_and_different_request_conflicts(self):
+        job = await self.runner.submit("u", "step", "k", self._turn)
+        self.assertEqual((await self.runner.submit("u", "step", "k", self._turn)).job_id, job.job_id)
+        with self.assertRaises(JobConflictError):
+            await self.runner.submit("u", "step", "other", self._turn)
+        other_user = await self.runner.submit("v", "step", "other", self._turn)
+        self.assertNotEqual(other_user.job_id, job.job_id)
+
+        self.release.set()
+        await self.runner.wait(job.job_id, 5)
+        self.assertNotEqual((await self.runner.submit("u", "step", "k", self._turn)).job_id, job.job_id)
+
+    async def test_jobs_of_another_worker_are_polled_from_the_store(self):
+        store = InMemoryJobStore()
+        owner, poller = JobRunner(store), JobRunner(store, poll_interval=0.01)
+        job = await owner.submit("u", "step", "k", self._turn)
+        waiting = asyncio.create_task(poller.wait(job.job_id, 5))
+        await asyncio.sleep(0.03)
+        self.release.set()
+        self.assertEqual((await waiting).status, "succeeded")
+
+    async def test_one_running_job_per_user_across_workers(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "jobs.db")
+        stores = [SQLiteJobStore(path), SQLiteJobStore(path)]
+        workers = [JobRunner(store, poll_interval=0.01) for store in stores]
+        try:
+            job = await workers[0].submit("u", "step", "k", self._turn)
+            self.assertEqual((await workers[1].submit("u", "step", "k", self._turn)).job_id, job.job_id)
+            with self.assertRaises(JobConflictError):
+                await workers[1].submit("u", "step", "other", self._turn)
+            self.assertEqual((await workers[1].stats())["running"], 0)
+
+            self.release.set()
+            self.assertEqual((await workers[1].wait(job.job_id, 5)).status, "succeeded")
+        finally:
+            for worker, store in zip(workers, stores):
+                await worker.close()
+                store.close()
+
+    async def test_close_records_running_jobs_as_failed(self):
+        job = await self.runner.submit("u", "step", "k", self._turn)
+        await asyncio.sleep(0)
+        await self.runner.close()
+        finished = self.runner.store.get(job.job_id)
+        self.assertEqual((finished.status, finished.error["status"]), ("failed", 503))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import asyncio
+import unittest
+
+from mcp.outbox import Outbox, OutboxOverflow
+
+
+class OutboxTests(unittest.IsolatedAsyncioTestCase):
+    async def test_waiting_chunks_of_one_stream_are_merged(self):
+        outbox = Outbox(max_bytes=1000)
+        outbox.put({"type": "turn_start", "responder": "codex"})
+        for data in ("a", "b", "c"):
+            outbox.put({"type": "chunk", "responder": "codex", "data": data})
+        outbox.put({"type": "chunk", "responder": "claude", "data": "x"})
+        outbox.put({"type": "chunk", "responder": "claude", "data": "y", "id": 2})
+
+        events = [await outbox.get() for _ in range(len(outbox))]
+        self.assertEqual([event.get("data") for event in events], [None, "abc", "x", "y"])
+        self.assertEqual(outbox.merged, 2)
+        self.assertEqual(outbox.pending_bytes, 0)
+
+    async def test_events_already_taken_are_not_modified(self):
+        outbox = Outbox(max_bytes=1000)
+        outbox.put({"type": "chunk", "responder": "codex", "data": "a"})
+        first = await outbox.get()
+        outbox.put({"type": "chunk", "responder": "codex", "data": "b"})
+        self.assertEqual((first["data"], (await outbox.get())["data"]), ("a", "b"))
+
+    async def test_overflow_when_the_consumer_falls_too_far_behind(self):
+        outbox = Outbox(max_bytes=20)  # "chunk" + "codex" + 10 bytes of data
+        outbox.put({"type": "chunk", "responder": "codex", "data": "x" * 10})
+        with self.assertRaises(OutboxOverflow):
+            outbox.put({"type": "chunk", "responder": "codex", "data": "y"})
+
+    async def test_get_waits_for_events_and_ends_after_close(self):
+        outbox = Outbox(max_bytes=1000)
+        waiting = asyncio.create_task(outbox.get())
+        await asyncio.sleep(0)
+        outbox.put({"type": "pong"})
+        self.assertEqual(await waiting, {"type": "pong"})
+
+        outbox.put({"type": "done"})
+        outbox.close()
+        outbox.put({"type": "ignored"})
+        self.assertEqual(await outbox.get(), {"type": "done"})
+        self.assertIsNone(await outbox.get())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+from mcp.rpc import INVALID_PARAMS, INVALID_REQUEST, METHOD_NOT_FOUND, McpServer, RpcError, ToolError
+
+TOOLS = [{"name": "echo", "description": "Echo the text.", "input_schema": {"type": "object"}}]
+
+
+class McpServerTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.sent = []
+
+        async def echo(arguments, ctx):
+            await ctx.progress("working")
+            if arguments.get("fail") == "tool":
+                raise ToolError("no such session")
+            if arguments.get("fail") == "params":
+                raise RpcError(INVALID_PARAMS, "text is required")
+            if arguments.get("fail") == "crash":
+                raise RuntimeError("boom")
+            return {"text": arguments.get("text"), "user": ctx.user_id}
+
+        self.server = McpServer("test", "1.0", TOOLS, {"echo": echo})
+
+    async def _notify(self, message):
+        self.sent.append(message)
+
+    async def _call(self, message):
+        return await self.server.handle_payload(message, "u1", self._notify)
+
+    async def test_initialize_negotiates_the_protocol_version(self):
+        response = await self._call({"jsonrpc": "2.0", "id": 1, "method": "initialize",
+                                     "params": {"protocolVersion": "2024-11-05"}})
+        self.assertEqual(response["result"]["protocolVersion"], "2024-11-05")
+        self.assertEqual(response["result"]["serverInfo"], {"name": "test", "version": "1.0"})
+        response = await self._call({"jsonrpc": "2.0", "id": 2, "method": "initialize",
+                                     "params": {"protocolVersion": "1999-01-01"}})
+        self.assertEqual(response["result"]["protocolVersion"], "2025-06-18")
+
+    async def test_tools_list_uses_camel_case_schema(self):
+        response = await self._call({"jsonrpc": "2.0", "id": 1, "method": "tools/list"})
+        self.assertEqual(response["result"]["tools"], [
+            {"name": "echo", "description": "Echo the text.", "inputSchema": {"type": "object"}}
+        ])
+
+    async def test_tool_call_returns_text_and_structured_content(self):
+        response = await self._call({"jsonrpc": "2.0", "id": 7, "method": "tools/call",
+                                     "params": {"name": "echo", "arguments": {"text": "hi"}}})
+        result = response["result"]
+        self.assertEqual(result["structuredContent"], {"text": "hi", "user": "u1"})
+        self.assertEqual(result["content"][0]["type"], "text")
+        self.assertEqual(self.sent, [])  # no progress token, no notifications
+
+    async def test_progress_notifications_follow_the_token(self):
+        await self._call({"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                          "params": {"name": "echo", "arguments": {}, "_meta": {"progressToken": "t"}}})
+        self.assertEqual(self.sent, [{"jsonrpc": "2.0", "method": "notifications/progress",
+                                      "params": {"progressToken": "t", "progress": 1, "message": "working"}}])
+
+    async def test_errors(self):
+        async def call(method, params=None):
+            message = {"jsonrpc": "2.0", "id": 1, "method": method}
+            if params is not None:
+                message["params"] = params
+            return await self._call(message)
+
+        self.assertEqual((await call("resources/list"))["error"]["code"], METHOD_NOT_FOUND)
+        self.assertEqual((await call("tools/call", {"name": "nope"}))["error"]["code"], INVALID_PARAMS)
+        self.assertEqual((await call("tools/call", {"name": "echo", "arguments": {"fail": "params"}}))["error"],
+                         {"code": INVALID_PARAMS, "message": "text is required"})
+        tool_error = await call("tools/call", {"name": "echo", "arguments": {"fail": "tool"}})
+        self.assertTrue(tool_error["result"]["isError"])
+        self.assertEqual(tool_error["result"]["content"][0]["text"], "no such session")
+        with self.assertLogs("mcp.rpc", level="ERROR"):
+            crashed = await call("tools/call", {"name": "echo", "arguments": {"fail": "crash"}})
+        self.assertEqual(crashed["error"]["message"], "internal error")
+        self.assertEqual((await self._call({"id": 1, "method": "ping"}))["error"]["code"], INVALID_REQUEST)
+        self.assertEqual(self.server.stats()["tool_errors"], 1)
+
+    async def test_notifications_and_batches(self):
+        self.assertIsNone(await self._call({"jsonrpc": "2.0", "method": "notifications/initialized"}))
+        responses = await self._call([
+            {"jsonrpc": "2.0", "method": "notifications/initialized"},
+            {"jsonrpc": "2.0", "id": "a", "method": "ping"},
+            {"jsonrpc": "2.0", "id": "b", "method": "ping"},
+        ])
+        self.assertEqual([response["id"] for response in responses], ["a", "b"])
+        self.assertEqual((await self._call([]))["error"]["code"], INVALID_REQUEST)
+
+
+if __name__ == "__main__":
+    unittest.main()
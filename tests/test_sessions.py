@@ -0,0 +1,165 @@
+import os
+import tempfile
+import unittest
+
+from mcp.sessions import InMemorySessionStore, SQLiteSessionStore, Turn
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _turn(text: str) -> Turn:
+    return Turn(user_instruction="", codex_output=text, responder="codex")
+
+
+class SessionStoreContract:
+    """Limit and trimming behaviour every session store must share."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def _store(self, **overrides):
+        raise NotImplementedError
+
+    def test_idle_sessions_expire(self):
+        store = self._store()
+        store.create("a")
+        self.clock.now = 30
+        store.create("b")
+        self.clock.now = 61
+        self.assertIsNone(store.get("a"))
+        self.assertIsNotNone(store.get("b"))
+        self.assertEqual(store.stats()["evictions"]["ttl"], 1)
+
+    def test_least_recently_used_session_is_evicted_over_max_entries(self):
+        store = self._store(max_entries=2)
+        store.create("a")
+        self.clock.now = 1
+        store.create("b")
+        self.clock.now = 2
+        store.get("a")
+        self.clock.now = 3
+        store.create("c")
+        self.assertIsNotNone(store.get("a"))
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.stats()["evictions"]["lru"], 1)
+
+    def test_byte_budget_evicts_oldest_sessions(self):
+        store = self._store(max_bytes=6000)
+        first = store.create("a")
+        store.append_turn(first, _turn("x" * 2000))
+        self.clock.now = 1
+        second = store.create("b")
+        store.append_turn(second, _turn("y" * 2000))
+        self.assertEqual(len(store), 2)
+
+        self.clock.now = 2
+        store.append_turn(second, _turn("z" * 2000))
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.stats()["evictions"]["bytes"], 1)
+        self.assertLessEqual(store.stats()["bytes"], 6000)
+
+    def test_append_turn_trims_history_and_tracks_bytes(self):
+        store = self._store(max_history_turns=2)
+        session = store.create("a")
+        for idx in range(5):
+            store.append_turn(session, _turn(f"c{idx}"))
+        self.assertEqual([t.codex_output for t in session.history], ["c3", "c4"])
+        self.assertEqual([t.codex_output for t in store.get("a").history], ["c3", "c4"])
+
+        store.delete("a")
+        self.assertEqual(store.stats()["bytes"], 0)
+
+    def test_writes_to_a_stopped_or_restarted_session_are_dropped(self):
+        store = self._store()
+        stale = store.create("a")
+        store.delete("a")  # /stop while a turn is still running
+        store.append_turn(stale, _turn("orphan"))
+        self.assertIsNone(store.get("a"))
+
+        store.create("a")  # /start_debate before the late turn lands
+        store.append_turn(stale, _turn("late"))
+        stale.next_responder = "claude"
+        store.save(stale)
+        fresh = store.get("a")
+        self.assertEqual((fresh.history, fresh.next_responder), ([], "codex"))
+        store.delete("a")
+        self.assertEqual(store.stats()["bytes"], 0)
+
+    def test_peek_does_not_refresh_the_idle_timer(self):
+        store = self._store()
+        store.create("a")
+        self.clock.now = 50
+        self.assertIsNotNone(store.peek("a"))
+        self.clock.now = 61
+        self.assertIsNone(store.peek("a"))
+        self.assertIsNone(store.get("a"))
+
+
+class InMemorySessionStoreTests(SessionStoreContract, unittest.TestCase):
+    def _store(self, **overrides):
+        options = dict(ttl_seconds=60, max_entries=100, max_bytes=10**9, max_history_turns=50, clock=self.clock)
+        options.update(overrides)
+        return InMemorySessionStore(**options)
+
+
+class SQLiteSessionStoreTests(SessionStoreContract, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "sessions.db")
+        self._stores = []
+
+    def tearDown(self):
+        for store in self._stores:
+            store.close()
+        self._tmp.cleanup()
+
+    def _store(self, **overrides):
+        options = dict(ttl_seconds=60, max_entries=100, max_bytes=10**9, max_history_turns=50, clock=self.clock)
+        options.update(overrides)
+        store = SQLiteSessionStore(self.path, **options)
+        self._stores.append(store)
+        return store
+
+    def test_sessions_are_shared_between_store_instances(self):
+        writer, reader = self._store(), self._store()
+        session = writer.create("a")
+        writer.append_turn(session, Turn(user_instruction="", codex_output="hello", codex_latency_ms=12.5))
+        session.active = True
+        session.next_responder = "claude"
+        session.mode = "critique"
+        session.parallel = True
+        writer.save(session)
+
+        loaded = reader.get("a")
+        self.assertTrue(loaded.active)
+        self.assertEqual(loaded.next_responder, "claude")
+        self.assertEqual(loaded.mode, "critique")
+        self.assertTrue(loaded.parallel)
+        self.assertEqual([t.codex_output for t in loaded.history], ["hello"])
+        self.assertEqual(loaded.history[0].codex_latency_ms, 12.5)
+
+        reader.delete("a")
+        self.assertIsNone(writer.get("a"))
+
+    def test_a_turn_finishing_after_stop_leaves_no_rows(self):
+        store = self._store()
+        stale = store.create("a")
+        store.delete("a")
+        store.append_turn(stale, _turn("orphan"))
+        self.assertEqual(store._conn.execute("SELECT COUNT(*) FROM turns").fetchone()[0], 0)
+
+    def test_database_uses_wal_journal(self):
+        store = self._store()
+        mode = store._conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+
+if __name__ == "__main__":
+    unittest.main()
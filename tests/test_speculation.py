@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+
+from mcp.speculation import Speculator
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SpeculatorTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.clock = FakeClock()
+        self.release = asyncio.Event()
+        self.calls = []
+
+    async def _speculative(self, model, prompt):
+        self.calls.append(("speculative", model, prompt))
+        await self.release.wait()
+        return f"{model}:{prompt}"
+
+    async def _real(self, model, prompt):
+        self.calls.append(("real", model, prompt))
+        return f"real {model}:{prompt}"
+
+    async def test_hit_serves_the_speculated_result_and_cancels_the_losing_branch(self):
+        speculator = Speculator(max_inflight=4, clock=self.clock)
+        speculator.start("u", [("codex", "adopt codex"), ("codex", "adopt claude")], self._speculative)
+        await asyncio.sleep(0)
+        self.clock.now = 5.0
+
+        call = speculator.wrap("u", self._real)
+        pending = asyncio.create_task(call("codex", "adopt claude"))
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await pending, "codex:adopt claude")
+
+        stats = speculator.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_rate"]), (1, 0, 1.0))
+        self.assertEqual(stats["saved_seconds"], 5.0)
+        self.assertEqual(stats["wasted_cli_seconds"], 5.0)
+        self.assertEqual(stats["inflight"], 0)
+        self.assertNotIn("real", [kind for kind, _, _ in self.calls])
+
+    async def test_miss_falls_back_to_a_real_call(self):
+        speculator = Speculator(max_inflight=4, clock=self.clock)
+        speculator.start("u", [("codex", "adopt codex"), ("codex", "adopt claude")], self._speculative)
+        output = await speculator.wrap("u", self._real)("codex", "custom")
+        self.assertEqual(output, "real codex:custom")
+        self.assertEqual(speculator.stats()["misses"], 1)
+        self.assertEqual(speculator.inflight(), 0)
+
+    async def test_failed_speculation_is_retried_for_real(self):
+        async def failing(model, prompt):
+            raise RuntimeError("wrapper down")
+
+        speculator = Speculator(max_inflight=4, clock=self.clock)
+        speculator.start("u", [("codex", "p")], failing)
+        await asyncio.sleep(0)
+        self.assertEqual(await speculator.wrap("u", self._real)("codex", "p"), "real codex:p")
+
+    async def test_inflight_limit_skips_extra_candidates(self):
+        speculator = Speculator(max_inflight=2, clock=self.clock)
+        speculator.start("a", [("codex", "1"), ("codex", "2")], self._speculative)
+        speculator.start("b", [("claude", "1")], self._speculative)
+        self.assertEqual(speculator.stats()["skipped"], 1)
+        self.assertEqual(speculator.inflight(), 2)
+
+        speculator.cancel("a")
+        self.assertEqual(speculator.inflight(), 0)
+
+    async def test_rounds_of_sessions_that_ended_silently_expire(self):
+        speculator = Speculator(max_inflight=4, ttl_seconds=60, clock=self.clock)
+        speculator.start("gone", [("codex", "1")], self._speculative)
+        self.clock.now = 61.0
+        speculator.start("active", [("codex", "2")], self._speculative)
+        await asyncio.sleep(0)
+        self.assertEqual(speculator.stats()["users"], 1)
+        self.assertEqual(speculator.stats()["expired"], 1)
+        self.assertEqual(await speculator.wrap("gone", self._real)("codex", "1"), "real codex:1")
+
+    async def test_oldest_round_makes_room_past_max_users(self):
+        speculator = Speculator(max_inflight=4, max_users=2, clock=self.clock)
+        for user_id in ("a", "b", "c"):
+            speculator.start(user_id, [("codex", user_id)], self._speculative)
+            self.clock.now += 1
+        self.assertEqual(list(speculator._pending), ["b", "c"])
+        self.assertEqual(speculator.inflight(), 2)
+
+
+
+if __name__ == "__main__":
+    unittest.main()